@@ -0,0 +1,110 @@
+# pylint: disable=all
+# type: ignore
+# noqa
+
+import os
+
+# Semua pengaturan runtime dibaca dari environment variable dengan nilai default
+# yang sama dengan perilaku sebelumnya.
+
+def _env_int(name, default):
+    try:
+        return int(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return default
+
+# Jumlah gambar maksimum dalam satu forward pass MobileNet
+IMAGE_BATCH_SIZE = _env_int("IMAGE_BATCH_SIZE", 32)
+
+# Micro-batching inference lintas request: batch maksimum, waktu tunggu pengumpulan batch,
+# kapasitas antrean dan batas waktu menunggu slot antrean sebelum request ditolak (503)
+INFERENCE_MAX_BATCH_SIZE = _env_int("INFERENCE_MAX_BATCH_SIZE", 16)
+INFERENCE_MAX_WAIT_MS = _env_int("INFERENCE_MAX_WAIT_MS", 10)
+INFERENCE_QUEUE_SIZE = _env_int("INFERENCE_QUEUE_SIZE", 256)
+INFERENCE_ENQUEUE_TIMEOUT_MS = _env_int("INFERENCE_ENQUEUE_TIMEOUT_MS", 2000)
+
+# Backend inference feature extractor: "eager" (fp32), "torchscript" (frozen) atau "int8"
+# (static quantization). Artifact non-eager dibuat oleh init_models.py.
+IMAGE_INFERENCE_BACKEND = os.getenv("IMAGE_INFERENCE_BACKEND", "eager").lower()
+
+# Model yang di-warm-up di background saat worker start: "all", "text", "image" atau "none".
+# /ready mengembalikan 503 sampai warm-up selesai.
+MODEL_WARMUP = os.getenv("MODEL_WARMUP", "all").lower()
+
+# Decode gambar upload: sisi terpendek hasil decode (~2x input MobileNet 224) dan batas
+# jumlah piksel sumber (proteksi decompression bomb)
+IMAGE_DECODE_MAX_SIDE = _env_int("IMAGE_DECODE_MAX_SIDE", 448)
+IMAGE_DECODE_MAX_SOURCE_PIXELS = _env_int("IMAGE_DECODE_MAX_SOURCE_PIXELS", 64_000_000)
+
+# Cache embedding gambar (key: hash isi file + versi model). Tier disk opsional
+# (IMAGE_EMBEDDING_CACHE_DISK=1) berbagi hasil antar worker dan restart.
+IMAGE_EMBEDDING_CACHE_SIZE = _env_int("IMAGE_EMBEDDING_CACHE_SIZE", 4096)
+IMAGE_EMBEDDING_CACHE_DISK = _env_int("IMAGE_EMBEDDING_CACHE_DISK", 0) == 1
+IMAGE_EMBEDDING_CACHE_DIR = os.getenv("IMAGE_EMBEDDING_CACHE_DIR", "app/embeddings/image_cache")
+
+# Pencarian embedding gambar: "flat" (exact), "ivf" (approximate) atau "auto"
+# (ivf mulai IMAGE_ANN_MIN_ITEMS item). IMAGE_ANN_NLIST=0 berarti 4*sqrt(N);
+# nprobe lebih besar = recall lebih tinggi, latency lebih besar.
+IMAGE_ANN_ENGINE = os.getenv("IMAGE_ANN_ENGINE", "auto").lower()
+IMAGE_ANN_MIN_ITEMS = _env_int("IMAGE_ANN_MIN_ITEMS", 20000)
+IMAGE_ANN_NLIST = _env_int("IMAGE_ANN_NLIST", 0)
+IMAGE_ANN_NPROBE = _env_int("IMAGE_ANN_NPROBE", 16)
+IMAGE_ANN_DIR = os.getenv("IMAGE_ANN_DIR", "app/embeddings")
+
+# Representasi vektor gambar di memori: "float32" (exact), "float16", "int8" atau "pq"
+# (product quantization, IMAGE_PQ_SUBVECTORS byte per vektor). Mode terkompresi me-rerank
+# kandidat teratas dengan vektor asli dari file memmap bila IMAGE_RERANK_ORIGINALS=1.
+IMAGE_VECTOR_STORAGE = os.getenv("IMAGE_VECTOR_STORAGE", "float32").lower()
+IMAGE_PQ_SUBVECTORS = _env_int("IMAGE_PQ_SUBVECTORS", 96)
+IMAGE_RERANK_ORIGINALS = _env_int("IMAGE_RERANK_ORIGINALS", 1) == 1
+IMAGE_RERANK_CANDIDATES = _env_int("IMAGE_RERANK_CANDIDATES", 1000)
+
+# Format embedding gambar di Firestore: "float32" / "float16" (bytes dengan header) atau
+# "list" (array double, format lama)
+IMAGE_EMBEDDING_WIRE_DTYPE = os.getenv("IMAGE_EMBEDDING_WIRE_DTYPE", "float32").lower()
+
+# Download gambar dari URL: jumlah download paralel per worker, batas ukuran (byte),
+# timeout koneksi/baca (detik) dan cache TTL untuk URL yang baru di-fetch
+IMAGE_FETCH_CONCURRENCY = _env_int("IMAGE_FETCH_CONCURRENCY", 8)
+IMAGE_FETCH_MAX_BYTES = _env_int("IMAGE_FETCH_MAX_BYTES", 15 * 1024 * 1024)
+IMAGE_FETCH_CONNECT_TIMEOUT = _env_int("IMAGE_FETCH_CONNECT_TIMEOUT", 5)
+IMAGE_FETCH_READ_TIMEOUT = _env_int("IMAGE_FETCH_READ_TIMEOUT", 10)
+IMAGE_FETCH_CACHE_SIZE = _env_int("IMAGE_FETCH_CACHE_SIZE", 64)
+IMAGE_FETCH_CACHE_TTL_SECONDS = _env_int("IMAGE_FETCH_CACHE_TTL_SECONDS", 300)
+
+# Thread pool untuk pekerjaan blocking di handler async (lihat app/services/executor.py).
+# Default: CPU pool x thread BLAS ~ jumlah core, torch memakai setengah core.
+CPU_COUNT = os.cpu_count() or 1
+EXECUTOR_IO_THREADS = _env_int("EXECUTOR_IO_THREADS", 16)
+EXECUTOR_CPU_THREADS = _env_int("EXECUTOR_CPU_THREADS", max(2, CPU_COUNT // 2))
+EXECUTOR_PROCESS_WORKERS = _env_int("EXECUTOR_PROCESS_WORKERS", 0)
+TORCH_NUM_THREADS = _env_int("TORCH_NUM_THREADS", max(1, CPU_COUNT // 2))
+BLAS_NUM_THREADS = _env_int("BLAS_NUM_THREADS", max(1, CPU_COUNT // EXECUTOR_CPU_THREADS))
+
+# Re-encode text embedding yang versinya tidak sama dengan vectorizer aktif, per chunk
+# dokumen dengan posisi tersimpan sehingga bisa dilanjutkan setelah restart
+TEXT_REENCODE_CHUNK_SIZE = _env_int("TEXT_REENCODE_CHUNK_SIZE", 200)
+TEXT_REENCODE_PAUSE_MS = _env_int("TEXT_REENCODE_PAUSE_MS", 500)
+TEXT_REENCODE_ON_STARTUP = _env_int("TEXT_REENCODE_ON_STARTUP", 1) == 1
+TEXT_REENCODE_STATE_PATH = os.getenv("TEXT_REENCODE_STATE_PATH", "app/embeddings/text_reencode_state.json")
+
+# Mode encoder teks: "tfidf" (vocabulary hasil fit) atau "hashing" (feature hashing tanpa fit,
+# idf dihitung dari document frequency item yang ada di index saat pencarian)
+TEXT_VECTORIZER_MODE = os.getenv("TEXT_VECTORIZER_MODE", "tfidf").lower()
+TEXT_HASHING_FEATURES = _env_int("TEXT_HASHING_FEATURES", 2 ** 18)
+
+# Batas waktu hybrid matching per request (ms); cabang gambar/teks yang belum selesai saat
+# budget habis dilewati dan hasil ditandai parsial. 0 = tanpa batas
+HYBRID_TIME_BUDGET_MS = _env_int("HYBRID_TIME_BUDGET_MS", 3000)
+
+# Cache hasil pencarian (text/hybrid/simple search) per query + parameter. Entri tidak berlaku
+# setelah TTL atau jika koleksi berubah lewat router / replika (lihat index_sync.get_generation)
+QUERY_CACHE_SIZE = _env_int("QUERY_CACHE_SIZE", 512)
+QUERY_CACHE_TTL_SECONDS = _env_int("QUERY_CACHE_TTL_SECONDS", 60)
+
+# Replika koleksi in-process lewat listener on_snapshot (lihat app/services/collection_replica.py):
+# satu kali muat awal, lalu perubahan diterapkan ke index secara inkremental. 0 = stream Firestore
+FIRESTORE_REPLICA_ENABLED = _env_int("FIRESTORE_REPLICA_ENABLED", 1) == 1
+FIRESTORE_REPLICA_COLLECTIONS = [c.strip() for c in os.getenv("FIRESTORE_REPLICA_COLLECTIONS", "found_items,lost_items").split(",") if c.strip()]
+FIRESTORE_REPLICA_CHECK_SECONDS = _env_int("FIRESTORE_REPLICA_CHECK_SECONDS", 10)
+FIRESTORE_REPLICA_RECONNECT_MAX_SECONDS = _env_int("FIRESTORE_REPLICA_RECONNECT_MAX_SECONDS", 60)
@@ -2,15 +2,32 @@
 # type: ignore
 # noqa
 
-from fastapi import FastAPI, Query
+from fastapi import FastAPI, Query, HTTPException
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from app.routers import image_matcher, text_matcher, hybrid_matcher, lost_items
 import os
 from app.services.text_encoder import train_tfidf_with_data
-from app.services.text_encoder import extract_text_features, load_text_embeddings_from_firebase, preprocess_text
+from app.services.text_encoder import extract_text_features_sparse, encode_text_features, load_text_embeddings_from_firebase, preprocess_text
+from app.services.embedding_codec import decode_text_embedding, has_text_embedding, text_embedding_dim
 from sklearn.metrics.pairwise import cosine_similarity
 import numpy as np
 from app.services.firebase import db
+from app.services.index_sync import notify_text_embeddings_rebuilt
+from app.services.inference_worker import inference_scheduler
+from app.services import model_registry
+from app.services.image_decode import get_decode_stats
+from app.services.embedding_cache import image_embedding_cache
+from app.services.image_index import peek_image_index
+from app.services.text_index import peek_text_index
+from app.services.image_fetcher import get_fetch_stats
+from app.services.executor import configure_compute_threads, shutdown_pools, get_executor_metrics, run_io, run_cpu
+from app.services.result_cache import query_result_cache
+from app.services.item_filters import build_filters, matches_filters
+from typing import Optional
+from app.services.text_reencoder import start_background_reencode, stop_background_reencode
+from app.services.collection_replica import start_replicas, stop_replicas, get_replica_stats, get_documents
+from app.config import MODEL_WARMUP, TEXT_REENCODE_ON_STARTUP, FIRESTORE_REPLICA_ENABLED
 
 os.makedirs("app/models", exist_ok=True)
 os.makedirs("app/embeddings", exist_ok=True)
@@ -36,6 +53,43 @@ app.include_router(text_matcher.router)
 app.include_router(hybrid_matcher.router)
 app.include_router(lost_items.router)
 
+@app.on_event("startup")
+async def start_inference_scheduler():
+    configure_compute_threads()
+    await inference_scheduler.start()
+
+WARMUP_MODELS = {
+    "all": None,
+    "text": ["tfidf_vectorizer"],
+    "image": ["image_transforms", "mobilenet"],
+    "none": [],
+}
+
+@app.on_event("startup")
+async def start_model_warm_up():
+    # Warm-up di thread background agar worker langsung bisa menerima koneksi;
+    # load balancer sebaiknya memakai /ready, bukan /
+    model_registry.start_warm_up(WARMUP_MODELS.get(MODEL_WARMUP))
+
+@app.on_event("startup")
+async def resume_text_reencode():
+    # Melanjutkan re-encode text embedding versi lama yang belum selesai (misalnya setelah restart)
+    if TEXT_REENCODE_ON_STARTUP:
+        start_background_reencode()
+
+@app.on_event("startup")
+async def start_collection_replicas():
+    # Listener on_snapshot; sampai snapshot pertama diterapkan, pembacaan masih lewat stream Firestore
+    if FIRESTORE_REPLICA_ENABLED:
+        await run_io(start_replicas)
+
+@app.on_event("shutdown")
+async def stop_inference_scheduler():
+    await inference_scheduler.stop()
+    stop_background_reencode()
+    stop_replicas()
+    shutdown_pools()
+
 @app.get("/")
 async def root():
     return {
@@ -55,48 +109,77 @@ async def root():
 @app.get("/debug-text", tags=["Debugging"])
 async def debug_text_matching(query: str = Query(...)):
     try:
-        items = load_text_embeddings_from_firebase()
-        processed_query = preprocess_text(query)
-        query_features = extract_text_features(query)
-        results = []
-        for item in items:
-            if "text_embedding" in item and len(item["text_embedding"]) > 0:
-                text_embedding = np.array(item["text_embedding"]) if isinstance(item["text_embedding"], list) else item["text_embedding"]
-                sim = float(cosine_similarity([query_features], [text_embedding])[0][0])
-                
-                results.append({
-                    "id": item.get("id", ""),
-                    "item_name": item.get("item_name", ""),
-                    "description": item.get("description", ""),
-                    "similarity": sim,
-                })
+        items = await run_io(load_text_embeddings_from_firebase)
+        
+        def score():
+            query_features = extract_text_features_sparse(query)
+            results = []
+            for item in items:
+                if has_text_embedding(item.get("text_embedding")) and text_embedding_dim(item["text_embedding"]) == query_features.shape[1]:
+                    text_embedding = decode_text_embedding(item["text_embedding"])
+                    sim = float(cosine_similarity(query_features, text_embedding)[0][0])
+                    
+                    results.append({
+                        "id": item.get("id", ""),
+                        "item_name": item.get("item_name", ""),
+                        "description": item.get("description", ""),
+                        "similarity": sim,
+                    })
+            
+            return preprocess_text(query), sorted(results, key=lambda x: x["similarity"], reverse=True)
         
-        results = sorted(results, key=lambda x: x["similarity"], reverse=True)
+        processed_query, results = await run_cpu(score)
         
         return {
             "original_query": query,
             "processed_query": processed_query,
             "total_items": len(items),
-            "items_with_text_embedding": sum(1 for item in items if "text_embedding" in item and len(item["text_embedding"]) > 0),
+            "items_with_text_embedding": sum(1 for item in items if has_text_embedding(item.get("text_embedding"))),
             "top_matches": results[:10]  
         }
     except Exception as e:
         return {"error": str(e)}
 
+@app.get("/ready", tags=["Health"])
+async def ready():
+    status = model_registry.get_status()
+    return JSONResponse(status_code=200 if status["ready"] else 503, content=status)
+
+@app.get("/debug-metrics", tags=["Debugging"])
+async def debug_metrics():
+    return {
+        "inference": inference_scheduler.get_metrics(),
+        "executor": get_executor_metrics(),
+        "image_decode": get_decode_stats(),
+        "image_embedding_cache": image_embedding_cache.get_stats(),
+        "image_fetch": get_fetch_stats(),
+        "query_cache": query_result_cache.get_stats(),
+        "replica": get_replica_stats(),
+        "image_index": {
+            collection: index.get_stats()
+            for collection, index in ((c, peek_image_index(c)) for c in ["found_items", "lost_items"])
+            if index is not None
+        },
+        "text_index": {
+            collection: index.get_stats()
+            for collection, index in ((c, peek_text_index(c)) for c in ["found_items", "lost_items"])
+            if index is not None
+        },
+        "models": model_registry.get_status()
+    }
+
 @app.get("/debug-retrain")
 async def debug_retrain():
-    count = train_tfidf_with_data()
+    count = await run_io(train_tfidf_with_data)
     return {"message": f"Retrained TF-IDF with {count} descriptions"}
 
 @app.get("/debug-items")
 async def debug_items():
-    docs = db.collection("found_items").stream()
     items = []
     
-    for doc in docs:
-        data = doc.to_dict()
+    for doc_id, data in await run_io(lambda: list(get_documents("found_items"))):
         items.append({
-            "id": doc.id,
+            "id": doc_id,
             "item_name": data.get("item_name", ""),
             "description": data.get("description", ""),
             "has_embedding": "embedding" in data,
@@ -107,54 +190,81 @@ async def debug_items():
 
 @app.get("/debug-regenerate-embeddings")
 async def debug_regenerate_embeddings():
-    docs = db.collection("found_items").stream()
-    updated = 0
-    
-    for doc in docs:
-        data = doc.to_dict()
-        description = data.get("description", "")
+    # Stream, encode dan update Firestore berjalan di I/O pool, seperti /text-matcher/refresh-embeddings
+    def regenerate():
+        docs = db.collection("found_items").stream()
+        updated = 0
+        
+        for doc in docs:
+            data = doc.to_dict()
+            description = data.get("description", "")
+            
+            if description:
+                text_embedding = encode_text_features(description)
+                db.collection("found_items").document(doc.id).update({
+                    "text_embedding": text_embedding
+                })
+                updated += 1
         
-        if description:
-            text_embedding = extract_text_features(description)
-            db.collection("found_items").document(doc.id).update({
-                "text_embedding": text_embedding.tolist()
-            })
-            updated += 1
+        notify_text_embeddings_rebuilt()
+        return updated
     
+    updated = await run_io(regenerate)
     return {"message": f"Regenerated text embeddings for {updated} items"}
 
 @app.get("/simple-search")
-async def simple_search(q: str = Query(...), threshold: float = 0.1):
-    from app.services.firebase import db
-    
+async def simple_search(
+    q: str = Query(...),
+    threshold: float = 0.1,
+    category: Optional[str] = Query(None),
+    location: Optional[str] = Query(None),
+    status: Optional[str] = Query(None),
+    date_from: Optional[str] = Query(None),
+    date_to: Optional[str] = Query(None)
+):
     query = q.lower().strip()
-    docs = db.collection("found_items").stream()
-    matches = []
+    try:
+        filters = build_filters(category, location, status, date_from, date_to)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
-    for doc in docs:
-        data = doc.to_dict()
-        item_name = data.get("item_name", "").lower()
-        description = data.get("description", "").lower()
+    def scan():
+        matches = []
         
-        if query in item_name or query in description:
-            score = 1.0 if query in item_name else 0.8
+        for doc_id, data in get_documents("found_items"):
+            if not matches_filters(data, filters):
+                continue
+            item_name = data.get("item_name", "").lower()
+            description = data.get("description", "").lower()
             
-            matches.append({
-                "id": doc.id,
-                "item_name": data.get("item_name", ""),
-                "description": data.get("description", ""),
-                "category": data.get("category", ""),
-                "location_found": data.get("location_found", ""),
-                "found_date": data.get("found_date", ""),
-                "image_url": data.get("image_url", ""),
-                "score": score,
-                "match_type": "simple_text"
-            })
+            if query in item_name or query in description:
+                score = 1.0 if query in item_name else 0.8
+                
+                matches.append({
+                    "id": doc_id,
+                    "item_name": data.get("item_name", ""),
+                    "description": data.get("description", ""),
+                    "category": data.get("category", ""),
+                    "location_found": data.get("location_found", ""),
+                    "found_date": data.get("found_date", ""),
+                    "image_url": data.get("image_url", ""),
+                    "score": score,
+                    "match_type": "simple_text"
+                })
+        
+        return sorted(matches, key=lambda x: x["score"], reverse=True)
+    
+    async def search():
+        return await run_io(scan), True
     
-    matches = sorted(matches, key=lambda x: x["score"], reverse=True)
+    # Pencocokan substring, jadi key cukup memakai query lowercase
+    key = query_result_cache.make_key("simple_search", query, "found_items", threshold, filters)
+    matches, cached = await query_result_cache.get_or_compute(key, "found_items", search)
     
     return {
         "query": q,
         "matches": matches,
-        "total_matches": len(matches)
+        "total_matches": len(matches),
+        "filters": filters,
+        "cached": cached
     }
\ No newline at end of file
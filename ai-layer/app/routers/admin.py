@@ -4,6 +4,7 @@
 
 from fastapi import APIRouter, Body, HTTPException
 from app.services.firebase import db
+from app.services.executor import run_io
 from datetime import datetime
 from typing import List
 
@@ -12,7 +13,7 @@ router = APIRouter(prefix="/admin", tags=["Admin"])
 @router.get("/collections")
 async def get_collections():
     try:
-        collections = [coll.id for coll in db.collections()]
+        collections = [coll.id for coll in await run_io(lambda: list(db.collections()))]
         return {
             "collections": collections,
             "count": len(collections)
@@ -23,7 +24,7 @@ async def get_collections():
 @router.post("/collections")
 async def create_collection(collection: str = Body(..., embed=True)):
     try:
-        collections = [coll.id for coll in db.collections()]
+        collections = [coll.id for coll in await run_io(lambda: list(db.collections()))]
         if collection in collections:
             return {
                 "success": True,
@@ -31,7 +32,7 @@ async def create_collection(collection: str = Body(..., embed=True)):
                 "exists": True
             }
         
-        db.collection(collection).document('placeholder').set({
+        await run_io(db.collection(collection).document('placeholder').set, {
             'created_at': datetime.now().isoformat(),
             'placeholder': True
         })
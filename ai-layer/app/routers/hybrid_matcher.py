@@ -3,12 +3,16 @@
 # noqa
 
 from fastapi import APIRouter, UploadFile, File, Form, HTTPException, Query
-from PIL import Image
-from app.services.hybrid_matcher import find_items_hybrid
-from io import BytesIO
+from app.services.hybrid_matcher import find_items_hybrid_async
+from app.services.image_decode import decode_image
+from app.services.image_fetcher import fetch_image_bytes_async
+from app.services.inference_worker import InferenceQueueFull
+from app.services.executor import run_cpu
+from app.services.embedding_cache import content_hash
+from app.services.result_cache import query_result_cache, normalize_query
+from app.services.item_filters import build_filters
 from typing import Optional
 import json
-import requests
 import logging
 
 logger = logging.getLogger(__name__)
@@ -24,7 +28,12 @@ async def hybrid_match(
     image_weight: float = Form(0.4), 
     text_weight: float = Form(0.6),
     max_results: int = Form(10),
-    collection: str = Form("found_items")  
+    collection: str = Form("found_items"),
+    category: Optional[str] = Form(None),
+    location: Optional[str] = Form(None),
+    status: Optional[str] = Form(None),
+    date_from: Optional[str] = Form(None),
+    date_to: Optional[str] = Form(None)
 ):
     try:
         if not file and not query:
@@ -51,12 +60,24 @@ async def hybrid_match(
         if max_results < 1:
             raise HTTPException(status_code=400, detail="Max results must be at least 1")
         
+        try:
+            filters = build_filters(category, location, status, date_from, date_to)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        
         image = None
         if file:
             file_content = await file.read()
-            image = Image.open(BytesIO(file_content)).convert("RGB")
+            try:
+                image = await run_cpu(decode_image, file_content)
+            except Exception as img_error:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Error processing image {file.filename}: {str(img_error)}"
+                )
         
-        matches = find_items_hybrid(
+        # Inference + scoring gambar dan scoring teks berjalan bersamaan
+        matches, info = await find_items_hybrid_async(
             image=image,
             text=query,
             image_threshold=image_threshold,
@@ -64,7 +85,8 @@ async def hybrid_match(
             image_weight=image_weight,
             text_weight=text_weight,
             max_results=max_results,
-            collection=collection
+            collection=collection,
+            filters=filters
         )
         
         for match in matches:
@@ -79,6 +101,10 @@ async def hybrid_match(
             "collection": collection,  
             "matches": matches,
             "total_matches": len(matches),
+            "partial": info["partial"],
+            "latency_ms": info["latency_ms"],
+            "branches": info["branches"],
+            "filters": filters,
             "parameters": {
                 "image_threshold": image_threshold,
                 "text_threshold": text_threshold,
@@ -87,6 +113,8 @@ async def hybrid_match(
             }
         }
         
+    except InferenceQueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         if isinstance(e, HTTPException):
             raise e
@@ -103,7 +131,12 @@ async def hybrid_search(
     text_threshold: float = Query(0.3, description="Minimum text similarity threshold"),
     image_weight: float = Query(0.6, description="Weight for image similarity score"),
     text_weight: float = Query(0.4, description="Weight for text similarity score"),
-    max_results: int = Query(10, description="Maximum number of results")
+    max_results: int = Query(10, description="Maximum number of results"),
+    category: Optional[str] = Query(None, description="Only items in this category"),
+    location: Optional[str] = Query(None, description="Only items whose location contains this text"),
+    status: Optional[str] = Query(None, description="Only items with this status (default: available found items)"),
+    date_from: Optional[str] = Query(None, description="Earliest found/lost date (YYYY-MM-DD)"),
+    date_to: Optional[str] = Query(None, description="Latest found/lost date (YYYY-MM-DD)")
 ):
     try:
         if not q and not image_url:
@@ -124,38 +157,67 @@ async def hybrid_search(
         if max_results < 1:
             raise HTTPException(status_code=400, detail="Max results must be at least 1")
         
-        image = None
+        try:
+            filters = build_filters(category, location, status, date_from, date_to)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        
+        image_bytes = None
         if image_url:
             try:
-                response = requests.get(image_url, timeout=10)
-                image = Image.open(BytesIO(response.content)).convert("RGB")
+                image_bytes = await fetch_image_bytes_async(image_url)
             except Exception as img_error:
                 raise HTTPException(
                     status_code=400, 
                     detail=f"Error fetching or processing image from URL: {str(img_error)}"
                 )
         
-        matches = find_items_hybrid(
-            image=image,
-            text=q,
-            image_threshold=image_threshold,
-            text_threshold=text_threshold,
-            image_weight=image_weight,
-            text_weight=text_weight,
-            max_results=max_results
-        )
+        async def search():
+            image = None
+            if image_bytes is not None:
+                try:
+                    image = await run_cpu(decode_image, image_bytes)
+                except Exception as img_error:
+                    raise HTTPException(
+                        status_code=400, 
+                        detail=f"Error fetching or processing image from URL: {str(img_error)}"
+                    )
+            
+            matches, info = await find_items_hybrid_async(
+                image=image,
+                text=q,
+                image_threshold=image_threshold,
+                text_threshold=text_threshold,
+                image_weight=image_weight,
+                text_weight=text_weight,
+                max_results=max_results,
+                filters=filters
+            )
+            
+            for match in matches:
+                if "embedding" in match:
+                    del match["embedding"]
+                if "text_embedding" in match:
+                    del match["text_embedding"]
+            # Hasil parsial (time budget habis) tidak disimpan
+            return (matches, info), not info["partial"]
         
-        for match in matches:
-            if "embedding" in match:
-                del match["embedding"]
-            if "text_embedding" in match:
-                del match["text_embedding"]
+        # Gambar dikenali dari hash isinya, bukan URL
+        key = query_result_cache.make_key(
+            "hybrid_search", normalize_query(q), content_hash(image_bytes) if image_bytes is not None else None,
+            "found_items", image_threshold, text_threshold, image_weight, text_weight, max_results, filters)
+        (matches, info), cached = await query_result_cache.get_or_compute(key, "found_items", search)
         
         return {
             "image_provided": image_url is not None,
             "text_provided": q is not None,
             "matches": matches,
             "total_matches": len(matches),
+            "partial": info["partial"],
+            "latency_ms": info["latency_ms"],
+            "branches": info["branches"],
+            "cached": cached,
+            "filters": filters,
             "parameters": {
                 "image_threshold": image_threshold,
                 "text_threshold": text_threshold,
@@ -164,6 +226,8 @@ async def hybrid_search(
             }
         }
         
+    except InferenceQueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         if isinstance(e, HTTPException):
             raise e
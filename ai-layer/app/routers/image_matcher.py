@@ -4,57 +4,86 @@
 
 from fastapi import APIRouter, UploadFile, File, HTTPException, Form, Query, Body
 from typing import List, Optional
-from PIL import Image
-from io import BytesIO
 import os
 import uuid
 from datetime import datetime
 import traceback
 import logging
 from app.services.firebase import db
-from app.services.firebase_storage import get_item_by_id, update_item_status
+from app.services.firebase_storage import get_item_by_id, update_item_status as update_item_status_in_firebase
 from app.services.upload_to_drive import upload_to_drive
+from app.services.image_decode import decode_image
 from app.services.image_encoder import (
     extract_features, 
     extract_features_from_multiple_images,
     find_similar_items, 
+    score_similar_items,
+    cut_similar_items,
     save_embedding_to_firebase
 )
+from app.services.index_sync import notify_item_removed, notify_item_fields_changed
+from app.services.embedding_codec import decode_image_embedding
+from app.services.item_filters import build_filters
 from app.services.text_encoder import save_text_embedding_to_firebase
 from app.services.feedback_learner import get_optimal_thresholds
+from app.services.inference_worker import extract_features_async, InferenceQueueFull
+from app.services.executor import run_cpu, run_io
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/image-matcher", tags=["Image Matching"])
 
+DEBUG_MATCH_THRESHOLD = 0.1
+
 @router.post("/match")
 async def match_image(
     file: UploadFile = File(None),
     threshold: float = Form(None),
-    include_details: bool = Form(False)
+    include_details: bool = Form(False),
+    category: Optional[str] = Form(None),
+    location: Optional[str] = Form(None),
+    status: Optional[str] = Form(None),
+    date_from: Optional[str] = Form(None),
+    date_to: Optional[str] = Form(None)
 ):
     if not file:
         raise HTTPException(status_code=400, detail="No image file provided")
     
     try:
+        try:
+            filters = build_filters(category, location, status, date_from, date_to)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        
         file_content = await file.read()
-        image = Image.open(BytesIO(file_content)).convert("RGB")
+        try:
+            image = await run_cpu(decode_image, file_content)
+        except Exception as img_error:
+            logger.error(f"Error processing image {file.filename}: {str(img_error)}")
+            raise HTTPException(
+                status_code=400, 
+                detail=f"Error processing image {file.filename}: {str(img_error)}"
+            )
         
-        embedding = extract_features(image)
+        embedding = await extract_features_async(image)
         
         if threshold is None:
-            optimal_thresholds = get_optimal_thresholds()
+            optimal_thresholds = await run_io(get_optimal_thresholds)
             threshold = optimal_thresholds.get("image_threshold", 0.3)
         
         logger.info(f"Using image matching threshold: {threshold}")
         
-        matches = find_similar_items(embedding, threshold=threshold)
+        # Skor dihitung sekali; hasil dan log debug (threshold 0.1) dipotong dari skor yang sama
+        debug = logger.isEnabledFor(logging.DEBUG)
+        min_threshold = min(threshold, DEBUG_MATCH_THRESHOLD) if debug else threshold
+        scored = await run_cpu(score_similar_items, embedding, min_threshold=min_threshold, filters=filters)
+        matches = cut_similar_items(scored, threshold)
         logger.info(f"Found {len(matches)} matches with threshold {threshold}")
         
-        all_items = find_similar_items(embedding, threshold=0.1)
-        logger.debug("All potential matches (threshold=0.1):")
-        for item in all_items[:10]:  # Tampilkan 10 teratas
-            logger.debug(f"  - {item['item_name']}: {item['score']}")
+        if debug:
+            logger.debug(f"All potential matches (threshold={DEBUG_MATCH_THRESHOLD}):")
+            for item in cut_similar_items(scored, DEBUG_MATCH_THRESHOLD, top_k=10):  # Tampilkan 10 teratas
+                logger.debug(f"  - {item['item_name']}: {item['score']}")
         
         for match in matches:
             if "embedding" in match:
@@ -71,7 +100,7 @@ async def match_image(
             with open(file_path, "wb") as f:
                 f.write(file_content)
 
-            url = upload_to_drive(file_path, file.filename)
+            url = await run_io(upload_to_drive, file_path, file.filename)
             os.remove(file_path)
             
             return {
@@ -83,9 +112,14 @@ async def match_image(
         return {
             "matches": matches,
             "threshold_used": threshold,
-            "total_matches": len(matches)
+            "total_matches": len(matches),
+            "filters": filters
         }
         
+    except HTTPException:
+        raise
+    except InferenceQueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         logger.error(f"Error in image matching: {str(e)}")
         traceback.print_exc()
@@ -115,7 +149,7 @@ async def add_found_item(
         for file in files:
             file_content = await file.read()
             try:
-                image = Image.open(BytesIO(file_content)).convert("RGB")
+                image = await run_cpu(decode_image, file_content)
                 images.append(image)
                 
                 os.makedirs("temp_images", exist_ok=True)
@@ -130,15 +164,15 @@ async def add_found_item(
                     detail=f"Error processing image {file.filename}: {str(img_error)}"
                 )
         
-        image_url = upload_to_drive(file_paths[0], files[0].filename)
+        image_url = await run_io(upload_to_drive, file_paths[0], files[0].filename)
         
         additional_image_urls = []
         if len(file_paths) > 1:
             for i in range(1, len(file_paths)):
-                additional_url = upload_to_drive(file_paths[i], files[i].filename)
+                additional_url = await run_io(upload_to_drive, file_paths[i], files[i].filename)
                 additional_image_urls.append(additional_url)
         
-        embedding = extract_features_from_multiple_images(images)
+        embedding = await run_cpu(extract_features_from_multiple_images, images)
         
         item_data = {
             "item_name": item_name,
@@ -161,9 +195,9 @@ async def add_found_item(
         if reporter_id:
             item_data["reporter_id"] = reporter_id
         
-        item_id = save_embedding_to_firebase(item_data, embedding)
+        item_id = await run_io(save_embedding_to_firebase, item_data, embedding)
         
-        save_text_embedding_to_firebase(item_id, description)
+        await run_io(save_text_embedding_to_firebase, item_id, description, item_name)
         
         for file_path in file_paths:
             if os.path.exists(file_path):
@@ -190,7 +224,7 @@ async def add_found_item(
 @router.get("/items/{item_id}")
 async def get_item_details(item_id: str, include_embeddings: bool = False):    
     try:
-        item = get_item_by_id(item_id, collection="found_items")
+        item = await run_io(get_item_by_id, item_id, collection="found_items")
         
         if not item:
             raise HTTPException(status_code=404, detail=f"Item with ID {item_id} not found")
@@ -200,6 +234,9 @@ async def get_item_details(item_id: str, include_embeddings: bool = False):
                 del item["embedding"]
             if "text_embedding" in item:
                 del item["text_embedding"]
+        elif "embedding" in item:
+            # Embedding tersimpan sebagai bytes biner (embedding_codec), tidak bisa langsung di-JSON-kan
+            item["embedding"] = decode_image_embedding(item["embedding"]).tolist()
         
         return item
         
@@ -228,7 +265,7 @@ async def update_item_status(
             update_data["claimed_by"] = claimed_by
             update_data["claimed_at"] = datetime.now().isoformat()
         
-        result = update_item_status(item_id, update_data, collection="found_items")
+        result = await run_io(update_item_status_in_firebase, item_id, update_data, collection="found_items")
         return result
         
     except HTTPException:
@@ -240,25 +277,42 @@ async def update_item_status(
 @router.post("/multi-match")
 async def match_multiple_images(
     files: List[UploadFile] = File(...),
-    threshold: float = Form(None)
+    threshold: float = Form(None),
+    category: Optional[str] = Form(None),
+    location: Optional[str] = Form(None),
+    status: Optional[str] = Form(None),
+    date_from: Optional[str] = Form(None),
+    date_to: Optional[str] = Form(None)
 ):
     if not files or len(files) == 0:
         raise HTTPException(status_code=400, detail="No image files provided")
     
     try:
+        try:
+            filters = build_filters(category, location, status, date_from, date_to)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        
         images = []
         for file in files:
             file_content = await file.read()
-            image = Image.open(BytesIO(file_content)).convert("RGB")
+            try:
+                image = await run_cpu(decode_image, file_content)
+            except Exception as img_error:
+                logger.error(f"Error processing image {file.filename}: {str(img_error)}")
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Error processing image {file.filename}: {str(img_error)}"
+                )
             images.append(image)
         
-        embedding = extract_features_from_multiple_images(images)
+        embedding = await run_cpu(extract_features_from_multiple_images, images)
         
         if threshold is None:
-            optimal_thresholds = get_optimal_thresholds()
+            optimal_thresholds = await run_io(get_optimal_thresholds)
             threshold = optimal_thresholds.get("image_threshold", 0.3)
         
-        matches = find_similar_items(embedding, threshold=threshold)
+        matches = await run_cpu(find_similar_items, embedding, threshold=threshold, filters=filters)
         
         for match in matches:
             if "embedding" in match:
@@ -270,9 +324,12 @@ async def match_multiple_images(
             "matches": matches,
             "images_processed": len(images),
             "threshold_used": threshold,
-            "total_matches": len(matches)
+            "total_matches": len(matches),
+            "filters": filters
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error in multi-image matching: {str(e)}")
         traceback.print_exc()
@@ -284,7 +341,7 @@ async def add_item_images(
     files: List[UploadFile] = File(...),
 ):
     try:
-        item = get_item_by_id(item_id, collection="found_items")
+        item = await run_io(get_item_by_id, item_id, collection="found_items")
         if not item:
             raise HTTPException(status_code=404, detail=f"Item with ID {item_id} not found")
         
@@ -294,7 +351,7 @@ async def add_item_images(
         for file in files:
             file_content = await file.read()
             try:
-                image = Image.open(BytesIO(file_content)).convert("RGB")
+                image = await run_cpu(decode_image, file_content)
                 images.append(image)
                 
                 os.makedirs("temp_images", exist_ok=True)
@@ -311,10 +368,10 @@ async def add_item_images(
         
         image_urls = []
         for file_path in file_paths:
-            image_url = upload_to_drive(file_path, os.path.basename(file_path))
+            image_url = await run_io(upload_to_drive, file_path, os.path.basename(file_path))
             image_urls.append(image_url)
         
-        current_item_data = db.collection("found_items").document(item_id).get().to_dict()
+        current_item_data = (await run_io(db.collection("found_items").document(item_id).get)).to_dict()
         
         if "additional_images" in current_item_data:
             additional_images = current_item_data["additional_images"]
@@ -323,10 +380,11 @@ async def add_item_images(
         
         additional_images.extend(image_urls)
         
-        db.collection("found_items").document(item_id).update({
+        await run_io(db.collection("found_items").document(item_id).update, {
             "additional_images": additional_images,
             "updated_at": datetime.now().isoformat()
         })
+        notify_item_fields_changed("found_items", item_id, {"additional_images": additional_images})
         
         for file_path in file_paths:
             if os.path.exists(file_path):
@@ -358,7 +416,7 @@ async def delete_item_image(item_id: str, image_url: str = Body(..., embed=True)
     try:
         logger.info(f"Menghapus gambar dari item {item_id}: {image_url}")
         
-        item = get_item_by_id(item_id, collection="found_items")
+        item = await run_io(get_item_by_id, item_id, collection="found_items")
         if not item:
             raise HTTPException(status_code=404, detail=f"Item with ID {item_id} not found")
         
@@ -370,11 +428,15 @@ async def delete_item_image(item_id: str, image_url: str = Body(..., embed=True)
                 new_primary = additional_images[0]
                 additional_images.remove(new_primary)
                 
-                db.collection("found_items").document(item_id).update({
+                await run_io(db.collection("found_items").document(item_id).update, {
                     "image_url": new_primary,
                     "additional_images": additional_images,
                     "updated_at": datetime.now().isoformat()
                 })
+                notify_item_fields_changed("found_items", item_id, {
+                    "image_url": new_primary,
+                    "additional_images": additional_images
+                })
                 
                 logger.info(f"Gambar utama dihapus, diganti dengan {new_primary}")
                 return {
@@ -384,10 +446,11 @@ async def delete_item_image(item_id: str, image_url: str = Body(..., embed=True)
                     "remaining_images": additional_images
                 }
             else:
-                db.collection("found_items").document(item_id).update({
+                await run_io(db.collection("found_items").document(item_id).update, {
                     "image_url": "",
                     "updated_at": datetime.now().isoformat()
                 })
+                notify_item_fields_changed("found_items", item_id, {"image_url": ""})
                 
                 logger.info("Gambar utama dihapus, tidak ada gambar pengganti")
                 return {
@@ -398,10 +461,11 @@ async def delete_item_image(item_id: str, image_url: str = Body(..., embed=True)
         elif image_url in additional_images:
             additional_images.remove(image_url)
             
-            db.collection("found_items").document(item_id).update({
+            await run_io(db.collection("found_items").document(item_id).update, {
                 "additional_images": additional_images,
                 "updated_at": datetime.now().isoformat()
             })
+            notify_item_fields_changed("found_items", item_id, {"additional_images": additional_images})
             
             logger.info(f"Gambar tambahan dihapus: {image_url}")
             return {
@@ -426,11 +490,12 @@ async def delete_item(item_id: str):
     try:
         logger.info(f"Menghapus item dengan ID: {item_id}")
         
-        item = get_item_by_id(item_id, collection="found_items")
+        item = await run_io(get_item_by_id, item_id, collection="found_items")
         if not item:
             raise HTTPException(status_code=404, detail=f"Item with ID {item_id} not found")
         
-        db.collection("found_items").document(item_id).delete()
+        await run_io(db.collection("found_items").document(item_id).delete)
+        notify_item_removed("found_items", item_id)
         
         logger.info(f"Item {item_id} berhasil dihapus dari Firestore")
         return {
@@ -451,7 +516,7 @@ async def set_primary_image(item_id: str, image_url: str = Body(..., embed=True)
     try:
         logger.info(f"Mengatur gambar utama untuk item {item_id}: {image_url}")
         
-        item = get_item_by_id(item_id, collection="found_items")
+        item = await run_io(get_item_by_id, item_id, collection="found_items")
         if not item:
             raise HTTPException(status_code=404, detail=f"Item with ID {item_id} not found")
         
@@ -478,7 +543,8 @@ async def set_primary_image(item_id: str, image_url: str = Body(..., embed=True)
         update_data["image_url"] = image_url
         update_data["updated_at"] = datetime.now().isoformat()
         
-        db.collection("found_items").document(item_id).update(update_data)
+        await run_io(db.collection("found_items").document(item_id).update, update_data)
+        notify_item_fields_changed("found_items", item_id, update_data)
         
         logger.info(f"Gambar utama berhasil diubah untuk item {item_id}")
         return {
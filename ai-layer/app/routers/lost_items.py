@@ -3,8 +3,7 @@
 # noqa
 
 from fastapi import APIRouter, UploadFile, File, Form, Body, Query, HTTPException
-from PIL import Image
-from io import BytesIO
+import asyncio
 import os
 import uuid
 from datetime import datetime
@@ -15,11 +14,13 @@ import numpy as np
 
 from app.services.firebase import db
 from app.services.upload_to_drive import upload_to_drive
-from app.services.image_encoder import extract_features
-from app.services.text_encoder import extract_text_features
-from app.services.hybrid_matcher import find_items_hybrid
+from app.services.image_decode import decode_image
+from app.services.inference_worker import extract_features_async, InferenceQueueFull
+from app.services.text_encoder import encode_text_features
+from app.services.hybrid_matcher import find_items_hybrid_async
 from app.services.text_encoder import find_similar_items_by_text
 from app.services.firebase_storage import save_lost_item
+from app.services.executor import run_cpu, run_io
 
 logger = logging.getLogger(__name__)
 
@@ -54,22 +55,29 @@ async def add_lost_item(
     try:
         logger.info(f"Menambahkan lost item: {item_name}")
         
-        ensure_lost_items_collection()
+        await run_io(ensure_lost_items_collection)
         
         file_content = await file.read()
-        image = Image.open(BytesIO(file_content)).convert("RGB")
+        try:
+            image = await run_cpu(decode_image, file_content)
+        except Exception as img_error:
+            logger.error(f"Error processing image {file.filename}: {str(img_error)}")
+            raise HTTPException(
+                status_code=400,
+                detail=f"Error processing image {file.filename}: {str(img_error)}"
+            )
         
         os.makedirs("temp_images", exist_ok=True)
         file_path = f"temp_images/{uuid.uuid4()}_{file.filename}"
         with open(file_path, "wb") as f:
             f.write(file_content)
         
-        image_url = upload_to_drive(file_path, file.filename)
-        
-        embedding = extract_features(image)
-        text_embedding = None
+        # Upload, inference gambar dan encode teks tidak saling bergantung
+        pending = [run_io(upload_to_drive, file_path, file.filename), extract_features_async(image)]
         if description:
-            text_embedding = extract_text_features(description)
+            pending.append(run_cpu(encode_text_features, description))
+        image_url, embedding, *text_embedding = await asyncio.gather(*pending)
+        text_embedding = text_embedding[0] if text_embedding else None
         
         item_data = {
             "item_name": item_name,
@@ -94,14 +102,16 @@ async def add_lost_item(
         if mysql_id:
             item_data["mysql_id"] = mysql_id
         
-        result = save_lost_item(item_data, image_url, embedding, text_embedding)
-        
-        matches = find_items_hybrid(
-            image=image,
-            text=description,
-            image_threshold=0.7,
-            text_threshold=0.2,
-            collection="found_items"
+        # Pencarian di found_items tidak bergantung pada dokumen lost item yang disimpan
+        result, (matches, match_info) = await asyncio.gather(
+            run_io(save_lost_item, item_data, image_url, embedding, text_embedding),
+            find_items_hybrid_async(
+                image_embedding=embedding,
+                text=description,
+                image_threshold=0.7,
+                text_threshold=0.2,
+                collection="found_items"
+            )
         )
         
         if os.path.exists(file_path):
@@ -118,9 +128,15 @@ async def add_lost_item(
             "item_id": result["id"],
             "image_url": image_url,
             "matches": matches[:5], 
+            "partial_matches": match_info["partial"],
+            "match_branches": match_info["branches"],
             "message": "Lost item added successfully"
         }
         
+    except HTTPException:
+        raise
+    except InferenceQueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         logger.error(f"Error adding lost item: {str(e)}")
         traceback.print_exc()
@@ -136,13 +152,14 @@ async def add_lost_item_text(
         text_embedding = None
         description = item_data.get("description", "")
         if description:
-            text_embedding = extract_text_features(description)
+            text_embedding = await run_cpu(encode_text_features, description)
         
-        result = save_lost_item(item_data, None, None, text_embedding)
+        result = await run_io(save_lost_item, item_data, None, None, text_embedding)
         
         matches = []
         if description:
-            matches = find_similar_items_by_text(
+            matches = await run_cpu(
+                find_similar_items_by_text,
                 description,
                 threshold=0.2,
                 collection="found_items"
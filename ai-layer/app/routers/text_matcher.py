@@ -8,6 +8,10 @@ from app.services.text_encoder import (
     test_text_similarity,
     refresh_all_text_embeddings
 )
+from app.services.executor import run_cpu, run_io
+from app.services.result_cache import query_result_cache, normalize_query
+from app.services.item_filters import build_filters
+from app.services.text_reencoder import start_background_reencode, get_reencode_status
 from typing import Optional, Dict, Any
 from pydantic import BaseModel
 
@@ -33,7 +37,7 @@ async def match_text(
         if max_results < 1:
             raise HTTPException(status_code=400, detail="Max results must be at least 1")
             
-        matches = find_similar_items_by_text(query, threshold=threshold)
+        matches = await run_cpu(find_similar_items_by_text, query, threshold=threshold)
         
         matches = matches[:max_results]
         
@@ -53,7 +57,12 @@ async def search_text(
     q: str = Query(..., description="Query text to search for"),
     threshold: float = Query(0.2, description="Minimum similarity threshold"),
     max_results: int = Query(10, description="Maximum number of results to return"),
-    collection: str = Query("found_items", description="Collection to search in")
+    collection: str = Query("found_items", description="Collection to search in"),
+    category: Optional[str] = Query(None, description="Only items in this category"),
+    location: Optional[str] = Query(None, description="Only items whose location contains this text"),
+    status: Optional[str] = Query(None, description="Only items with this status (default: available found items)"),
+    date_from: Optional[str] = Query(None, description="Earliest found/lost date (YYYY-MM-DD)"),
+    date_to: Optional[str] = Query(None, description="Latest found/lost date (YYYY-MM-DD)")
 ):
     try:
         if not q:
@@ -70,16 +79,31 @@ async def search_text(
             
         if max_results < 1:
             raise HTTPException(status_code=400, detail="Max results must be at least 1")
+        
+        try:
+            filters = build_filters(category, location, status, date_from, date_to)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
             
-        matches = find_similar_items_by_text(q, threshold=threshold, collection=collection)
+        async def search():
+            # Pencarian yang gagal tetap dijawab tanpa hasil, tetapi tidak disimpan di cache
+            try:
+                matches = await run_cpu(find_similar_items_by_text, q, threshold=threshold, collection=collection,
+                                        filters=filters, raise_errors=True)
+            except Exception:
+                return [], False
+            return matches[:max_results], True
         
-        matches = matches[:max_results]
+        key = query_result_cache.make_key("text_search", normalize_query(q), collection, threshold, max_results, filters)
+        matches, cached = await query_result_cache.get_or_compute(key, collection, search)
         
         return {
             "query": q,
             "collection": collection,
             "matches": matches,
-            "total_matches": len(matches)
+            "total_matches": len(matches),
+            "filters": filters,
+            "cached": cached
         }
         
     except Exception as e:
@@ -90,7 +114,7 @@ async def search_text(
 @router.post("/test-similarity")
 async def test_similarity(request: TestSimilarityRequest):
     try:
-        result = test_text_similarity(request.text1, request.text2)
+        result = await run_cpu(test_text_similarity, request.text1, request.text2)
         return result
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error testing text similarity: {str(e)}")
@@ -99,11 +123,31 @@ async def test_similarity(request: TestSimilarityRequest):
 @router.post("/refresh-embeddings")
 async def refresh_embeddings():
     try:
-        result = refresh_all_text_embeddings()
+        result = await run_io(refresh_all_text_embeddings)
         return {
             "success": True,
             "message": f"Successfully refreshed {result['updated_count']} text embeddings",
             "details": result
         }
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error refreshing text embeddings: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Error refreshing text embeddings: {str(e)}")
+
+@router.post("/reencode-stale")
+async def reencode_stale_embeddings():
+    try:
+        started = start_background_reencode()
+        return {
+            "success": True,
+            "started": started,
+            "message": "Re-encode started" if started else "Re-encode already running",
+            "status": await run_io(get_reencode_status)
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error starting re-encode: {str(e)}")
+
+@router.get("/reencode-status")
+async def reencode_status():
+    try:
+        return await run_io(get_reencode_status)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error getting re-encode status: {str(e)}")
@@ -0,0 +1,204 @@
+# pylint: disable=all
+# type: ignore
+# noqa
+
+import logging
+import os
+import time
+import numpy as np
+from scipy import sparse
+from app.config import (
+    IMAGE_ANN_ENGINE,
+    IMAGE_ANN_MIN_ITEMS,
+    IMAGE_ANN_NLIST,
+    IMAGE_ANN_NPROBE,
+    IMAGE_ANN_DIR,
+)
+
+logger = logging.getLogger(__name__)
+
+# Engine pencarian untuk ImageEmbeddingIndex. Engine hanya memilih baris kandidat;
+# skoring cosine, filter status dan threshold tetap dilakukan oleh index.
+#   flat: semua baris dibandingkan (exact), dipakai untuk koleksi kecil dan cek recall
+#   ivf : inverted file - vektor dikelompokkan ke nlist centroid (spherical k-means),
+#         query hanya membandingkan baris di nprobe cluster terdekat
+
+# Centroid dilatih ulang bila jumlah item tumbuh melebihi faktor ini sejak training terakhir
+IVF_RETRAIN_GROWTH = 2.0
+IVF_TRAIN_ITERATIONS = 10
+IVF_TRAIN_POINTS_PER_LIST = 32
+ASSIGN_CHUNK_SIZE = 8192
+
+class FlatSearchEngine:
+    name = "flat"
+
+    def rebuild(self, vectors):
+        pass
+
+    def add(self, row, vector):
+        pass
+
+    def remove(self, row):
+        pass
+
+    def candidates(self, query, nprobe=None):
+        # None berarti semua baris
+        return None
+
+    def get_stats(self):
+        return {"engine": self.name}
+
+def default_nlist(size):
+    return int(np.clip(4 * np.sqrt(max(size, 1)), 16, 4096))
+
+def train_centroids(vectors, nlist, iterations=IVF_TRAIN_ITERATIONS, seed=0):
+    rng = np.random.default_rng(seed)
+    sample_size = min(len(vectors), nlist * IVF_TRAIN_POINTS_PER_LIST)
+    sample = vectors[rng.choice(len(vectors), sample_size, replace=False)]
+    centroids = sample[rng.choice(sample_size, nlist, replace=False)].copy()
+
+    for _ in range(iterations):
+        assignment = np.argmax(sample @ centroids.T, axis=1)
+        one_hot = sparse.csr_matrix((np.ones(sample_size, dtype=np.float32), (assignment, np.arange(sample_size))),
+                                    shape=(nlist, sample_size))
+        sums = np.asarray(one_hot @ sample)
+        counts = np.bincount(assignment, minlength=nlist)
+        empty = counts == 0
+        if empty.any():
+            # Cluster kosong diisi ulang dengan titik acak supaya semua list terpakai
+            sums[empty] = sample[rng.choice(sample_size, int(empty.sum()), replace=False)]
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        centroids = (sums / norms).astype(np.float32)
+    return np.ascontiguousarray(centroids)
+
+class IVFSearchEngine:
+    name = "ivf"
+
+    def __init__(self, collection, nlist=IMAGE_ANN_NLIST, nprobe=IMAGE_ANN_NPROBE, index_dir=IMAGE_ANN_DIR):
+        self.collection = collection
+        self.requested_nlist = nlist
+        self.nprobe = nprobe
+        self.path = os.path.join(index_dir, f"ann_ivf_{collection}.npz") if index_dir else None
+        self.centroids = None
+        self.trained_size = 0
+        self._assignment = np.full(0, -1, dtype=np.int32)
+        self._lists = []
+        self._arrays = []
+        self._load_centroids()
+
+    @property
+    def nlist(self):
+        return 0 if self.centroids is None else self.centroids.shape[0]
+
+    def _load_centroids(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with np.load(self.path) as data:
+                self.centroids = np.ascontiguousarray(data["centroids"], dtype=np.float32)
+                self.trained_size = int(data["trained_size"])
+            logger.info(f"Loaded IVF centroids for {self.collection}: nlist={self.nlist}")
+        except Exception as e:
+            logger.warning(f"Gagal memuat IVF centroids dari {self.path}: {str(e)}")
+
+    def _save_centroids(self):
+        if not self.path:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = f"{self.path}.{os.getpid()}.tmp.npz"
+            np.savez(tmp_path, centroids=self.centroids, trained_size=self.trained_size)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.warning(f"Gagal menyimpan IVF centroids ke {self.path}: {str(e)}")
+
+    def _needs_training(self, vectors):
+        if self.centroids is None or self.centroids.shape[1] != vectors.shape[1]:
+            return True
+        return len(vectors) > IVF_RETRAIN_GROWTH * self.trained_size
+
+    def train(self, vectors):
+        start_time = time.time()
+        nlist = min(self.requested_nlist or default_nlist(len(vectors)), len(vectors))
+        self.centroids = train_centroids(vectors, nlist)
+        self.trained_size = len(vectors)
+        self._save_centroids()
+        logger.info(f"Trained IVF for {self.collection}: nlist={nlist}, {len(vectors)} vectors "
+                    f"in {time.time() - start_time:.2f}s")
+
+    def _nearest_lists(self, vectors):
+        return np.concatenate([
+            np.argmax(vectors[start:start + ASSIGN_CHUNK_SIZE] @ self.centroids.T, axis=1)
+            for start in range(0, len(vectors), ASSIGN_CHUNK_SIZE)
+        ]).astype(np.int32) if len(vectors) else np.zeros(0, dtype=np.int32)
+
+    def rebuild(self, vectors):
+        if len(vectors) == 0:
+            self._assignment = np.full(0, -1, dtype=np.int32)
+            self._lists = [[] for _ in range(self.nlist)]
+            self._arrays = [None] * self.nlist
+            return
+        if self._needs_training(vectors):
+            self.train(vectors)
+
+        self._assignment = self._nearest_lists(vectors)
+        order = np.argsort(self._assignment, kind="stable")
+        bounds = np.searchsorted(self._assignment[order], np.arange(self.nlist + 1))
+        self._arrays = [order[bounds[i]:bounds[i + 1]].astype(np.int64) for i in range(self.nlist)]
+        self._lists = [array.tolist() for array in self._arrays]
+
+    def _ensure_capacity(self, row):
+        if row >= len(self._assignment):
+            assignment = np.full(max(row + 1, 2 * len(self._assignment), 16), -1, dtype=np.int32)
+            assignment[:len(self._assignment)] = self._assignment
+            self._assignment = assignment
+
+    def add(self, row, vector):
+        if self.centroids is None or self.centroids.shape[1] != len(vector):
+            return
+        self.remove(row)
+        list_id = int(np.argmax(self.centroids @ vector))
+        self._ensure_capacity(row)
+        self._assignment[row] = list_id
+        self._lists[list_id].append(row)
+        self._arrays[list_id] = None
+
+    def remove(self, row):
+        if row >= len(self._assignment) or self._assignment[row] < 0:
+            return
+        list_id = int(self._assignment[row])
+        self._lists[list_id].remove(row)
+        self._arrays[list_id] = None
+        self._assignment[row] = -1
+
+    def _list_array(self, list_id):
+        array = self._arrays[list_id]
+        if array is None:
+            array = np.asarray(self._lists[list_id], dtype=np.int64)
+            self._arrays[list_id] = array
+        return array
+
+    def candidates(self, query, nprobe=None):
+        if self.centroids is None or self.centroids.shape[1] != len(query):
+            return None
+        nprobe = min(nprobe or self.nprobe, self.nlist)
+        centroid_scores = self.centroids @ query
+        probe = np.argpartition(-centroid_scores, nprobe - 1)[:nprobe]
+        return np.concatenate([self._list_array(int(list_id)) for list_id in probe])
+
+    def get_stats(self):
+        sizes = [len(items) for items in self._lists]
+        return {
+            "engine": self.name,
+            "nlist": self.nlist,
+            "nprobe": self.nprobe,
+            "trained_size": self.trained_size,
+            "largest_list": max(sizes) if sizes else 0,
+            "avg_list": float(np.mean(sizes)) if sizes else 0.0,
+        }
+
+def create_engine(collection, size, engine=IMAGE_ANN_ENGINE):
+    if engine == "ivf" or (engine == "auto" and size >= IMAGE_ANN_MIN_ITEMS):
+        return IVFSearchEngine(collection)
+    return FlatSearchEngine()
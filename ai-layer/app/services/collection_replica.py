@@ -0,0 +1,289 @@
+# pylint: disable=all
+# type: ignore
+# noqa
+
+import logging
+import threading
+import time
+from datetime import timezone
+from app.config import (
+    FIRESTORE_REPLICA_COLLECTIONS,
+    FIRESTORE_REPLICA_CHECK_SECONDS,
+    FIRESTORE_REPLICA_RECONNECT_MAX_SECONDS,
+)
+
+logger = logging.getLogger(__name__)
+
+# Replika in-process koleksi Firestore lewat listener on_snapshot. Snapshot pertama berisi
+# seluruh dokumen dan dipakai sebagai muat awal (index gambar dan teks dibangun dari snapshot
+# ini); snapshot berikutnya hanya berisi perubahan yang diterapkan ke index lewat index_sync.
+# Selama listener aktif, load index dan pembacaan koleksi (get_documents) memakai replika;
+# jika listener terputus, pembacaan kembali ke stream Firestore sampai tersambung lagi.
+# client bisa diganti (fake / Firestore emulator) untuk pengujian.
+
+def _seconds(value):
+    # update_time / read_time Firestore (datetime atau protobuf Timestamp) -> detik epoch
+    if value is None:
+        return None
+    if hasattr(value, "ToDatetime"):
+        value = value.ToDatetime().replace(tzinfo=timezone.utc)
+    if hasattr(value, "timestamp"):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return value.timestamp()
+    return float(value)
+
+class CollectionReplica:
+    def __init__(self, collection, client=None):
+        self.collection = collection
+        self._client = client
+        self._documents = {}
+        self._update_times = {}
+        self._lock = threading.Lock()
+        # Snapshot diterapkan berurutan; callback listener lama diabaikan setelah reconnect
+        self._apply_lock = threading.Lock()
+        self._subscription = 0
+        self._awaiting_full = False
+        self._watch = None
+        self._stop = threading.Event()
+        self._monitor_thread = None
+        self.ready = threading.Event()
+        self.metrics = {
+            "snapshots": 0,
+            "added": 0,
+            "modified": 0,
+            "removed": 0,
+            "resyncs": 0,
+            "reconnects": 0,
+            "errors": 0,
+            "initial_load_seconds": None,
+            "last_snapshot_at": None,
+            "last_lag_ms": None,
+            "max_lag_ms": 0.0,
+            "lag_total_ms": 0.0,
+            "lag_samples": 0,
+        }
+
+    def _collection_ref(self):
+        client = self._client
+        if client is None:
+            from app.services.firebase import db as client
+        return client.collection(self.collection)
+
+    def start(self):
+        self._stop.clear()
+        self.subscribe()
+        self._monitor_thread = threading.Thread(target=self._monitor, name=f"replica-{self.collection}", daemon=True)
+        self._monitor_thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self.unsubscribe()
+        if self._monitor_thread is not None:
+            self._monitor_thread.join(timeout=5)
+            self._monitor_thread = None
+
+    def subscribe(self):
+        with self._lock:
+            self._subscription += 1
+            subscription = self._subscription
+            self._awaiting_full = True
+        watch = self._collection_ref().on_snapshot(
+            lambda documents, changes, read_time: self._on_snapshot(subscription, documents, changes, read_time))
+        with self._lock:
+            self._watch = watch
+
+    def unsubscribe(self):
+        with self._lock:
+            watch, self._watch = self._watch, None
+            self._subscription += 1
+        if watch is not None:
+            try:
+                watch.unsubscribe()
+            except Exception as e:
+                logger.warning(f"Gagal menutup listener replika {self.collection}: {str(e)}")
+
+    def is_active(self):
+        watch = self._watch
+        return watch is not None and getattr(watch, "is_active", True)
+
+    def is_live(self):
+        return self.ready.is_set() and self.is_active()
+
+    def documents(self):
+        # Dict dokumen diganti utuh saat berubah (tidak dimutasi), jadi salinan list sudah konsisten
+        with self._lock:
+            return list(self._documents.items())
+
+    def _on_snapshot(self, subscription, documents, changes, read_time):
+        # Dipanggil dari thread listener Firestore
+        try:
+            with self._apply_lock:
+                if subscription != self._subscription:
+                    return
+                if self._awaiting_full:
+                    self._apply_full(documents)
+                    self._awaiting_full = False
+                else:
+                    self._apply_changes(changes)
+                self.metrics["snapshots"] += 1
+                self.metrics["last_snapshot_at"] = time.time()
+        except Exception as e:
+            self.metrics["errors"] += 1
+            logger.error(f"Error menerapkan snapshot replika {self.collection}: {str(e)}")
+
+    def _apply_full(self, documents):
+        snapshot = {doc.id: (doc.to_dict(), doc.update_time) for doc in documents}
+
+        if not self.ready.is_set():
+            start_time = time.time()
+            with self._lock:
+                self._documents = {doc_id: data for doc_id, (data, _) in snapshot.items()}
+                self._update_times = {doc_id: update_time for doc_id, (_, update_time) in snapshot.items()}
+            self._load_indexes()
+            self.metrics["initial_load_seconds"] = time.time() - start_time
+            self.ready.set()
+            logger.info(f"Replika {self.collection}: {len(snapshot)} dokumen dimuat "
+                        f"dalam {self.metrics['initial_load_seconds']:.2f} detik")
+            return
+
+        # Snapshot penuh setelah reconnect: hanya selisih terhadap replika yang diterapkan
+        from app.services.index_sync import notify_item_replicated, notify_item_removed
+
+        with self._lock:
+            removed = [doc_id for doc_id in self._documents if doc_id not in snapshot]
+            changed = [doc_id for doc_id, (_, update_time) in snapshot.items()
+                       if doc_id not in self._documents or self._update_times.get(doc_id) != update_time]
+        for doc_id in removed:
+            self._remove(doc_id)
+            notify_item_removed(self.collection, doc_id)
+        for doc_id in changed:
+            data, update_time = snapshot[doc_id]
+            self._store(doc_id, data, update_time)
+            notify_item_replicated(self.collection, doc_id, data)
+        self.metrics["resyncs"] += 1
+        logger.info(f"Replika {self.collection} disinkronkan ulang: {len(changed)} berubah, {len(removed)} dihapus")
+
+    def _apply_changes(self, changes):
+        from app.services.index_sync import notify_item_replicated, notify_item_removed
+
+        now = time.time()
+        for change in changes:
+            doc = change.document
+            kind = change.type.name
+            if kind == "REMOVED":
+                self._remove(doc.id)
+                notify_item_removed(self.collection, doc.id)
+                self.metrics["removed"] += 1
+            else:
+                data = doc.to_dict()
+                self._store(doc.id, data, doc.update_time)
+                notify_item_replicated(self.collection, doc.id, data)
+                self.metrics["added" if kind == "ADDED" else "modified"] += 1
+
+            # Lag = waktu commit dokumen di Firestore sampai perubahan diterapkan ke index
+            committed_at = _seconds(getattr(doc, "update_time", None) or getattr(doc, "read_time", None))
+            if committed_at is not None:
+                lag_ms = max(0.0, (time.time() - committed_at) * 1000)
+                self.metrics["last_lag_ms"] = lag_ms
+                self.metrics["max_lag_ms"] = max(self.metrics["max_lag_ms"], lag_ms)
+                self.metrics["lag_total_ms"] += lag_ms
+                self.metrics["lag_samples"] += 1
+        if changes:
+            logger.debug(f"Replika {self.collection}: {len(changes)} perubahan dalam {(time.time() - now) * 1000:.1f} ms")
+
+    def _store(self, doc_id, data, update_time):
+        with self._lock:
+            self._documents[doc_id] = data
+            self._update_times[doc_id] = update_time
+
+    def _remove(self, doc_id):
+        with self._lock:
+            self._documents.pop(doc_id, None)
+            self._update_times.pop(doc_id, None)
+
+    def _load_indexes(self):
+        from app.services.image_index import get_image_index
+        from app.services.text_index import get_text_index
+        from app.services.index_sync import bump_generation
+
+        documents = self.documents()
+        for index in (get_image_index(self.collection, load=False), get_text_index(self.collection, load=False)):
+            with index._load_lock:
+                index.load(documents)
+        bump_generation(self.collection)
+
+    def _monitor(self):
+        # Listener yang berhenti (error non-retryable, koneksi putus) dibuat ulang dengan backoff
+        delay = FIRESTORE_REPLICA_CHECK_SECONDS
+        backoff = 1
+        while not self._stop.wait(delay):
+            if self.is_active():
+                delay, backoff = FIRESTORE_REPLICA_CHECK_SECONDS, 1
+                continue
+            logger.warning(f"Listener replika {self.collection} tidak aktif, menyambung ulang")
+            self.unsubscribe()
+            try:
+                self.subscribe()
+                self.metrics["reconnects"] += 1
+                delay = FIRESTORE_REPLICA_CHECK_SECONDS
+            except Exception as e:
+                self.metrics["errors"] += 1
+                logger.error(f"Gagal menyambung ulang listener replika {self.collection}: {str(e)}")
+                delay = min(backoff, FIRESTORE_REPLICA_RECONNECT_MAX_SECONDS)
+                backoff *= 2
+
+    def get_stats(self):
+        with self._lock:
+            count = len(self._documents)
+        stats = dict(self.metrics)
+        samples = stats.pop("lag_samples")
+        stats["avg_lag_ms"] = stats.pop("lag_total_ms") / samples if samples else None
+        stats["documents"] = count
+        stats["ready"] = self.ready.is_set()
+        stats["active"] = self.is_active()
+        last = stats["last_snapshot_at"]
+        stats["seconds_since_snapshot"] = time.time() - last if last is not None else None
+        return stats
+
+_replicas = {}
+_replicas_lock = threading.Lock()
+
+def start_replicas(collections=FIRESTORE_REPLICA_COLLECTIONS, client=None):
+    with _replicas_lock:
+        for collection in collections:
+            if collection in _replicas:
+                continue
+            replica = CollectionReplica(collection, client=client)
+            try:
+                replica.start()
+            except Exception as e:
+                logger.error(f"Gagal memulai replika {collection}, memakai stream Firestore: {str(e)}")
+                continue
+            _replicas[collection] = replica
+    return dict(_replicas)
+
+def stop_replicas():
+    with _replicas_lock:
+        replicas = list(_replicas.values())
+        _replicas.clear()
+    for replica in replicas:
+        replica.stop()
+
+def get_replica(collection):
+    return _replicas.get(collection)
+
+def is_replicated(collection):
+    replica = _replicas.get(collection)
+    return replica is not None and replica.is_live()
+
+def get_documents(collection):
+    """(id, data) semua dokumen koleksi: dari replika jika aktif, selain itu stream Firestore"""
+    replica = _replicas.get(collection)
+    if replica is not None and replica.is_live():
+        return replica.documents()
+    from app.services.firebase import db
+    return ((doc.id, doc.to_dict()) for doc in db.collection(collection).stream())
+
+def get_replica_stats():
+    return {collection: replica.get_stats() for collection, replica in list(_replicas.items())}
@@ -0,0 +1,126 @@
+# pylint: disable=all
+# type: ignore
+# noqa
+
+import hashlib
+import logging
+import os
+import threading
+from collections import OrderedDict
+import numpy as np
+from app.config import (
+    IMAGE_EMBEDDING_CACHE_SIZE,
+    IMAGE_EMBEDDING_CACHE_DISK,
+    IMAGE_EMBEDDING_CACHE_DIR,
+)
+
+logger = logging.getLogger(__name__)
+
+# Cache embedding gambar berdasarkan hash isi file + versi model. Gambar yang sama
+# (retry upload, re-post dari syncService, image_url yang di-fetch ulang) tidak
+# perlu melewati CNN lagi.
+
+def content_hash(data):
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+def cache_key(image_hash, model_version):
+    return hashlib.blake2b(f"{model_version}:{image_hash}".encode(), digest_size=16).hexdigest()
+
+class EmbeddingCache:
+    def __init__(self, max_entries=IMAGE_EMBEDDING_CACHE_SIZE, disk_dir=None):
+        self.max_entries = max_entries
+        self.disk_dir = disk_dir
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {
+            "hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "stores": 0,
+            "evictions": 0,
+            "encoded": 0,
+            "total_encode_ms": 0.0,
+        }
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, key[:2], f"{key}.npy")
+
+    def get(self, key):
+        with self._lock:
+            embedding = self._entries.get(key)
+            if embedding is not None:
+                self._entries.move_to_end(key)
+                self.stats["hits"] += 1
+                return embedding
+
+        if self.disk_dir:
+            try:
+                embedding = np.load(self._disk_path(key))
+                self._remember(key, embedding)
+                with self._lock:
+                    self.stats["hits"] += 1
+                    self.stats["disk_hits"] += 1
+                return embedding
+            except (OSError, ValueError):
+                pass
+
+        with self._lock:
+            self.stats["misses"] += 1
+        return None
+
+    def _remember(self, key, embedding):
+        with self._lock:
+            self._entries[key] = embedding
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats["evictions"] += 1
+
+    def put(self, key, embedding):
+        if self.max_entries <= 0 and not self.disk_dir:
+            return
+        embedding = np.asarray(embedding, dtype=np.float32)
+        embedding.setflags(write=False)
+        if self.max_entries > 0:
+            self._remember(key, embedding)
+        with self._lock:
+            self.stats["stores"] += 1
+
+        if self.disk_dir:
+            path = self._disk_path(key)
+            try:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                tmp_path = f"{path}.{os.getpid()}.tmp"
+                with open(tmp_path, "wb") as f:
+                    np.save(f, embedding)
+                os.replace(tmp_path, path)
+            except OSError as e:
+                logger.warning(f"Gagal menyimpan embedding cache ke disk: {str(e)}")
+
+    def record_encode(self, count, elapsed_ms):
+        with self._lock:
+            self.stats["encoded"] += count
+            self.stats["total_encode_ms"] += elapsed_ms
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self.stats)
+            stats["entries"] = len(self._entries)
+        stats["max_entries"] = self.max_entries
+        stats["disk_enabled"] = bool(self.disk_dir)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        avg_encode_ms = stats["total_encode_ms"] / stats["encoded"] if stats["encoded"] else 0.0
+        stats["avg_encode_ms_per_image"] = avg_encode_ms
+        # Perkiraan waktu CNN yang dihemat: setiap hit menggantikan satu encode rata-rata
+        stats["estimated_saved_ms"] = stats["hits"] * avg_encode_ms
+        return stats
+
+image_embedding_cache = EmbeddingCache(
+    IMAGE_EMBEDDING_CACHE_SIZE,
+    disk_dir=IMAGE_EMBEDDING_CACHE_DIR if IMAGE_EMBEDDING_CACHE_DISK else None,
+)
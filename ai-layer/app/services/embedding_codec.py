@@ -0,0 +1,107 @@
+# pylint: disable=all
+# type: ignore
+# noqa
+
+import struct
+import numpy as np
+from scipy import sparse
+from app.config import IMAGE_EMBEDDING_WIRE_DTYPE
+
+# Format penyimpanan text embedding di Firestore. Dokumen lama menyimpan vektor
+# dense berupa list float; dokumen baru menyimpan map berisi indeks term dan nilainya.
+SPARSE_TEXT_FORMAT = "sparse"
+LEGACY_TEXT_VERSION = "legacy"
+
+def encode_text_embedding(features, version):
+    if sparse.issparse(features):
+        row = sparse.csr_matrix(features)
+        row.sum_duplicates()
+        dim = row.shape[1]
+        indices = row.indices
+        values = row.data
+    else:
+        dense = np.asarray(features, dtype=np.float64).ravel()
+        dim = dense.shape[0]
+        indices = np.flatnonzero(dense)
+        values = dense[indices]
+
+    order = np.argsort(indices)
+    return {
+        "format": SPARSE_TEXT_FORMAT,
+        "version": version or LEGACY_TEXT_VERSION,
+        "dim": int(dim),
+        "indices": [int(i) for i in np.asarray(indices)[order]],
+        "values": [float(v) for v in np.asarray(values)[order]],
+    }
+
+def is_sparse_text_embedding(value):
+    return isinstance(value, dict) and value.get("format") == SPARSE_TEXT_FORMAT
+
+def has_text_embedding(value):
+    if value is None:
+        return False
+    if is_sparse_text_embedding(value):
+        return value.get("dim", 0) > 0
+    if sparse.issparse(value):
+        return value.shape[1] > 0
+    return len(value) > 0
+
+def text_embedding_version(value):
+    if is_sparse_text_embedding(value):
+        return value.get("version", LEGACY_TEXT_VERSION)
+    return LEGACY_TEXT_VERSION
+
+def text_embedding_dim(value):
+    if is_sparse_text_embedding(value):
+        return int(value.get("dim", 0))
+    if sparse.issparse(value):
+        return value.shape[1]
+    return len(value)
+
+def decode_text_embedding(value):
+    # Mengembalikan baris CSR 1 x dim, baik dari format sparse maupun list dense lama
+    if sparse.issparse(value):
+        return sparse.csr_matrix(value, dtype=np.float32)
+    if is_sparse_text_embedding(value):
+        indices = np.asarray(value.get("indices", []), dtype=np.int32)
+        values = np.asarray(value.get("values", []), dtype=np.float32)
+        return sparse.csr_matrix(
+            (values, indices, np.array([0, len(indices)], dtype=np.int32)),
+            shape=(1, int(value.get("dim", 0)))
+        )
+    dense = np.asarray(value, dtype=np.float32).reshape(1, -1)
+    return sparse.csr_matrix(dense)
+
+# Embedding gambar disimpan sebagai bytes: header 8 byte (magic, versi, kode dtype,
+# dimensi) diikuti vektor yang sudah dinormalisasi L2 dalam little-endian float32/float16.
+# Dokumen lama berisi list float tetap bisa dibaca.
+IMAGE_EMBEDDING_MAGIC = b"UEMB"
+IMAGE_EMBEDDING_VERSION = 1
+_IMAGE_HEADER = struct.Struct("<4sBBH")
+_DTYPE_CODES = {"float32": 1, "float16": 2}
+_CODE_DTYPES = {1: np.dtype("<f4"), 2: np.dtype("<f2")}
+
+def is_binary_image_embedding(value):
+    return isinstance(value, (bytes, bytearray, memoryview)) and bytes(value[:4]) == IMAGE_EMBEDDING_MAGIC
+
+def encode_image_embedding(embedding, dtype=IMAGE_EMBEDDING_WIRE_DTYPE):
+    vector = np.asarray(embedding, dtype=np.float32).ravel()
+    norm = float(np.linalg.norm(vector))
+    if norm > 0:
+        vector = vector / norm
+    if dtype not in _DTYPE_CODES:
+        # "list": format lama, untuk rollback / klien yang belum mendukung bytes
+        return vector.tolist()
+    code = _DTYPE_CODES[dtype]
+    header = _IMAGE_HEADER.pack(IMAGE_EMBEDDING_MAGIC, IMAGE_EMBEDDING_VERSION, code, vector.shape[0])
+    return header + vector.astype(_CODE_DTYPES[code]).tobytes()
+
+def decode_image_embedding(value):
+    # float32 dikembalikan sebagai view read-only atas bytes (tanpa salinan)
+    if is_binary_image_embedding(value):
+        _, version, code, dim = _IMAGE_HEADER.unpack_from(value)
+        if version != IMAGE_EMBEDDING_VERSION or code not in _CODE_DTYPES:
+            raise ValueError(f"Format embedding gambar tidak dikenal (versi {version}, dtype {code})")
+        vector = np.frombuffer(value, dtype=_CODE_DTYPES[code], count=dim, offset=_IMAGE_HEADER.size)
+        return vector if code == 1 else vector.astype(np.float32)
+    return np.asarray(value, dtype=np.float32).ravel()
@@ -0,0 +1,157 @@
+# pylint: disable=all
+# type: ignore
+# noqa
+
+import asyncio
+import functools
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from app.config import (
+    EXECUTOR_IO_THREADS,
+    EXECUTOR_CPU_THREADS,
+    EXECUTOR_PROCESS_WORKERS,
+    BLAS_NUM_THREADS,
+)
+
+logger = logging.getLogger(__name__)
+
+# Handler async tidak boleh memanggil kode blocking secara langsung. Pekerjaan dipisah:
+#   io     : Firestore, upload ke Drive, file - banyak thread, sebagian besar menunggu jaringan
+#   cpu    : decode gambar, scoring numpy/sklearn - thread terbatas, BLAS per thread dibatasi
+#   process: scoring berat opsional (EXECUTOR_PROCESS_WORKERS > 0), fungsi harus picklable
+# Inference MobileNet tetap lewat inference_worker (thread sendiri, torch.set_num_threads).
+
+class _Pool:
+    def __init__(self, name, factory, size):
+        self.name = name
+        self.size = size
+        self._factory = factory
+        self._executor = None
+        self._lock = threading.Lock()
+        self.metrics = {
+            "submitted": 0,
+            "completed": 0,
+            "failed": 0,
+            "active": 0,
+            "max_active": 0,
+            "max_queued": 0,
+            "total_wait_ms": 0.0,
+            "total_run_ms": 0.0,
+        }
+
+    @property
+    def executor(self):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = self._factory(self.size)
+        return self._executor
+
+    def _queued(self):
+        return self.metrics["submitted"] - self.metrics["completed"] - self.metrics["failed"] - self.metrics["active"]
+
+    def _started(self, submitted_at):
+        with self._lock:
+            self.metrics["active"] += 1
+            self.metrics["max_active"] = max(self.metrics["max_active"], self.metrics["active"])
+            self.metrics["total_wait_ms"] += (time.perf_counter() - submitted_at) * 1000
+
+    def _finished(self, started_at, failed):
+        with self._lock:
+            self.metrics["active"] -= 1
+            self.metrics["failed" if failed else "completed"] += 1
+            self.metrics["total_run_ms"] += (time.perf_counter() - started_at) * 1000
+
+    def _submitted(self):
+        with self._lock:
+            self.metrics["submitted"] += 1
+            self.metrics["max_queued"] = max(self.metrics["max_queued"], self._queued())
+
+    def _wrap(self, func, submitted_at):
+        def run():
+            self._started(submitted_at)
+            started_at = time.perf_counter()
+            failed = True
+            try:
+                result = func()
+                failed = False
+                return result
+            finally:
+                self._finished(started_at, failed)
+        return run
+
+    async def run(self, func, *args, **kwargs):
+        call = functools.partial(func, *args, **kwargs)
+        self._submitted()
+        return await asyncio.get_running_loop().run_in_executor(self.executor, self._wrap(call, time.perf_counter()))
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    def get_metrics(self):
+        with self._lock:
+            metrics = dict(self.metrics)
+            metrics["queued"] = self._queued()
+        finished = max(metrics["completed"] + metrics["failed"], 1)
+        metrics["size"] = self.size
+        metrics["saturation"] = metrics["active"] / self.size if self.size else 0.0
+        metrics["avg_wait_ms"] = metrics["total_wait_ms"] / finished
+        metrics["avg_run_ms"] = metrics["total_run_ms"] / finished
+        return metrics
+
+class _ProcessPool(_Pool):
+    # Fungsi dijalankan di proses lain, jadi hanya waktu total yang diukur di sini
+    async def run(self, func, *args, **kwargs):
+        self._submitted()
+        submitted_at = time.perf_counter()
+        self._started(submitted_at)
+        failed = True
+        try:
+            result = await asyncio.get_running_loop().run_in_executor(
+                self.executor, functools.partial(func, *args, **kwargs))
+            failed = False
+            return result
+        finally:
+            self._finished(submitted_at, failed)
+
+def configure_compute_threads():
+    # Batas thread BLAS (numpy/scipy/sklearn) berlaku untuk seluruh proses. Dengan
+    # EXECUTOR_CPU_THREADS tugas paralel x BLAS_NUM_THREADS thread per tugas, total
+    # thread kira-kira sama dengan jumlah core (thread torch diatur saat model dimuat).
+    try:
+        from threadpoolctl import threadpool_limits
+        threadpool_limits(BLAS_NUM_THREADS)
+        logger.info(f"Thread pool: io={EXECUTOR_IO_THREADS}, cpu={EXECUTOR_CPU_THREADS}, "
+                    f"process={EXECUTOR_PROCESS_WORKERS}, BLAS threads={BLAS_NUM_THREADS}")
+    except Exception as e:
+        logger.warning(f"Tidak dapat membatasi thread BLAS: {str(e)}")
+
+io_pool = _Pool("io", lambda size: ThreadPoolExecutor(max_workers=size, thread_name_prefix="io"), EXECUTOR_IO_THREADS)
+cpu_pool = _Pool("cpu", lambda size: ThreadPoolExecutor(max_workers=size, thread_name_prefix="cpu"), EXECUTOR_CPU_THREADS)
+process_pool = _ProcessPool("process", lambda size: ProcessPoolExecutor(max_workers=size), EXECUTOR_PROCESS_WORKERS)
+
+async def run_io(func, *args, **kwargs):
+    return await io_pool.run(func, *args, **kwargs)
+
+async def run_cpu(func, *args, **kwargs):
+    return await cpu_pool.run(func, *args, **kwargs)
+
+async def run_process(func, *args, **kwargs):
+    # Tanpa process pool (default) pekerjaan dijalankan di CPU pool
+    if process_pool.size > 0:
+        return await process_pool.run(func, *args, **kwargs)
+    return await cpu_pool.run(func, *args, **kwargs)
+
+def shutdown_pools():
+    for pool in (io_pool, cpu_pool, process_pool):
+        pool.shutdown()
+
+def get_executor_metrics():
+    metrics = {pool.name: pool.get_metrics() for pool in (io_pool, cpu_pool)}
+    if process_pool.size > 0:
+        metrics["process"] = process_pool.get_metrics()
+    return metrics
@@ -2,10 +2,15 @@
 # type: ignore
 # noqa
 
+import os
 import firebase_admin
 from firebase_admin import credentials, firestore
 
 
-cred = credentials.Certificate("firebase_key/serviceAccountKey.json")
-firebase_admin.initialize_app(cred)
+if os.getenv("FIRESTORE_EMULATOR_HOST"):
+    # Firestore emulator untuk pengujian lokal (misalnya replika on_snapshot), tanpa service account
+    firebase_admin.initialize_app(options={"projectId": os.getenv("FIREBASE_PROJECT_ID", "demo-unylost")})
+else:
+    cred = credentials.Certificate("firebase_key/serviceAccountKey.json")
+    firebase_admin.initialize_app(cred)
 db = firestore.client()
@@ -4,6 +4,9 @@
 
 from firebase_admin import storage
 from app.services.firebase import db
+from app.services.embedding_codec import encode_text_embedding, is_sparse_text_embedding, encode_image_embedding
+from app.services.index_sync import notify_item_saved, notify_item_status_changed, notify_item_fields_changed
+from app.services.text_encoder import compute_text_fields, get_vectorizer_version
 import uuid
 from datetime import datetime
 
@@ -27,12 +30,17 @@ def save_found_item(item_data, image_url=None, image_embedding=None, text_embedd
         data["image_url"] = image_url
     
     if image_embedding is not None:
-        data["embedding"] = image_embedding.tolist()
+        data["embedding"] = encode_image_embedding(image_embedding)
     
     if text_embedding is not None:
-        data["text_embedding"] = text_embedding.tolist()
+        if not is_sparse_text_embedding(text_embedding):
+            # Fitur mentah berasal dari vectorizer aktif
+            text_embedding = encode_text_embedding(text_embedding, get_vectorizer_version())
+        data["text_embedding"] = text_embedding
+        data.update(compute_text_fields(data["description"], data["item_name"]))
     
     db.collection("found_items").document(item_id).set(data, merge=True)
+    notify_item_saved("found_items", item_id, data)
     
     return {"id": item_id, **data}
 
@@ -63,12 +71,17 @@ def save_lost_item(item_data, image_url=None, image_embedding=None, text_embeddi
         data["image_url"] = image_url
     
     if image_embedding is not None:
-        data["embedding"] = image_embedding.tolist()
+        data["embedding"] = encode_image_embedding(image_embedding)
     
     if text_embedding is not None:
-        data["text_embedding"] = text_embedding.tolist()
+        if not is_sparse_text_embedding(text_embedding):
+            # Fitur mentah berasal dari vectorizer aktif
+            text_embedding = encode_text_embedding(text_embedding, get_vectorizer_version())
+        data["text_embedding"] = text_embedding
+        data.update(compute_text_fields(data["description"], data["item_name"]))
     
     db.collection("lost_items").document(item_id).set(data, merge=True)
+    notify_item_saved("lost_items", item_id, data)
     
     return {"id": item_id, **data}
 
@@ -82,9 +95,16 @@ def get_item_by_id(item_id, collection="found_items"):
         return None
 
 def update_item_status(item_id, status, collection="found_items"):
-    db.collection(collection).document(item_id).update({
-        "status": status,
-        "updated_at": datetime.now().isoformat()
-    })
+    update_data = dict(status) if isinstance(status, dict) else {"status": status}
+    status = update_data.get("status")
+    if not status:
+        raise ValueError("update_item_status membutuhkan nilai status")
+    update_data["updated_at"] = datetime.now().isoformat()
+    db.collection(collection).document(item_id).update(update_data)
+    notify_item_status_changed(collection, item_id, status)
+    # Field lain (claimed_by, kategori, lokasi, ...) ikut diteruskan ke index
+    other_fields = {key: value for key, value in update_data.items() if key not in ("status", "updated_at")}
+    if other_fields:
+        notify_item_fields_changed(collection, item_id, other_fields)
     
     return {"message": f"Status updated to {status}"}
\ No newline at end of file
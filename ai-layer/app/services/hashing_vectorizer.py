@@ -0,0 +1,51 @@
+# pylint: disable=all
+# type: ignore
+# noqa
+
+import hashlib
+import numpy as np
+from scipy import sparse
+from sklearn.feature_extraction.text import HashingVectorizer
+
+# Encoder teks tanpa fit: token custom_tokenizer + n-gram 1-3 di-hash ke dimensi tetap.
+# Vektor yang disimpan hanya berisi sublinear tf ternormalisasi (tanpa idf), sehingga tidak
+# berubah ketika korpus bertambah dan tidak perlu di-encode ulang. Bobot idf dihitung dari
+# document frequency item di text index (lihat text_index) dan diterapkan saat pencarian.
+
+HASHING_VERSION_PREFIX = "hash-"
+
+def is_hashing_version(version):
+    return isinstance(version, str) and version.startswith(HASHING_VERSION_PREFIX)
+
+def idf_from_document_frequency(df, n_documents):
+    # Rumus smooth idf yang sama dengan TfidfVectorizer
+    return np.log((1.0 + n_documents) / (1.0 + np.asarray(df, dtype=np.float64))) + 1.0
+
+class HashingTextEncoder:
+    def __init__(self, tokenizer, stop_words, n_features, ngram_range=(1, 3), sublinear_tf=True):
+        self.n_features = n_features
+        self.ngram_range = tuple(ngram_range)
+        self.sublinear_tf = sublinear_tf
+        self._hasher = HashingVectorizer(
+            lowercase=True,
+            tokenizer=tokenizer,
+            token_pattern=None,
+            stop_words=list(stop_words),
+            ngram_range=self.ngram_range,
+            n_features=n_features,
+            alternate_sign=False,
+            norm=None,
+        )
+        # Versi berubah jika parameter atau stopwords berubah karena hash term ikut berubah
+        digest = hashlib.sha1(repr((n_features, self.ngram_range, sublinear_tf,
+                                    sorted(stop_words), getattr(tokenizer, "__name__", ""))).encode("utf-8"))
+        self.version = HASHING_VERSION_PREFIX + digest.hexdigest()[:10]
+
+    def transform(self, raw_documents):
+        counts = sparse.csr_matrix(self._hasher.transform(raw_documents), dtype=np.float64)
+        counts.sum_duplicates()
+        if self.sublinear_tf:
+            counts.data = np.log(counts.data) + 1.0
+        norms = np.sqrt(np.asarray(counts.multiply(counts).sum(axis=1)).ravel())
+        norms[norms == 0] = 1.0
+        return sparse.diags(1.0 / norms).dot(counts).tocsr()
@@ -3,15 +3,195 @@
 # noqa
 
 from app.services.image_encoder import extract_features, find_similar_items
-from app.services.text_encoder import extract_text_features, find_similar_items_by_text
+from app.services.text_encoder import extract_text_features, find_similar_items_by_text, score_text_query, cut_text_scores
+from app.services.image_index import get_image_index
+from app.services.text_index import get_text_index, TextEmbeddingIndex
+from app.services.collection_replica import get_documents
+from app.services.executor import run_cpu, run_io
+from app.services.inference_worker import extract_features_async, InferenceQueueFull
+from app.config import HYBRID_TIME_BUDGET_MS
 from PIL import Image
 import numpy as np
 from typing import List, Dict, Union, Optional
+import asyncio
 import logging
 import time
 
 logger = logging.getLogger(__name__)
 
+def get_hybrid_indexes(collection="found_items"):
+    # Index gambar dan teks yang perlu dimuat dibangun dari satu kali stream koleksi
+    image_index = get_image_index(collection, load=False)
+    text_index = get_text_index(collection, load=False)
+    if image_index.is_stale() or text_index.is_stale():
+        with image_index._load_lock, text_index._load_lock:
+            stale = [index for index in (image_index, text_index) if index.is_stale()]
+            if stale:
+                start_time = time.time()
+                documents = list(get_documents(collection))
+                for index in stale:
+                    index.load(documents)
+                logger.info(f"Memuat {len(stale)} index {collection} dari {len(documents)} dokumen "
+                            f"dalam {time.time() - start_time:.2f} detik")
+    return image_index, text_index
+
+# Seperti find_similar_items / find_similar_items_by_text, error pada satu modalitas
+# dicatat dan modalitas tersebut dianggap tanpa kecocokan. Versi async meneruskan error
+# (raise_errors) supaya cabang ditandai "error" dan hasil parsialnya tidak di-cache
+
+def _image_candidates(image_index, image_embedding, image_threshold, filters=None, raise_errors=False):
+    try:
+        rows, scores, metadata = image_index.search_rows(image_embedding, threshold=image_threshold, filters=filters)
+        return [metadata[row] for row in rows], scores
+    except Exception as e:
+        logger.error(f"Error finding similar items: {str(e)}")
+        if raise_errors:
+            raise
+        return [], np.empty(0, dtype=np.float32)
+
+def _text_candidates(text_index, text, text_threshold, filters=None, raise_errors=False):
+    # Mengembalikan (compiled, rows, scores, query_words, urutan skor menurun), lihat score_text_query
+    try:
+        return score_text_query(text, text_threshold, index=text_index, filters=filters)
+    except Exception as e:
+        logger.error(f"Error dalam text matching: {str(e)}")
+        if raise_errors:
+            raise
+        empty = np.empty(0, dtype=np.int64)
+        return None, empty, {}, [], empty
+
+# Skor tiap modalitas dihitung sekali pada threshold terendah yang dibutuhkan (termasuk
+# fallback); threshold yang lebih tinggi hanya memotong hasil tersebut
+
+def _cut_candidates(image_candidates, text_candidates, image_threshold, text_threshold):
+    if image_candidates is not None:
+        items, scores = image_candidates
+        count = int(np.count_nonzero(scores >= image_threshold))
+        image_candidates = items[:count], scores[:count]
+    if text_candidates is not None:
+        text_candidates = cut_text_scores(text_candidates, text_threshold)
+    return image_candidates, text_candidates
+
+def _floor_thresholds(image_threshold, text_threshold, fallback_thresholds):
+    if not fallback_thresholds:
+        return image_threshold, text_threshold
+    return (min(image_threshold, fallback_thresholds.get("image_threshold", image_threshold)),
+            min(text_threshold, fallback_thresholds.get("text_threshold", text_threshold)))
+
+def _fuse_with_fallback(image_candidates, text_candidates, image_threshold, text_threshold,
+                        image_weight, text_weight, max_results, fallback_thresholds=None):
+    results = _fuse_candidates(*_cut_candidates(image_candidates, text_candidates, image_threshold, text_threshold),
+                               image_weight, text_weight, max_results)
+    if results or not fallback_thresholds:
+        return results, False
+    
+    # Fallback memakai skor yang sama dengan threshold lebih rendah dan rumus tanpa bonus
+    cut = _cut_candidates(image_candidates, text_candidates,
+                          fallback_thresholds.get("image_threshold", image_threshold),
+                          fallback_thresholds.get("text_threshold", text_threshold))
+    results = _fuse_candidates(*cut, image_weight, text_weight, max_results, bonus=False)
+    for result in results:
+        result["fallback"] = True
+    logger.info(f"Fallback menemukan {len(results)} kecocokan dengan threshold lebih rendah")
+    return results, True
+
+def _fuse_candidates(image_candidates, text_candidates, image_weight, text_weight, max_results, bonus=True):
+    # Kandidat kedua modalitas disejajarkan per item (slot) lalu skor hybrid dihitung
+    # sekaligus dengan numpy; dict hasil hanya dibuat untuk max_results teratas.
+    # image_candidates / text_candidates bernilai None jika modalitas tidak dipakai.
+    slot_of_id = {}
+    image_items, image_scores = image_candidates or ([], np.empty(0, dtype=np.float32))
+    for item in image_items:
+        slot_of_id.setdefault(item["id"], len(slot_of_id))
+    
+    compiled, text_rows, text_scores, query_words, text_order = text_candidates or (None, None, {}, [], np.empty(0, dtype=np.int64))
+    text_ids = compiled["ids"] if compiled is not None else []
+    for i in text_order:
+        slot_of_id.setdefault(text_ids[text_rows[i]], len(slot_of_id))
+    
+    count = len(slot_of_id)
+    if count == 0:
+        return []
+    
+    image_score = np.zeros(count)
+    image_position = np.full(count, -1, dtype=np.int64)
+    if len(image_items):
+        image_slots = np.array([slot_of_id[item["id"]] for item in image_items], dtype=np.int64)
+        image_score[image_slots] = image_scores
+        image_position[image_slots] = np.arange(len(image_items))
+    
+    text_score = np.zeros(count)
+    text_position = np.full(count, -1, dtype=np.int64)
+    if len(text_order):
+        text_slots = np.array([slot_of_id[text_ids[text_rows[i]]] for i in text_order], dtype=np.int64)
+        text_score[text_slots] = text_scores["adjusted"][text_order]
+        text_position[text_slots] = text_order
+    
+    has_image = image_position >= 0
+    has_text = text_position >= 0
+    both = has_image & has_text
+    image_component = image_score * image_weight
+    text_component = text_score * text_weight
+    raw_sum = image_component + text_component
+    if bonus:
+        bonus_multiplier = np.where(both, 1.0 + np.minimum(0.5, image_score * text_score * 2), 1.0)
+        hybrid_score = np.where(both, np.minimum(raw_sum * bonus_multiplier, 1.0), raw_sum)
+    else:
+        hybrid_score = raw_sum
+    
+    # Urutan slot mengikuti urutan hasil gambar lalu teks; sort stabil menjaga urutan item
+    # dengan skor sama (banyak skor hybrid terpotong di 1.0)
+    top = np.argsort(-hybrid_score, kind="stable")[:max_results]
+    
+    results = []
+    for slot in top:
+        text_item = None
+        if has_text[slot]:
+            i = text_position[slot]
+            text_item = TextEmbeddingIndex.build_result(compiled, text_rows[i], text_scores, i, query_words)
+        
+        if has_image[slot]:
+            result = {
+                **image_items[image_position[slot]],
+                "score": float(image_score[slot]),
+                "match_type": "image",
+                "image_score": float(image_score[slot]),
+                "hybrid_score": float(hybrid_score[slot]),
+                "match_types": ["image"]
+            }
+            if text_item is not None and not bonus:
+                result["text_score"] = text_item["score"]
+                result["match_types"].append("text")
+                result["match_type"] = "hybrid"
+            elif text_item is not None:
+                result["text_score"] = text_item["score"]
+                result["match_types"].append("text")
+                result["bonus_multiplier"] = float(bonus_multiplier[slot])
+                result["score_calculation"] = {
+                    "image_component": float(image_component[slot]),
+                    "text_component": float(text_component[slot]),
+                    "raw_sum": float(raw_sum[slot]),
+                    "bonus_multiplier": float(bonus_multiplier[slot]),
+                    "final_score": float(hybrid_score[slot])
+                }
+                result["common_words"] = text_item["common_words"]
+                result["word_overlap"] = text_item["word_overlap"]
+                result["match_type"] = "hybrid"
+        else:
+            result = {
+                **text_item,
+                "text_score": text_item["score"],
+                "hybrid_score": float(hybrid_score[slot]),
+                "match_types": ["text"]
+            }
+            if bonus:
+                result["score_calculation"] = {
+                    "text_component": float(text_component[slot]),
+                    "final_score": float(hybrid_score[slot])
+                }
+        results.append(result)
+    return results
+
 def find_items_hybrid(
     image: Optional[Image.Image] = None,
     text: Optional[str] = None,
@@ -20,9 +200,15 @@ def find_items_hybrid(
     image_weight: float = 0.4,  
     text_weight: float = 0.6,  
     max_results: int = 10,
-    collection: str = "found_items"
+    collection: str = "found_items",
+    image_embedding: Optional[np.ndarray] = None,
+    fallback_thresholds: Optional[Dict] = None,
+    filters: Optional[Dict] = None
 ) -> List[Dict]:
-    if image is None and not text:
+    # fallback_thresholds ({"image_threshold", "text_threshold"}): jika tidak ada hasil, threshold
+    # lebih rendah diterapkan pada skor yang sama (tanpa scan ulang).
+    # filters (item_filters.build_filters) diterapkan di index sebelum skor dihitung
+    if image is None and image_embedding is None and not text:
         raise ValueError("Setidaknya satu dari gambar atau teks harus disediakan")
     
     start_time = time.time()
@@ -30,87 +216,123 @@ def find_items_hybrid(
     total_weight = image_weight + text_weight
     image_weight = image_weight / total_weight
     text_weight = text_weight / total_weight
-       
-    # logger.info(f"Menggunakan threshold: image={image_threshold}, text={text_threshold}")
-    # logger.info(f"Menggunakan bobot: image={image_weight}, text={text_weight}")
     
-    hybrid_results = {}
-    
-    if image is not None:
+    if image is not None and image_embedding is None:
         image_embedding = extract_features(image)
-        image_matches = find_similar_items(image_embedding, threshold=image_threshold, collection=collection)
-        
-        for item in image_matches:
-            item_id = item["id"]
-            hybrid_results[item_id] = {
-                **item,
-                "image_score": item["score"],
-                "hybrid_score": item["score"] * image_weight,
-                "match_types": ["image"]
-            }
-            
-        logger.info(f"Ditemukan {len(image_matches)} kecocokan gambar")
     
-    if text:
-        text_matches = find_similar_items_by_text(text, threshold=text_threshold, collection=collection)
-        
-        for item in text_matches:
-            item_id = item["id"]
-            
-            if item_id in hybrid_results:
-                hybrid_results[item_id]["text_score"] = item["score"]
-                image_score = hybrid_results[item_id]["image_score"]
-                text_score = item["score"]
-                bonus_multiplier = 1.0 + min(0.5, (image_score * text_score * 2))
-                
-                hybrid_score = ((image_score * image_weight) + (text_score * text_weight)) * bonus_multiplier
-                hybrid_score = min(hybrid_score, 1.0) 
-                
-                hybrid_results[item_id]["hybrid_score"] = hybrid_score
-                hybrid_results[item_id]["match_types"].append("text")
-                hybrid_results[item_id]["bonus_multiplier"] = bonus_multiplier
-                
-                hybrid_results[item_id]["score_calculation"] = {
-                    "image_component": image_score * image_weight,
-                    "text_component": text_score * text_weight,
-                    "raw_sum": (image_score * image_weight) + (text_score * text_weight),
-                    "bonus_multiplier": bonus_multiplier,
-                    "final_score": hybrid_score
-                }
-                
-                if "common_words" in item:
-                    hybrid_results[item_id]["common_words"] = item["common_words"]
-                if "word_overlap" in item:
-                    hybrid_results[item_id]["word_overlap"] = item["word_overlap"]
-            else:
-                hybrid_results[item_id] = {
-                    **item,
-                    "text_score": item["score"],
-                    "hybrid_score": item["score"] * text_weight,
-                    "match_types": ["text"],
-                    "score_calculation": {
-                        "text_component": item["score"] * text_weight,
-                        "final_score": item["score"] * text_weight
-                    }   
-                }
+    image_index, text_index = get_hybrid_indexes(collection)
+    image_floor, text_floor = _floor_thresholds(image_threshold, text_threshold, fallback_thresholds)
     
-    results = list(hybrid_results.values())
-    results.sort(key=lambda x: x["hybrid_score"], reverse=True)
+    image_candidates = None
+    if image_embedding is not None:
+        image_candidates = _image_candidates(image_index, image_embedding, image_floor, filters)
+        logger.info(f"Ditemukan {len(image_candidates[0])} kandidat gambar (threshold {image_floor})")
     
-    for item in results:
-        if "image" in item["match_types"] and "text" in item["match_types"]:
-            item["match_type"] = "hybrid"
-        elif "image" in item["match_types"]:
-            item["match_type"] = "image"
-        else:
-            item["match_type"] = "text"
+    text_candidates = None
+    if text:
+        text_candidates = _text_candidates(text_index, text, text_floor, filters)
+        logger.info(f"Ditemukan {len(text_candidates[4])} kandidat teks (threshold {text_floor})")
+    
+    results, _ = _fuse_with_fallback(image_candidates, text_candidates, image_threshold, text_threshold,
+                                     image_weight, text_weight, max_results, fallback_thresholds)
     
-    results = results[:max_results]
     elapsed_time = time.time() - start_time
     logger.info(f"Hybrid matching selesai dalam {elapsed_time:.2f} detik")
     logger.info(f"Total hasil: {len(results)}")
     return results
 
+async def find_items_hybrid_async(
+    image: Optional[Image.Image] = None,
+    text: Optional[str] = None,
+    image_threshold: float = 0.7,
+    text_threshold: float = 0.2,
+    image_weight: float = 0.4,
+    text_weight: float = 0.6,
+    max_results: int = 10,
+    collection: str = "found_items",
+    image_embedding: Optional[np.ndarray] = None,
+    time_budget_ms: Optional[int] = HYBRID_TIME_BUDGET_MS,
+    fallback_thresholds: Optional[Dict] = None,
+    filters: Optional[Dict] = None
+):
+    """Cabang gambar (inference + scoring) dan teks (transform + scoring) dijalankan bersamaan.
+    Mengembalikan (results, info); jika time budget habis, hasil hanya berisi cabang yang
+    sudah selesai dan info["partial"] bernilai True. fallback_thresholds dan filters seperti find_items_hybrid."""
+    if image is None and image_embedding is None and not text:
+        raise ValueError("Setidaknya satu dari gambar atau teks harus disediakan")
+    
+    start_time = time.perf_counter()
+    
+    total_weight = image_weight + text_weight
+    image_weight = image_weight / total_weight
+    text_weight = text_weight / total_weight
+    
+    image_index, text_index = await run_io(get_hybrid_indexes, collection)
+    image_floor, text_floor = _floor_thresholds(image_threshold, text_threshold, fallback_thresholds)
+    branches = {}
+    
+    async def image_branch():
+        branch = branches["image"]
+        embedding = image_embedding
+        if embedding is None:
+            inference_start = time.perf_counter()
+            embedding = await extract_features_async(image)
+            branch["inference_ms"] = (time.perf_counter() - inference_start) * 1000
+        scoring_start = time.perf_counter()
+        candidates = await run_cpu(_image_candidates, image_index, embedding, image_floor, filters, True)
+        branch["scoring_ms"] = (time.perf_counter() - scoring_start) * 1000
+        return candidates
+    
+    async def text_branch():
+        return await run_cpu(_text_candidates, text_index, text, text_floor, filters, True)
+    
+    tasks = {}
+    for name, enabled, branch in (("image", image is not None or image_embedding is not None, image_branch),
+                                  ("text", bool(text), text_branch)):
+        if enabled:
+            branches[name] = {"status": "running"}
+            tasks[name] = asyncio.ensure_future(branch())
+            tasks[name].add_done_callback(
+                lambda _, branch=branches[name]: branch.setdefault("latency_ms", (time.perf_counter() - start_time) * 1000))
+    
+    timeout = time_budget_ms / 1000 if time_budget_ms else None
+    done, pending = await asyncio.wait(tasks.values(), timeout=timeout)
+    for task in pending:
+        # Pekerjaan yang sudah berjalan di thread pool tetap selesai, hasilnya diabaikan
+        task.cancel()
+    
+    candidates = {}
+    for name, task in tasks.items():
+        branch = branches[name]
+        if task in pending:
+            branch["status"] = "timeout"
+        elif task.exception() is not None:
+            if isinstance(task.exception(), InferenceQueueFull):
+                raise task.exception()
+            logger.error(f"Error pada cabang {name} hybrid matching: {str(task.exception())}")
+            branch["status"] = "error"
+        else:
+            branch["status"] = "done"
+            candidates[name] = task.result()
+        # Cabang yang dibatalkan belum tentu sudah memanggil callback-nya
+        branch.setdefault("latency_ms", (time.perf_counter() - start_time) * 1000)
+    
+    results, used_fallback = _fuse_with_fallback(candidates.get("image"), candidates.get("text"),
+                                                 image_threshold, text_threshold, image_weight, text_weight,
+                                                 max_results, fallback_thresholds)
+    info = {
+        "partial": any(branch["status"] != "done" for branch in branches.values()),
+        "fallback": used_fallback,
+        "time_budget_ms": time_budget_ms,
+        "latency_ms": (time.perf_counter() - start_time) * 1000,
+        "branches": branches,
+    }
+    if info["partial"]:
+        statuses = ", ".join(f"{name}={branch['status']}" for name, branch in branches.items())
+        logger.warning(f"Hybrid matching parsial (budget {time_budget_ms} ms): {statuses}")
+    logger.info(f"Hybrid matching selesai dalam {info['latency_ms']:.0f} ms, {len(results)} hasil")
+    return results, info
+
 def find_items_hybrid_with_fallback(
     image: Optional[Image.Image] = None,
     text: Optional[str] = None,
@@ -119,61 +341,32 @@ def find_items_hybrid_with_fallback(
     image_weight: float = 0.4,
     text_weight: float = 0.6,
     max_results: int = 10,
-    collection: str = "found_items"
+    collection: str = "found_items",
+    image_embedding: Optional[np.ndarray] = None,
+    filters: Optional[Dict] = None
 ) -> List[Dict]:
-    if image is None and not text:
+    if image is None and image_embedding is None and not text:
         raise ValueError("Setidaknya satu dari gambar atau teks harus disediakan")
     
     total_weight = image_weight + text_weight
     image_weight = image_weight / total_weight
     text_weight = text_weight / total_weight
     
-    hybrid_results = {}
-    
-    if image is not None:
+    if image is not None and image_embedding is None:
         image_embedding = extract_features(image)
-        image_matches = find_similar_items(image_embedding, threshold=image_threshold)
-        
-        for item in image_matches:
-            item_id = item["id"]
-            hybrid_results[item_id] = {
-                **item,
-                "image_score": item["score"],
-                "hybrid_score": item["score"] * image_weight,
-                "match_types": ["image"]
-            }
     
+    # Satu scan per modalitas; rumus fallback menjumlahkan skor berbobot tanpa bonus
+    image_index, text_index = get_hybrid_indexes(collection)
+    image_candidates = None
+    if image_embedding is not None:
+        image_candidates = _image_candidates(image_index, image_embedding, image_threshold, filters)
+    text_candidates = None
     if text:
-        text_matches = find_similar_items_by_text(text, threshold=text_threshold)
-        
-        for item in text_matches:
-            item_id = item["id"]
-            
-            if item_id in hybrid_results:
-                hybrid_results[item_id]["text_score"] = item["score"]
-                hybrid_results[item_id]["hybrid_score"] += item["score"] * text_weight
-                hybrid_results[item_id]["match_types"].append("text")
-            else:
-                hybrid_results[item_id] = {
-                    **item,
-                    "text_score": item["score"],
-                    "hybrid_score": item["score"] * text_weight,
-                    "match_types": ["text"]
-                }
-    
-    results = list(hybrid_results.values())
-    results.sort(key=lambda x: x["hybrid_score"], reverse=True)
-    
-    for item in results:
-        if "image" in item["match_types"] and "text" in item["match_types"]:
-            item["match_type"] = "hybrid"
-        elif "image" in item["match_types"]:
-            item["match_type"] = "image"
-        else:
-            item["match_type"] = "text"
+        text_candidates = _text_candidates(text_index, text, text_threshold, filters)
     
+    results = _fuse_candidates(image_candidates, text_candidates, image_weight, text_weight, max_results, bonus=False)
     logger.info(f"Fallback menemukan {len(results)} kecocokan dengan threshold lebih rendah")
-    return results[:max_results]
+    return results
 
 def update_thresholds_based_on_feedback():
     try:
@@ -0,0 +1,110 @@
+# pylint: disable=all
+# type: ignore
+# noqa
+
+import logging
+import os
+import threading
+import time
+from io import BytesIO
+from PIL import Image, ImageOps
+from app.config import IMAGE_DECODE_MAX_SIDE, IMAGE_DECODE_MAX_SOURCE_PIXELS
+from app.services.embedding_cache import content_hash
+
+logger = logging.getLogger(__name__)
+
+# MobileNet hanya melihat 224x224, jadi foto kamera 12 MP tidak perlu di-decode penuh.
+# JPEG di-decode langsung pada skala 1/2, 1/4 atau 1/8 (DCT scaling lewat draft mode)
+# dan hasilnya diperkecil sampai sisi terpendek = IMAGE_DECODE_MAX_SIDE (~2x input model).
+
+_stats_lock = threading.Lock()
+_stats = {
+    "decoded": 0,
+    "draft_decoded": 0,
+    "rejected": 0,
+    "total_decode_ms": 0.0,
+    "max_decode_ms": 0.0,
+    "total_source_megapixels": 0.0,
+    "total_peak_bytes": 0,
+    "max_peak_bytes": 0,
+}
+
+def _target_size(size, max_side):
+    width, height = size
+    shortest = min(width, height)
+    if shortest <= max_side:
+        return size
+    scale = max_side / shortest
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+def _record(decode_ms, source_size, peak_bytes, draft_used):
+    with _stats_lock:
+        _stats["decoded"] += 1
+        _stats["draft_decoded"] += int(draft_used)
+        _stats["total_decode_ms"] += decode_ms
+        _stats["max_decode_ms"] = max(_stats["max_decode_ms"], decode_ms)
+        _stats["total_source_megapixels"] += source_size[0] * source_size[1] / 1e6
+        _stats["total_peak_bytes"] += peak_bytes
+        _stats["max_peak_bytes"] = max(_stats["max_peak_bytes"], peak_bytes)
+
+def decode_image(source, max_side=IMAGE_DECODE_MAX_SIDE):
+    """Decode bytes/path/file-like menjadi gambar RGB yang sudah diperkecil dan dirotasi sesuai EXIF"""
+    start_time = time.perf_counter()
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, "rb") as f:
+            source = f.read()
+    if hasattr(source, "read"):
+        source = source.read()
+    source_hash = content_hash(source)
+
+    image = Image.open(BytesIO(source))
+    source_size = image.size
+    if source_size[0] * source_size[1] > IMAGE_DECODE_MAX_SOURCE_PIXELS:
+        with _stats_lock:
+            _stats["rejected"] += 1
+        raise ValueError(f"Image too large: {source_size[0]}x{source_size[1]} pixels "
+                         f"(max {IMAGE_DECODE_MAX_SOURCE_PIXELS})")
+
+    draft_used = False
+    if image.format == "JPEG":
+        # draft() memilih skala terbesar yang hasilnya masih >= ukuran yang diminta
+        requested = _target_size(source_size, max_side)
+        draft_used = image.draft("RGB", requested) is not None
+
+    image.load()
+    peak_bytes = image.width * image.height * len(image.getbands())
+
+    # Orientasi EXIF diterapkan setelah decode (draft hanya bekerja sebelum load)
+    if image.getexif().get(0x0112, 1) != 1:
+        peak_bytes *= 2
+    ImageOps.exif_transpose(image, in_place=True)
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+
+    target = _target_size(image.size, max_side)
+    if target != image.size:
+        image = image.resize(target, Image.BILINEAR, reducing_gap=2.0)
+
+    decode_ms = (time.perf_counter() - start_time) * 1000
+    _record(decode_ms, source_size, peak_bytes, draft_used)
+    # Dipakai sebagai key embedding cache; gambar turunan (augmentasi) harus menghapusnya
+    image.info["content_hash"] = source_hash
+    image.info["decode_stats"] = {
+        "source_size": source_size,
+        "decoded_size": image.size,
+        "draft": draft_used,
+        "decode_ms": decode_ms,
+        "peak_bytes": peak_bytes,
+    }
+    logger.debug(f"Decode {source_size[0]}x{source_size[1]} -> {image.size[0]}x{image.size[1]} "
+                 f"dalam {decode_ms:.1f}ms (draft={draft_used}, peak={peak_bytes / 1e6:.1f}MB)")
+    return image
+
+def get_decode_stats():
+    with _stats_lock:
+        stats = dict(_stats)
+    decoded = max(stats["decoded"], 1)
+    stats["avg_decode_ms"] = stats["total_decode_ms"] / decoded
+    stats["avg_source_megapixels"] = stats["total_source_megapixels"] / decoded
+    stats["avg_peak_bytes"] = stats["total_peak_bytes"] / decoded
+    return stats
@@ -2,25 +2,63 @@
 # type: ignore
 # noqa
 
-import torch
-import torchvision.models as models
-import torchvision.transforms as transforms
 from PIL import Image
 import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
 import pickle
+import hashlib
 import os
-from io import BytesIO
-import requests
 import logging
+import time
+from app.config import IMAGE_BATCH_SIZE, IMAGE_INFERENCE_BACKEND, IMAGE_DECODE_MAX_SIDE, TORCH_NUM_THREADS
 from app.services.firebase import db
+from app.services.collection_replica import get_documents
+from app.services.image_index import get_image_index, item_from_document
+from app.services.index_sync import notify_item_saved
+from app.services import model_registry
+from app.services.image_decode import decode_image
+from app.services.image_fetcher import fetch_image_bytes
+from app.services.embedding_cache import image_embedding_cache, cache_key
+from app.services.embedding_codec import encode_image_embedding, decode_image_embedding
 
 logger = logging.getLogger(__name__)
 
-device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-logger.info(f"Using device: {device}")
+# torch/torchvision di-import di dalam fungsi supaya endpoint teks tidak ikut membayar
+# biaya import dan load model; model dimuat lewat model_registry saat pertama dipakai.
 
-def load_mobilenet():
+active_backend = "eager"
+active_model_version = None
+
+def _set_active_model(backend, weights_path):
+    # Versi model = backend + fingerprint bobot + ukuran decode; dipakai sebagai bagian key embedding cache
+    global active_backend, active_model_version
+    active_backend = backend
+    fingerprint = "pretrained"
+    if weights_path and os.path.exists(weights_path):
+        with open(weights_path, "rb") as f:
+            fingerprint = hashlib.sha1(f.read()).hexdigest()[:12]
+    active_model_version = f"{backend}-{fingerprint}-d{IMAGE_DECODE_MAX_SIDE}"
+
+def get_device():
+    import torch
+    return torch.device("cuda" if torch.cuda.is_available() else "cpu")
+
+def load_mobilenet(backend=IMAGE_INFERENCE_BACKEND):
+    import torch
+    import torchvision.models as models
+    
+    device = get_device()
+    torch.set_num_threads(TORCH_NUM_THREADS)
+    logger.info(f"Using device: {device} ({TORCH_NUM_THREADS} threads)")
+    if backend != "eager":
+        try:
+            from app.services.model_export import load_backend_model, BACKEND_PATHS
+            model = load_backend_model(backend, device)
+            _set_active_model(backend, BACKEND_PATHS[backend])
+            logger.info(f"Loaded MobileNetV3-Small feature extractor ({backend} backend)")
+            return model
+        except Exception as e:
+            logger.warning(f"Backend {backend} unavailable, falling back to eager fp32: {str(e)}")
+    
     try:
         model = models.mobilenet_v3_small(weights=models.MobileNet_V3_Small_Weights.DEFAULT)
         model.eval()
@@ -31,6 +69,7 @@ def load_mobilenet():
             model.load_state_dict(torch.load(saved_model_path, map_location=device))
             logger.info("Loaded saved MobileNetV3-Small model")
         
+        _set_active_model("eager", saved_model_path)
         model.to(device)
         return model
     except Exception as e:
@@ -38,42 +77,137 @@ def load_mobilenet():
         model = models.mobilenet_v3_small(weights=models.MobileNet_V3_Small_Weights.DEFAULT)
         model.eval()
         model = torch.nn.Sequential(*list(model.children())[:-1])
+        _set_active_model("eager", None)
         model.to(device)
         return model
 
-model = load_mobilenet()
+def build_transforms():
+    import torch
+    import torchvision.transforms as transforms
+    
+    transform = transforms.Compose([
+        transforms.Resize((224, 224)),
+        transforms.ToTensor(),
+        transforms.Normalize(
+            mean=[0.485, 0.456, 0.406],
+            std=[0.229, 0.224, 0.225]
+        ),
+    ])
+    
+    # Untuk gambar yang sudah di-decode menjadi tensor CHW (uint8 atau float 0-1)
+    tensor_transform = transforms.Compose([
+        transforms.Resize((224, 224), antialias=True),
+        transforms.ConvertImageDtype(torch.float),
+        transforms.Normalize(
+            mean=[0.485, 0.456, 0.406],
+            std=[0.229, 0.224, 0.225]
+        ),
+    ])
+    return transform, tensor_transform
 
-transform = transforms.Compose([
-    transforms.Resize((224, 224)),
-    transforms.ToTensor(),
-    transforms.Normalize(
-        mean=[0.485, 0.456, 0.406],
-        std=[0.229, 0.224, 0.225]
-    ),
-])
+def warm_up_mobilenet(model):
+    extract_features(Image.new("RGB", (224, 224), color="white"))
 
-def extract_features(image: Image.Image):
+model_registry.register_model("image_transforms", build_transforms)
+model_registry.register_model("mobilenet", load_mobilenet, warmup=warm_up_mobilenet)
+
+def get_model():
+    return model_registry.get_model("mobilenet")
+
+def get_transform():
+    return model_registry.get_model("image_transforms")[0]
+
+def preprocess_image(image):
+    import torch
+    
+    transform, tensor_transform = model_registry.get_model("image_transforms")
+    if isinstance(image, torch.Tensor):
+        return tensor_transform(image)
+    return transform(image)
+
+def encode_batch(tensors, max_batch_size=IMAGE_BATCH_SIZE):
+    import torch
+    
+    model = get_model()
+    device = get_device()
+    outputs = []
+    with torch.inference_mode():
+        for start in range(0, len(tensors), max_batch_size):
+            batch = torch.stack(tensors[start:start + max_batch_size]).to(device)
+            outputs.append(model(batch).flatten(1).cpu().numpy())
+    return np.concatenate(outputs, axis=0)
+
+def get_image_model_version():
+    get_model()
+    return active_model_version
+
+def _cache_key_for(image, model_version):
+    if not isinstance(image, Image.Image):
+        return None
+    image_hash = image.info.get("content_hash")
+    return cache_key(image_hash, model_version) if image_hash else None
+
+def encode_images(images, max_batch_size=IMAGE_BATCH_SIZE):
+    # Hasil per gambar berupa embedding atau Exception. Embedding cache dicek dulu,
+    # hanya gambar yang miss yang di-preprocess dan masuk forward pass.
+    model_version = get_image_model_version()
+    results = [None] * len(images)
+    keys = [None] * len(images)
+    tensors, positions = [], []
+    for i, image in enumerate(images):
+        keys[i] = _cache_key_for(image, model_version)
+        if keys[i]:
+            cached = image_embedding_cache.get(keys[i])
+            if cached is not None:
+                results[i] = cached.copy()
+                continue
+        try:
+            tensors.append(preprocess_image(image))
+            positions.append(i)
+        except Exception as e:
+            results[i] = e
+    
+    if tensors:
+        start_time = time.perf_counter()
+        try:
+            features = encode_batch(tensors, max_batch_size=max_batch_size)
+        except Exception as e:
+            for position in positions:
+                results[position] = e
+            return results
+        image_embedding_cache.record_encode(len(tensors), (time.perf_counter() - start_time) * 1000)
+        for position, feature in zip(positions, features):
+            results[position] = feature
+            if keys[position]:
+                image_embedding_cache.put(keys[position], feature)
+    return results
+
+def extract_features_batch(images, max_batch_size=IMAGE_BATCH_SIZE):
+    if not images:
+        raise ValueError("No images provided for feature extraction")
     try:
-        img_t = transform(image).unsqueeze(0).to(device)
-        with torch.no_grad():
-            features = model(img_t).squeeze().cpu().numpy()
-        return features
+        results = encode_images(images, max_batch_size=max_batch_size)
+        for result in results:
+            if isinstance(result, Exception):
+                raise result
+        return np.stack(results)
     except Exception as e:
-        logger.error(f"Error extracting features: {str(e)}")
+        logger.error(f"Error extracting batch features: {str(e)}")
         raise
 
+def extract_features(image: Image.Image):
+    return extract_features_batch([image])[0]
+
 def extract_features_from_multiple_images(images):
     if not images:
         raise ValueError("No images provided for feature extraction")
     
     features_list = []
-    for i, image in enumerate(images):
-        try:
-            features = extract_features(image)
-            features_list.append(features)
-            logger.debug(f"Extracted features from image {i+1}/{len(images)}, shape: {features.shape}")
-        except Exception as e:
-            logger.warning(f"Failed to extract features from image {i+1}: {str(e)}")
+    for i, result in enumerate(encode_images(images)):
+        if isinstance(result, Exception):
+            logger.warning(f"Failed to extract features from image {i+1}: {str(result)}")
+        else:
+            features_list.append(result)
     
     if not features_list:
         raise ValueError("Failed to extract features from any images")
@@ -84,8 +218,7 @@ def extract_features_from_multiple_images(images):
 
 def extract_features_from_url(url: str):
     try:
-        response = requests.get(url, timeout=10)
-        image = Image.open(BytesIO(response.content)).convert("RGB")
+        image = decode_image(fetch_image_bytes(url))
         return extract_features(image)
     except Exception as e:
         logger.error(f"Error extracting features from URL {url}: {str(e)}")
@@ -93,29 +226,12 @@ def extract_features_from_url(url: str):
 
 def load_embeddings_from_firebase(collection="found_items"):
     try:
-        docs = db.collection(collection).stream()
         embeddings = []
 
-        for doc in docs:
-            data = doc.to_dict()
+        for doc_id, data in get_documents(collection):
             if "embedding" in data:
-                embedding_array = np.array(data.get("embedding"))
-                
-                item_data = {
-                    "id": doc.id,
-                    "item_name": data.get("item_name", ""),
-                    "image_url": data.get("image_url", ""),
-                    "description": data.get("description", ""),
-                    "embedding": embedding_array,
-                    "location_found": data.get("location_found", ""), 
-                    "found_date": data.get("found_date", ""),  
-                    "category": data.get("category", ""),
-                    "status": data.get("status", "available"),
-                }
-                
-                if "additional_images" in data:
-                    item_data["additional_images"] = data.get("additional_images", [])
-                
+                item_data = item_from_document(doc_id, data)
+                item_data["embedding"] = decode_image_embedding(data.get("embedding"))
                 embeddings.append(item_data)
 
         logger.info(f"Loaded {len(embeddings)} embeddings from Firebase collection: {collection}")
@@ -124,33 +240,38 @@ def load_embeddings_from_firebase(collection="found_items"):
         logger.error(f"Error loading embeddings from Firebase: {str(e)}")
         return []
 
-def find_similar_items(new_embedding, threshold=0.3, collection="found_items"):
+def find_similar_items(new_embedding, threshold=0.3, collection="found_items", top_k=None, exact=False, filters=None):
     try:
-        found_data = load_embeddings_from_firebase(collection=collection)
-        similarities = []
-
-        for item in found_data:
-            if item.get("status", "available") != "available":
-                continue
-                
-            sim = cosine_similarity([new_embedding], [item["embedding"]])[0][0]
-            
-            if sim >= threshold:
-                matching_item = item.copy()
-                matching_item["score"] = float(sim)
-                matching_item["match_type"] = "image"
-                similarities.append(matching_item)
-
-        sorted_similarities = sorted(similarities, key=lambda x: x["score"], reverse=True)
+        index = get_image_index(collection)
+        sorted_similarities = index.search(new_embedding, threshold=threshold, top_k=top_k, exact=exact, filters=filters)
         logger.info(f"Found {len(sorted_similarities)} similar items with threshold {threshold}")
         return sorted_similarities
     except Exception as e:
         logger.error(f"Error finding similar items: {str(e)}")
         return []
 
+def score_similar_items(new_embedding, min_threshold=0.0, collection="found_items", exact=False, filters=None):
+    """Skor item di atas min_threshold, dihitung sekali per query (urut skor menurun).
+    Threshold lain, fallback dan log debug diambil dengan cut_similar_items tanpa scan ulang."""
+    try:
+        index = get_image_index(collection)
+        return index.search_rows(new_embedding, threshold=min_threshold, exact=exact, filters=filters)
+    except Exception as e:
+        logger.error(f"Error finding similar items: {str(e)}")
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32), []
+
+def cut_similar_items(scored, threshold, top_k=None):
+    rows, scores, metadata = scored
+    # Skor sudah terurut menurun, jadi item di atas threshold adalah prefix
+    count = int(np.count_nonzero(scores >= threshold))
+    if top_k is not None:
+        count = min(count, top_k)
+    return [{**metadata[row], "score": float(score), "match_type": "image"}
+            for row, score in zip(rows[:count], scores[:count])]
+
 def save_embedding_to_firebase(item_data, embedding):
     try:
-        item_data["embedding"] = embedding.tolist()
+        item_data["embedding"] = encode_image_embedding(embedding)
         
         if "created_at" not in item_data:
             from datetime import datetime
@@ -158,6 +279,7 @@ def save_embedding_to_firebase(item_data, embedding):
         
         doc_ref = db.collection("found_items").add(item_data)
         item_id = doc_ref[1].id
+        notify_item_saved("found_items", item_id, item_data)
         
         logger.info(f"Saved new item with ID: {item_id}")
         return item_id
@@ -166,6 +288,8 @@ def save_embedding_to_firebase(item_data, embedding):
         raise
 
 def augment_image(image):
+    import torchvision.transforms as transforms
+    
     try:
         augmentations = [
             transforms.RandomHorizontalFlip(p=1.0),
@@ -180,6 +304,8 @@ def augment_image(image):
         for aug in augmentations:
             try:
                 aug_img = aug(image)
+                # PIL menyalin info ke gambar hasil transform; hash isi file asli tidak berlaku lagi
+                aug_img.info.pop("content_hash", None)
                 augmented_images.append(aug_img)
             except Exception as aug_error:
                 logger.warning(f"Error during augmentation: {str(aug_error)}")
@@ -192,27 +318,26 @@ def augment_image(image):
 
 def save_embedding_with_augmentation(item_data, image):
     try:
-        original_embedding = extract_features(image)
+        augmented_images = augment_image(image)
+        embeddings = extract_features_batch(augmented_images)
         
         main_item = item_data.copy()
-        main_item["embedding"] = original_embedding.tolist()
+        main_item["embedding"] = encode_image_embedding(embeddings[0])
         
         doc_ref = db.collection("found_items").add(main_item)
         item_id = doc_ref[1].id
+        notify_item_saved("found_items", item_id, main_item)
         
-        augmented_images = augment_image(image)
-        
-        for i, aug_img in enumerate(augmented_images[1:]):
+        for i, aug_embedding in enumerate(embeddings[1:]):
             try:
-                aug_embedding = extract_features(aug_img)
-                
                 aug_item = item_data.copy()
-                aug_item["embedding"] = aug_embedding.tolist()
+                aug_item["embedding"] = encode_image_embedding(aug_embedding)
                 aug_item["is_augmented"] = True
                 aug_item["original_id"] = item_id
                 aug_item["augmentation_type"] = f"aug_{i}"
                 
-                db.collection("found_items").add(aug_item)
+                aug_ref = db.collection("found_items").add(aug_item)
+                notify_item_saved("found_items", aug_ref[1].id, aug_item)
             except Exception as aug_error:
                 logger.warning(f"Error saving augmentation {i}: {str(aug_error)}")
         
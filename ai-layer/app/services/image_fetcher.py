@@ -0,0 +1,172 @@
+# pylint: disable=all
+# type: ignore
+# noqa
+
+import asyncio
+import logging
+import threading
+import time
+from collections import OrderedDict
+import requests
+from requests.adapters import HTTPAdapter
+from app.config import (
+    IMAGE_FETCH_CONCURRENCY,
+    IMAGE_FETCH_MAX_BYTES,
+    IMAGE_FETCH_CONNECT_TIMEOUT,
+    IMAGE_FETCH_READ_TIMEOUT,
+    IMAGE_FETCH_CACHE_SIZE,
+    IMAGE_FETCH_CACHE_TTL_SECONDS,
+)
+from app.services.executor import run_io
+
+logger = logging.getLogger(__name__)
+
+# Download gambar dari URL (Google Drive dsb.) lewat satu Session bersama supaya koneksi
+# TCP/TLS dipakai ulang. Versi async menjalankan download di I/O pool (app.services.executor),
+# jumlah download bersamaan tetap dibatasi IMAGE_FETCH_CONCURRENCY.
+
+FETCH_CHUNK_SIZE = 64 * 1024
+
+class ImageTooLarge(ValueError):
+    pass
+
+_session = None
+_session_lock = threading.Lock()
+_fetch_slots = threading.BoundedSemaphore(IMAGE_FETCH_CONCURRENCY)
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+_inflight = {}
+
+_stats = {
+    "requests": 0,
+    "cache_hits": 0,
+    "shared_inflight": 0,
+    "downloads": 0,
+    "failed": 0,
+    "too_large": 0,
+    "bytes_downloaded": 0,
+    "total_fetch_ms": 0.0,
+}
+
+def get_session():
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=8, pool_maxsize=IMAGE_FETCH_CONCURRENCY, max_retries=1)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _session = session
+    return _session
+
+def _cache_get(url):
+    with _cache_lock:
+        entry = _cache.get(url)
+        if entry is None:
+            return None
+        expires_at, content = entry
+        if expires_at < time.time():
+            del _cache[url]
+            return None
+        _cache.move_to_end(url)
+        return content
+
+def _cache_put(url, content):
+    if IMAGE_FETCH_CACHE_SIZE <= 0:
+        return
+    with _cache_lock:
+        _cache[url] = (time.time() + IMAGE_FETCH_CACHE_TTL_SECONDS, content)
+        _cache.move_to_end(url)
+        while len(_cache) > IMAGE_FETCH_CACHE_SIZE:
+            _cache.popitem(last=False)
+
+def _download(url, max_bytes):
+    start_time = time.perf_counter()
+    with _fetch_slots:
+        response = get_session().get(url, stream=True,
+                                     timeout=(IMAGE_FETCH_CONNECT_TIMEOUT, IMAGE_FETCH_READ_TIMEOUT))
+        try:
+            response.raise_for_status()
+            declared = response.headers.get("Content-Length")
+            if declared and declared.isdigit() and int(declared) > max_bytes:
+                raise ImageTooLarge(f"Image at URL is {int(declared)} bytes (max {max_bytes})")
+
+            chunks, received = [], 0
+            for chunk in response.iter_content(FETCH_CHUNK_SIZE):
+                received += len(chunk)
+                if received > max_bytes:
+                    raise ImageTooLarge(f"Image at URL exceeds {max_bytes} bytes")
+                chunks.append(chunk)
+        finally:
+            response.close()
+
+    with _cache_lock:
+        _stats["downloads"] += 1
+        _stats["bytes_downloaded"] += received
+        _stats["total_fetch_ms"] += (time.perf_counter() - start_time) * 1000
+    return b"".join(chunks)
+
+def fetch_image_bytes(url, max_bytes=IMAGE_FETCH_MAX_BYTES):
+    """Download isi URL (dengan cache TTL); beberapa request untuk URL yang sama berbagi satu download"""
+    with _cache_lock:
+        _stats["requests"] += 1
+    content = _cache_get(url)
+    if content is not None:
+        with _cache_lock:
+            _stats["cache_hits"] += 1
+        return content
+
+    with _cache_lock:
+        waiter = _inflight.get(url)
+        owner = waiter is None
+        if owner:
+            waiter = {"event": threading.Event(), "content": None, "error": None}
+            _inflight[url] = waiter
+        else:
+            _stats["shared_inflight"] += 1
+
+    if not owner:
+        waiter["event"].wait()
+        if waiter["error"] is not None:
+            raise waiter["error"]
+        return waiter["content"]
+
+    try:
+        content = _download(url, max_bytes)
+        _cache_put(url, content)
+        waiter["content"] = content
+        return content
+    except Exception as e:
+        with _cache_lock:
+            _stats["failed"] += 1
+            if isinstance(e, ImageTooLarge):
+                _stats["too_large"] += 1
+        waiter["error"] = e
+        raise
+    finally:
+        with _cache_lock:
+            _inflight.pop(url, None)
+        waiter["event"].set()
+
+async def fetch_image_bytes_async(url, max_bytes=IMAGE_FETCH_MAX_BYTES):
+    content = _cache_get(url)
+    if content is not None:
+        with _cache_lock:
+            _stats["requests"] += 1
+            _stats["cache_hits"] += 1
+        return content
+    return await run_io(fetch_image_bytes, url, max_bytes)
+
+async def fetch_many_async(urls, max_bytes=IMAGE_FETCH_MAX_BYTES):
+    # Hasil per URL berupa bytes atau Exception, urutan sama dengan input
+    return await asyncio.gather(*[fetch_image_bytes_async(url, max_bytes) for url in urls], return_exceptions=True)
+
+def get_fetch_stats():
+    with _cache_lock:
+        stats = dict(_stats)
+        stats["cached_urls"] = len(_cache)
+        stats["inflight"] = len(_inflight)
+    stats["avg_fetch_ms"] = stats["total_fetch_ms"] / stats["downloads"] if stats["downloads"] else 0.0
+    return stats
@@ -0,0 +1,320 @@
+# pylint: disable=all
+# type: ignore
+# noqa
+
+import numpy as np
+import threading
+import logging
+import time
+from app.services.embedding_codec import decode_image_embedding
+from app.services.ann_index import FlatSearchEngine, create_engine
+from app.services.vector_store import Float32Store, create_store, create_originals
+from app.services.item_filters import ItemFilterTable
+from app.services.collection_replica import get_documents, is_replicated
+from app.config import IMAGE_RERANK_CANDIDATES, IMAGE_ANN_ENGINE, IMAGE_VECTOR_STORAGE
+
+logger = logging.getLogger(__name__)
+
+# Index di-reload penuh secara berkala supaya perubahan dari worker lain / skrip
+# yang menulis langsung ke Firestore tetap terlihat.
+IMAGE_INDEX_REFRESH_SECONDS = 300
+
+METADATA_FIELDS = ["item_name", "image_url", "description", "location_found",
+                   "found_date", "category", "status"]
+
+# Field barang hilang, hanya disalin jika ada (dipakai filter lokasi / tanggal)
+OPTIONAL_FIELDS = ["additional_images", "last_seen_location", "date_lost"]
+
+def item_from_document(doc_id, data):
+    item = {
+        "id": doc_id,
+        "item_name": data.get("item_name", ""),
+        "image_url": data.get("image_url", ""),
+        "description": data.get("description", ""),
+        "location_found": data.get("location_found", ""),
+        "found_date": data.get("found_date", ""),
+        "category": data.get("category", ""),
+        "status": data.get("status", "available"),
+    }
+    for field in OPTIONAL_FIELDS:
+        if field in data:
+            item[field] = data[field]
+    return item
+
+def normalize_embedding(embedding):
+    vector = decode_image_embedding(embedding)
+    norm = float(np.linalg.norm(vector))
+    if norm > 0:
+        vector = vector / norm
+    return vector
+
+class ImageEmbeddingIndex:
+    def __init__(self, collection="found_items", engine=IMAGE_ANN_ENGINE, storage=IMAGE_VECTOR_STORAGE):
+        self.collection = collection
+        self.engine_mode = engine
+        self.storage_mode = storage
+        self.loaded_at = None
+        self._lock = threading.RLock()
+        self._load_lock = threading.Lock()
+        self._engine = FlatSearchEngine()
+        self._reset(0)
+
+    def _reset(self, dim, capacity=0):
+        self._store = Float32Store(dim)
+        self._store.grow(capacity)
+        self._originals = None
+        self._available = np.zeros(capacity, dtype=bool)
+        self._alive = np.zeros(capacity, dtype=bool)
+        self._ids = []
+        self._metadata = []
+        self._row_by_id = {}
+        self._filters = ItemFilterTable(capacity)
+        self._size = 0
+
+    @property
+    def dim(self):
+        return self._store.dim
+
+    def __len__(self):
+        return len(self._row_by_id)
+
+    def is_stale(self):
+        if self.loaded_at is None:
+            return True
+        # Index koleksi yang direplikasi diperbarui per perubahan, tanpa reload berkala
+        if is_replicated(self.collection):
+            return False
+        return time.time() - self.loaded_at > IMAGE_INDEX_REFRESH_SECONDS
+
+    def load(self, documents=None):
+        # documents: iterable (id, data) yang sudah dibaca, misalnya oleh hybrid_matcher yang
+        # memuat index gambar dan teks dari satu kali stream koleksi
+        start_time = time.time()
+        if documents is None:
+            documents = get_documents(self.collection)
+        ids, metadata, vectors = [], [], []
+
+        for doc_id, data in documents:
+            if "embedding" not in data:
+                continue
+            ids.append(doc_id)
+            metadata.append(item_from_document(doc_id, data))
+            # Langsung float32 supaya list float Python tidak menumpuk selama load;
+            # embedding bytes di-decode tanpa salinan
+            vectors.append(decode_image_embedding(data.get("embedding")))
+
+        self.build(ids, metadata, vectors)
+        logger.info(f"Built image index for {self.collection}: {len(self)} items "
+                    f"in {time.time() - start_time:.2f}s")
+
+    def build(self, ids, metadata, vectors):
+        dims = [len(v) for v in vectors]
+        dim = max(set(dims), key=dims.count) if dims else 0
+        keep = [i for i, d in enumerate(dims) if d == dim and d > 0]
+        if len(keep) != len(ids):
+            logger.warning(f"Skipped {len(ids) - len(keep)} embeddings with unexpected dimension in {self.collection}")
+
+        matrix = np.asarray([vectors[i] for i in keep], dtype=np.float32).reshape(len(keep), dim)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        matrix /= norms
+        matrix = np.ascontiguousarray(matrix)
+
+        # Engine dan penyimpanan vektor baru dibangun di luar lock lalu ditukar sekaligus
+        engine = create_engine(self.collection, len(keep), engine=self.engine_mode)
+        engine.rebuild(matrix)
+        store = create_store(dim, self.collection, matrix, mode=self.storage_mode)
+        originals = create_originals(dim, store, matrix)
+        del matrix
+        filters = ItemFilterTable(len(keep))
+        for row, i in enumerate(keep):
+            filters.set(row, metadata[i])
+
+        with self._lock:
+            self._reset(dim)
+            self._engine = engine
+            self._store = store
+            self._originals = originals
+            self._ids = [ids[i] for i in keep]
+            self._metadata = [metadata[i] for i in keep]
+            self._row_by_id = {item_id: row for row, item_id in enumerate(self._ids)}
+            self._alive = np.ones(len(keep), dtype=bool)
+            self._available = np.array([m.get("status", "available") == "available" for m in self._metadata], dtype=bool)
+            self._filters = filters
+            self._size = len(keep)
+            self.loaded_at = time.time()
+
+    def _grow(self, min_capacity):
+        capacity = max(min_capacity, 2 * self._store.capacity, 16)
+        self._store.grow(capacity)
+        if self._originals is not None:
+            self._originals.grow(capacity)
+        available = np.zeros(capacity, dtype=bool)
+        available[:self._size] = self._available[:self._size]
+        alive = np.zeros(capacity, dtype=bool)
+        alive[:self._size] = self._alive[:self._size]
+        self._available, self._alive = available, alive
+        self._filters.grow(capacity)
+
+    def upsert(self, item_id, data):
+        if "embedding" not in data:
+            self.update_fields(item_id, data)
+            return
+        vector = normalize_embedding(data["embedding"])
+        item = item_from_document(item_id, data)
+
+        with self._lock:
+            if self._size == 0 and self.dim != len(vector):
+                self._reset(len(vector))
+            if len(vector) != self.dim:
+                logger.warning(f"Embedding for {item_id} has dimension {len(vector)}, index expects {self.dim}")
+                return
+
+            row = self._row_by_id.get(item_id)
+            if row is None:
+                if self._size >= self._store.capacity:
+                    self._grow(self._size + 1)
+                row = self._size
+                self._size += 1
+                self._ids.append(item_id)
+                self._metadata.append(item)
+                self._row_by_id[item_id] = row
+            else:
+                self._metadata[row] = item
+
+            self._store.set(row, vector)
+            if self._originals is not None:
+                self._originals.set(row, vector)
+            self._engine.add(row, vector)
+            self._alive[row] = True
+            self._available[row] = item["status"] == "available"
+            self._filters.set(row, item)
+
+    def remove(self, item_id):
+        with self._lock:
+            row = self._row_by_id.pop(item_id, None)
+            if row is None:
+                return
+            self._alive[row] = False
+            self._available[row] = False
+            self._filters.clear(row)
+            self._engine.remove(row)
+
+    def set_status(self, item_id, status):
+        with self._lock:
+            row = self._row_by_id.get(item_id)
+            if row is None:
+                return
+            self._metadata[row] = {**self._metadata[row], "status": status}
+            self._available[row] = status == "available"
+            self._filters.update(row, {"status": status})
+
+    def update_fields(self, item_id, fields):
+        with self._lock:
+            row = self._row_by_id.get(item_id)
+            if row is None:
+                return
+            updated = {**self._metadata[row]}
+            for key, value in fields.items():
+                if key in METADATA_FIELDS or key in OPTIONAL_FIELDS:
+                    updated[key] = value
+            self._metadata[row] = updated
+            if "status" in fields:
+                self._available[row] = fields["status"] == "available"
+            self._filters.update(row, fields)
+
+    def search_rows(self, query_embedding, threshold=0.3, top_k=None, exact=False, nprobe=None, filters=None):
+        """Baris dan skor item di atas threshold (urut skor) beserta list metadata, tanpa membuat dict hasil.
+        filters (lihat item_filters.build_filters) diterapkan sebelum skor dihitung; filter status
+        menggantikan syarat default status "available"."""
+        query = normalize_embedding(query_embedding)
+        empty = np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+        with self._lock:
+            size = self._size
+            dim = self.dim
+            store = self._store
+            originals = self._originals
+            mask = self._available[:size].copy()
+            if filters:
+                if "status" in filters:
+                    mask = self._alive[:size].copy()
+                mask &= self._filters.mask(filters, size)
+            metadata = self._metadata
+            if size == 0 or query.shape[0] != dim:
+                rows = None
+            else:
+                rows = None if exact else self._engine.candidates(query, nprobe)
+
+        if size == 0:
+            return (*empty, metadata)
+        if query.shape[0] != dim:
+            logger.error(f"Query embedding dimension {query.shape[0]} does not match index dimension {dim}")
+            return (*empty, metadata)
+
+        if filters:
+            # Hanya baris yang lolos filter yang dihitung skornya
+            rows = np.flatnonzero(mask) if rows is None else rows[mask[rows]]
+        if rows is None:
+            rows = np.arange(size)
+            scores = store.scores(query, size)
+        else:
+            scores = store.scores(query, size, rows)
+
+        # Skor perkiraan (mode terkompresi) diberi toleransi margin sebelum dicek ulang
+        keep = mask[rows] & (scores >= threshold - store.margin)
+        hits, hit_scores = rows[keep], scores[keep]
+
+        if not store.exact:
+            limit = IMAGE_RERANK_CANDIDATES if top_k is None else max(top_k, min(IMAGE_RERANK_CANDIDATES, store.rerank_factor * top_k))
+            if len(hits) > limit:
+                best = np.argpartition(-hit_scores, limit - 1)[:limit]
+                hits, hit_scores = hits[best], hit_scores[best]
+            if originals is not None:
+                hit_scores = originals.scores(query, hits)
+            keep = hit_scores >= threshold
+            hits, hit_scores = hits[keep], hit_scores[keep]
+
+        if top_k is not None and len(hits) > top_k:
+            best = np.argpartition(-hit_scores, top_k - 1)[:top_k]
+            hits, hit_scores = hits[best], hit_scores[best]
+        order = np.lexsort((hits, -hit_scores))
+        return hits[order], hit_scores[order], metadata
+
+    def search(self, query_embedding, threshold=0.3, top_k=None, exact=False, nprobe=None, filters=None):
+        hits, hit_scores, metadata = self.search_rows(query_embedding, threshold, top_k, exact, nprobe, filters)
+        return [{**metadata[row], "score": float(score), "match_type": "image"}
+                for row, score in zip(hits, hit_scores)]
+
+    def get_stats(self):
+        with self._lock:
+            store = self._store
+            return {
+                "items": len(self),
+                "dim": self.dim,
+                **self._engine.get_stats(),
+                "storage": store.mode,
+                "vector_bytes": store.memory_bytes(),
+                "bytes_per_vector": store.memory_bytes() / max(self._size, 1),
+                "rerank_originals": self._originals is not None,
+            }
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+def get_image_index(collection="found_items", load=True):
+    with _indexes_lock:
+        index = _indexes.get(collection)
+        if index is None:
+            index = ImageEmbeddingIndex(collection)
+            _indexes[collection] = index
+
+    if load and index.is_stale():
+        with index._load_lock:
+            if index.is_stale():
+                index.load()
+    return index
+
+def peek_image_index(collection="found_items"):
+    # Hanya mengembalikan index yang sudah dimuat, tanpa memicu load dari Firestore
+    return _indexes.get(collection)
@@ -0,0 +1,93 @@
+# pylint: disable=all
+# type: ignore
+# noqa
+
+import logging
+import threading
+from collections import Counter
+from app.services.image_index import peek_image_index
+from app.services.text_index import peek_text_index, index_item_text_saved, invalidate_text_indexes
+
+logger = logging.getLogger(__name__)
+
+# Titik tunggal untuk menjaga index in-memory tetap sinkron dengan penulisan ke Firestore.
+# Index yang belum pernah dimuat diabaikan; index tersebut akan membaca Firestore saat dipakai.
+
+# Generasi per koleksi naik setiap ada perubahan item lewat fungsi notify_* (setelah index
+# diperbarui); cache hasil pencarian (result_cache) menganggap entri generasi lama tidak berlaku.
+ALL_COLLECTIONS = "*"
+_generations = Counter()
+_generation_lock = threading.Lock()
+
+def bump_generation(collection=ALL_COLLECTIONS):
+    with _generation_lock:
+        _generations[collection] += 1
+
+def get_generation(collection):
+    with _generation_lock:
+        return _generations[collection] + _generations[ALL_COLLECTIONS]
+
+def _loaded(index):
+    return index is not None and index.loaded_at is not None
+
+def notify_item_saved(collection, item_id, data):
+    try:
+        image_index = peek_image_index(collection)
+        if _loaded(image_index):
+            image_index.upsert(item_id, data)
+
+        text_index = peek_text_index(collection)
+        if _loaded(text_index):
+            if "text_embedding" in data:
+                text_index.upsert(item_id, data)
+            else:
+                text_index.update_fields(item_id, data)
+    except Exception as e:
+        logger.error(f"Error updating indexes for item {item_id}: {str(e)}")
+    bump_generation(collection)
+
+def notify_item_replicated(collection, item_id, data):
+    # Dokumen lengkap dari replika on_snapshot, termasuk perubahan dari worker / skrip lain
+    try:
+        image_index = peek_image_index(collection)
+        if _loaded(image_index):
+            if "embedding" in data:
+                image_index.upsert(item_id, data)
+            else:
+                image_index.remove(item_id)
+
+        text_index = peek_text_index(collection)
+        if _loaded(text_index):
+            text_index.upsert(item_id, data)
+    except Exception as e:
+        logger.error(f"Error updating indexes for replicated item {item_id}: {str(e)}")
+    bump_generation(collection)
+
+def notify_item_text_saved(collection, item_id, fields):
+    try:
+        index_item_text_saved(collection, item_id, fields)
+    except Exception as e:
+        logger.error(f"Error updating text index for item {item_id}: {str(e)}")
+    bump_generation(collection)
+
+def notify_item_removed(collection, item_id):
+    for index in (peek_image_index(collection), peek_text_index(collection)):
+        if index is not None:
+            index.remove(item_id)
+    bump_generation(collection)
+
+def notify_item_status_changed(collection, item_id, status):
+    for index in (peek_image_index(collection), peek_text_index(collection)):
+        if index is not None:
+            index.set_status(item_id, status)
+    bump_generation(collection)
+
+def notify_item_fields_changed(collection, item_id, fields):
+    for index in (peek_image_index(collection), peek_text_index(collection)):
+        if index is not None:
+            index.update_fields(item_id, fields)
+    bump_generation(collection)
+
+def notify_text_embeddings_rebuilt():
+    invalidate_text_indexes()
+    bump_generation()
@@ -0,0 +1,158 @@
+# pylint: disable=all
+# type: ignore
+# noqa
+
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from app.config import (
+    INFERENCE_MAX_BATCH_SIZE,
+    INFERENCE_MAX_WAIT_MS,
+    INFERENCE_QUEUE_SIZE,
+    INFERENCE_ENQUEUE_TIMEOUT_MS,
+)
+
+logger = logging.getLogger(__name__)
+
+class InferenceQueueFull(Exception):
+    pass
+
+def _encode_images(images):
+    # Dijalankan di thread inference: cache dicek per gambar dan satu gambar rusak
+    # tidak menggagalkan seluruh batch (lihat image_encoder.encode_images)
+    from app.services.image_encoder import encode_images
+
+    return encode_images(images, max_batch_size=len(images))
+
+class InferenceScheduler:
+    def __init__(self, max_batch_size=INFERENCE_MAX_BATCH_SIZE, max_wait_ms=INFERENCE_MAX_WAIT_MS,
+                 max_queue_size=INFERENCE_QUEUE_SIZE, enqueue_timeout_ms=INFERENCE_ENQUEUE_TIMEOUT_MS):
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_queue_size = max_queue_size
+        self.enqueue_timeout = enqueue_timeout_ms / 1000.0
+        self._queue = None
+        self._task = None
+        self._loop = None
+        self._executor = None
+        self._reset_metrics()
+
+    def _reset_metrics(self):
+        self.metrics = {
+            "submitted": 0,
+            "completed": 0,
+            "failed": 0,
+            "rejected": 0,
+            "batches": 0,
+            "max_queue_depth": 0,
+            "batch_size_histogram": {},
+            "total_queue_wait_ms": 0.0,
+            "total_inference_ms": 0.0,
+        }
+
+    @property
+    def running(self):
+        return self._task is not None and not self._task.done()
+
+    async def start(self):
+        if self.running:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="inference")
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"Inference scheduler started (batch={self.max_batch_size}, wait={self.max_wait * 1000:.0f}ms, "
+                    f"queue={self.max_queue_size})")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    async def submit(self, image):
+        future = self._loop.create_future()
+        try:
+            await asyncio.wait_for(self._queue.put((image, future, time.perf_counter())), self.enqueue_timeout)
+        except asyncio.TimeoutError:
+            self.metrics["rejected"] += 1
+            raise InferenceQueueFull(f"Inference queue is full ({self.max_queue_size} pending images)")
+
+        self.metrics["submitted"] += 1
+        self.metrics["max_queue_depth"] = max(self.metrics["max_queue_depth"], self._queue.qsize())
+        return await future
+
+    async def _collect_batch(self):
+        batch = [await self._queue.get()]
+        deadline = self._loop.time() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+            remaining = deadline - self._loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        while True:
+            batch = await self._collect_batch()
+            started = time.perf_counter()
+            images = [image for image, _, _ in batch]
+
+            try:
+                results = await self._loop.run_in_executor(self._executor, _encode_images, images)
+            except Exception as e:
+                results = [e] * len(batch)
+
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            self.metrics["batches"] += 1
+            self.metrics["total_inference_ms"] += elapsed_ms
+            histogram = self.metrics["batch_size_histogram"]
+            histogram[len(batch)] = histogram.get(len(batch), 0) + 1
+
+            for (_, future, enqueued_at), result in zip(batch, results):
+                self.metrics["total_queue_wait_ms"] += (started - enqueued_at) * 1000
+                if future.done():
+                    continue
+                if isinstance(result, Exception):
+                    self.metrics["failed"] += 1
+                    future.set_exception(result)
+                else:
+                    self.metrics["completed"] += 1
+                    future.set_result(result)
+
+    def get_metrics(self):
+        metrics = dict(self.metrics)
+        metrics["batch_size_histogram"] = dict(self.metrics["batch_size_histogram"])
+        metrics["running"] = self.running
+        metrics["queue_depth"] = self._queue.qsize() if self._queue is not None else 0
+        metrics["queue_capacity"] = self.max_queue_size
+        batches = max(metrics["batches"], 1)
+        processed = max(metrics["completed"] + metrics["failed"], 1)
+        metrics["avg_batch_size"] = (metrics["completed"] + metrics["failed"]) / batches
+        metrics["avg_inference_ms"] = metrics["total_inference_ms"] / batches
+        metrics["avg_queue_wait_ms"] = metrics["total_queue_wait_ms"] / processed
+        return metrics
+
+inference_scheduler = InferenceScheduler()
+
+async def extract_features_async(image):
+    if inference_scheduler.running and inference_scheduler._loop is asyncio.get_running_loop():
+        return await inference_scheduler.submit(image)
+
+    from app.services.image_encoder import extract_features
+    return await asyncio.get_running_loop().run_in_executor(None, extract_features, image)
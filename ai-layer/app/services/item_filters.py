@@ -0,0 +1,199 @@
+# pylint: disable=all
+# type: ignore
+# noqa
+
+import numpy as np
+from datetime import date, datetime
+
+# Filter item (status, kategori, lokasi, tanggal) dievaluasi sebagai bitmap per baris index
+# sebelum skor kemiripan dihitung. Koleksi sudah dipisah per index (found_items / lost_items).
+#   - status, kategori: bitmap boolean per nilai
+#   - lokasi: kode nilai per baris; filter = substring pada nilai unik (teks bebas)
+#   - tanggal: ordinal hari per baris + array terurut untuk pencarian rentang (searchsorted)
+
+LOCATION_FIELDS = ("location_found", "last_seen_location")
+DATE_FIELDS = ("found_date", "date_lost")
+FILTER_FIELDS = ("status", "category") + LOCATION_FIELDS + DATE_FIELDS
+
+NO_DATE = -1
+NO_VALUE = -1
+
+def _normalize(value):
+    return " ".join(str(value).lower().split()) if value else ""
+
+def parse_date(value):
+    """Ordinal hari dari tanggal ISO ("2024-05-01", "2024-05-01T10:00:00"), NO_DATE jika tidak valid"""
+    if isinstance(value, datetime):
+        return value.date().toordinal()
+    if isinstance(value, date):
+        return value.toordinal()
+    try:
+        return date.fromisoformat(str(value).strip()[:10]).toordinal()
+    except (TypeError, ValueError):
+        return NO_DATE
+
+def build_filters(category=None, location=None, status=None, date_from=None, date_to=None):
+    """Filter ternormalisasi untuk search_rows / score_rows, None jika tidak ada filter.
+    Tanggal yang tidak valid menghasilkan ValueError."""
+    filters = {}
+    if category:
+        filters["category"] = _normalize(category)
+    if location:
+        filters["location"] = _normalize(location)
+    if status:
+        filters["status"] = _normalize(status)
+    for key, value in (("date_from", date_from), ("date_to", date_to)):
+        if value:
+            ordinal = parse_date(value)
+            if ordinal == NO_DATE:
+                raise ValueError(f"Format {key} tidak valid: {value} (gunakan YYYY-MM-DD)")
+            filters[key] = ordinal
+    return filters or None
+
+def matches_filters(data, filters):
+    """Evaluasi filter untuk satu dokumen (pemindaian tanpa index), semantik sama dengan ItemFilterTable"""
+    if not filters:
+        return True
+    if "status" in filters and _normalize(data.get("status", "available")) != filters["status"]:
+        return False
+    if "category" in filters and _normalize(data.get("category", "")) != filters["category"]:
+        return False
+    if "location" in filters:
+        location = next((_normalize(data[f]) for f in LOCATION_FIELDS if data.get(f)), "")
+        if filters["location"] not in location:
+            return False
+    if "date_from" in filters or "date_to" in filters:
+        value = next((data[f] for f in DATE_FIELDS if data.get(f)), None)
+        ordinal = parse_date(value) if value else NO_DATE
+        if ordinal == NO_DATE:
+            return False
+        if ordinal < filters.get("date_from", ordinal) or ordinal > filters.get("date_to", ordinal):
+            return False
+    return True
+
+class ItemFilterTable:
+    """Nilai filter per baris index. Pemanggil memegang lock index saat mengubah / membaca."""
+
+    def __init__(self, capacity=0):
+        self._capacity = 0
+        self._status_bitmaps = {}
+        self._category_bitmaps = {}
+        self._statuses = []
+        self._categories = []
+        self._location_codes = np.full(0, NO_VALUE, dtype=np.int64)
+        self._location_values = []
+        self._location_code_of = {}
+        self._dates = np.full(0, NO_DATE, dtype=np.int64)
+        self._sorted_dates = None
+        self.grow(capacity)
+
+    def grow(self, capacity):
+        if capacity <= self._capacity:
+            return
+        capacity = max(capacity, 2 * self._capacity, 16)
+        for bitmaps in (self._status_bitmaps, self._category_bitmaps):
+            for value, bitmap in bitmaps.items():
+                grown = np.zeros(capacity, dtype=bool)
+                grown[:self._capacity] = bitmap
+                bitmaps[value] = grown
+        extra = capacity - self._capacity
+        self._statuses.extend([None] * extra)
+        self._categories.extend([None] * extra)
+        self._location_codes = np.concatenate([self._location_codes, np.full(extra, NO_VALUE, dtype=np.int64)])
+        self._dates = np.concatenate([self._dates, np.full(extra, NO_DATE, dtype=np.int64)])
+        self._capacity = capacity
+
+    def _set_bit(self, bitmaps, values, row, value):
+        old = values[row]
+        if old == value:
+            return
+        if old is not None:
+            bitmaps[old][row] = False
+        if value is not None:
+            bitmap = bitmaps.get(value)
+            if bitmap is None:
+                bitmap = bitmaps[value] = np.zeros(self._capacity, dtype=bool)
+            bitmap[row] = True
+        values[row] = value
+
+    def _set_location(self, row, value):
+        code = NO_VALUE
+        if value:
+            code = self._location_code_of.get(value)
+            if code is None:
+                code = self._location_code_of[value] = len(self._location_values)
+                self._location_values.append(value)
+        self._location_codes[row] = code
+
+    def _set_date(self, row, value):
+        ordinal = parse_date(value) if value else NO_DATE
+        if self._dates[row] != ordinal:
+            self._dates[row] = ordinal
+            self._sorted_dates = None
+
+    def set(self, row, data):
+        """Mengisi semua nilai filter baris dari dokumen / metadata item"""
+        self.grow(row + 1)
+        self._set_bit(self._status_bitmaps, self._statuses, row, _normalize(data.get("status", "available")))
+        self._set_bit(self._category_bitmaps, self._categories, row, _normalize(data.get("category", "")))
+        self._set_location(row, next((_normalize(data[f]) for f in LOCATION_FIELDS if data.get(f)), ""))
+        self._set_date(row, next((data[f] for f in DATE_FIELDS if data.get(f)), None))
+
+    def update(self, row, fields):
+        """Hanya field filter yang ada di fields yang diubah"""
+        if row >= self._capacity:
+            return
+        if "status" in fields:
+            self._set_bit(self._status_bitmaps, self._statuses, row, _normalize(fields["status"]))
+        if "category" in fields:
+            self._set_bit(self._category_bitmaps, self._categories, row, _normalize(fields["category"]))
+        for field in LOCATION_FIELDS:
+            if field in fields:
+                self._set_location(row, _normalize(fields[field]))
+        for field in DATE_FIELDS:
+            if field in fields:
+                self._set_date(row, fields[field])
+
+    def clear(self, row):
+        if row >= self._capacity:
+            return
+        self._set_bit(self._status_bitmaps, self._statuses, row, None)
+        self._set_bit(self._category_bitmaps, self._categories, row, None)
+        self._location_codes[row] = NO_VALUE
+        self._set_date(row, None)
+
+    def _date_range(self, size, date_from, date_to):
+        # Array tanggal terurut dibangun ulang hanya setelah ada tanggal yang berubah
+        if self._sorted_dates is None:
+            order = np.argsort(self._dates, kind="stable")
+            self._sorted_dates = (self._dates[order], order)
+        sorted_dates, order = self._sorted_dates
+        start = np.searchsorted(sorted_dates, max(date_from if date_from is not None else 0, 0), side="left")
+        end = len(sorted_dates) if date_to is None else np.searchsorted(sorted_dates, date_to, side="right")
+        mask = np.zeros(self._capacity, dtype=bool)
+        mask[order[start:end]] = True
+        return mask[:size]
+
+    def mask(self, filters, size):
+        """Bitmap baris [0, size) yang lolos semua filter (AND), None jika tidak ada filter"""
+        if not filters:
+            return None
+        self.grow(size)
+        empty = np.zeros(size, dtype=bool)
+        mask = None
+        for key, bitmaps in (("status", self._status_bitmaps), ("category", self._category_bitmaps)):
+            if key in filters:
+                bitmap = bitmaps.get(filters[key])
+                if bitmap is None:
+                    return empty
+                mask = bitmap[:size].copy() if mask is None else mask & bitmap[:size]
+        if "location" in filters:
+            codes = [code for code, value in enumerate(self._location_values) if filters["location"] in value]
+            if not codes:
+                return empty
+            selected = np.isin(self._location_codes[:size], codes)
+            mask = selected if mask is None else mask & selected
+        if "date_from" in filters or "date_to" in filters:
+            selected = self._date_range(size, filters.get("date_from"), filters.get("date_to"))
+            mask = selected if mask is None else mask & selected
+        return mask if mask is not None else np.ones(size, dtype=bool)
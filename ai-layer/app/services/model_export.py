@@ -0,0 +1,137 @@
+# pylint: disable=all
+# type: ignore
+# noqa
+
+import copy
+import logging
+import os
+import time
+import numpy as np
+import torch
+import torchvision.models as models
+
+logger = logging.getLogger(__name__)
+
+MODEL_DIR = "app/models"
+EAGER_MODEL_PATH = os.path.join(MODEL_DIR, "mobilenet_v3_small_feature_extractor.pth")
+TORCHSCRIPT_MODEL_PATH = os.path.join(MODEL_DIR, "mobilenet_v3_small_feature_extractor_ts.pt")
+INT8_MODEL_PATH = os.path.join(MODEL_DIR, "mobilenet_v3_small_feature_extractor_int8.pt")
+
+BACKEND_PATHS = {
+    "eager": EAGER_MODEL_PATH,
+    "torchscript": TORCHSCRIPT_MODEL_PATH,
+    "int8": INT8_MODEL_PATH,
+}
+
+def build_feature_extractor(weights_path=EAGER_MODEL_PATH, map_location="cpu"):
+    model = models.mobilenet_v3_small(weights=models.MobileNet_V3_Small_Weights.DEFAULT)
+    model.eval()
+    model = torch.nn.Sequential(*list(model.children())[:-1])
+    if weights_path and os.path.exists(weights_path):
+        model.load_state_dict(torch.load(weights_path, map_location=map_location))
+    return model.eval()
+
+def _example_input(batch_size=1):
+    return torch.randn(batch_size, 3, 224, 224)
+
+def export_torchscript(model, path=TORCHSCRIPT_MODEL_PATH):
+    model = copy.deepcopy(model).cpu().eval()
+    with torch.inference_mode():
+        traced = torch.jit.trace(model, _example_input())
+    frozen = torch.jit.freeze(traced.eval())
+    torch.jit.save(frozen, path)
+    logger.info(f"TorchScript model disimpan ke {path}")
+    return frozen
+
+def _quantization_engine():
+    engines = torch.backends.quantized.supported_engines
+    for engine in ("x86", "fbgemm", "qnnpack"):
+        if engine in engines:
+            return engine
+    raise RuntimeError("Tidak ada quantization engine yang didukung di platform ini")
+
+def export_int8(model, calibration_batches, path=INT8_MODEL_PATH):
+    # Post-training static quantization (FX graph mode). Dynamic quantization tidak dipakai
+    # karena feature extractor ini tidak memiliki layer Linear, sehingga tidak ada yang terkuantisasi.
+    from torch.ao.quantization import get_default_qconfig_mapping
+    from torch.ao.quantization.quantize_fx import prepare_fx, convert_fx
+
+    engine = _quantization_engine()
+    torch.backends.quantized.engine = engine
+    model = copy.deepcopy(model).cpu().eval()
+
+    prepared = prepare_fx(model, get_default_qconfig_mapping(engine), example_inputs=(_example_input(),))
+    with torch.inference_mode():
+        for batch in calibration_batches:
+            prepared(batch)
+    quantized = convert_fx(prepared)
+
+    with torch.inference_mode():
+        traced = torch.jit.trace(quantized, _example_input())
+    frozen = torch.jit.freeze(traced.eval())
+    torch.jit.save(frozen, path)
+    logger.info(f"Model INT8 ({engine}) disimpan ke {path}")
+    return frozen
+
+def load_backend_model(backend, device):
+    if backend == "eager":
+        return build_feature_extractor(map_location=device).to(device)
+
+    if backend not in BACKEND_PATHS:
+        raise ValueError(f"Backend inference tidak dikenal: {backend}")
+    path = BACKEND_PATHS[backend]
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Artifact {backend} tidak ditemukan: {path} (jalankan init_models.py)")
+    if backend == "int8":
+        if device.type != "cpu":
+            raise ValueError("Model INT8 hanya dapat dijalankan di CPU")
+        torch.backends.quantized.engine = _quantization_engine()
+    return torch.jit.load(path, map_location=device).eval()
+
+def _embed(model, batches):
+    outputs = []
+    with torch.inference_mode():
+        for batch in batches:
+            outputs.append(model(batch).flatten(1).cpu().numpy())
+    return np.concatenate(outputs, axis=0)
+
+def _cosine_rows(a, b):
+    a = a / np.maximum(np.linalg.norm(a, axis=1, keepdims=True), 1e-12)
+    b = b / np.maximum(np.linalg.norm(b, axis=1, keepdims=True), 1e-12)
+    return np.sum(a * b, axis=1)
+
+def _benchmark(model, throughput_batch, repeats=5):
+    single = _example_input(1)
+    batch = _example_input(throughput_batch)
+    with torch.inference_mode():
+        model(single)
+        model(batch)
+
+        start = time.perf_counter()
+        for _ in range(repeats):
+            model(single)
+        latency_ms = (time.perf_counter() - start) * 1000 / repeats
+
+        start = time.perf_counter()
+        for _ in range(repeats):
+            model(batch)
+        throughput = throughput_batch * repeats / (time.perf_counter() - start)
+    return latency_ms, throughput
+
+def compare_backends(models_by_backend, sample_batches, throughput_batch=16):
+    # Paritas dihitung terhadap embedding fp32 eager pada sampel yang sama
+    reference = _embed(models_by_backend["eager"], sample_batches)
+    report = {}
+    for backend, model in models_by_backend.items():
+        embeddings = reference if backend == "eager" else _embed(model, sample_batches)
+        agreement = _cosine_rows(reference, embeddings)
+        latency_ms, throughput = _benchmark(model, throughput_batch)
+        report[backend] = {
+            "cosine_mean": float(agreement.mean()),
+            "cosine_min": float(agreement.min()),
+            "latency_ms_batch1": latency_ms,
+            "images_per_second": throughput,
+        }
+        logger.info(f"[{backend}] cosine vs fp32: mean={agreement.mean():.4f} min={agreement.min():.4f}, "
+                    f"latency={latency_ms:.1f}ms, throughput={throughput:.1f} img/s (batch {throughput_batch})")
+    return report
@@ -0,0 +1,126 @@
+# pylint: disable=all
+# type: ignore
+# noqa
+
+import gc
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Model dimuat saat pertama kali dibutuhkan, bukan saat modul di-import. Dengan mode
+# preload (run.py --preload) model dimuat sekali di proses induk sebelum fork sehingga
+# bobotnya dipakai bersama (copy-on-write) oleh semua worker.
+
+_loaders = {}
+_warmups = {}
+_models = {}
+_load_seconds = {}
+_locks = {}
+_registry_lock = threading.Lock()
+
+_process_started_at = time.time()
+_state = {
+    "preloaded_in_parent": False,
+    "warmup_started_at": None,
+    "warmup_finished_at": None,
+    "warmup_error": None,
+}
+
+def mark_process_started():
+    global _process_started_at
+    _process_started_at = time.time()
+
+def register_model(name, loader, warmup=None):
+    with _registry_lock:
+        _loaders[name] = loader
+        _locks.setdefault(name, threading.Lock())
+        if warmup is not None:
+            _warmups[name] = warmup
+
+def get_model(name):
+    model = _models.get(name)
+    if model is not None:
+        return model
+
+    lock = _locks[name]
+    with lock:
+        if name not in _models:
+            start_time = time.time()
+            _models[name] = _loaders[name]()
+            _load_seconds[name] = time.time() - start_time
+            logger.info(f"Model '{name}' dimuat dalam {_load_seconds[name]:.2f} detik")
+    return _models[name]
+
+def is_loaded(name):
+    return name in _models
+
+def set_model(name, model):
+    with _locks.setdefault(name, threading.Lock()):
+        _models[name] = model
+
+def preload(names=None):
+    # Dipanggil di proses induk sebelum fork; sengaja tanpa inference agar thread pool
+    # OpenMP/BLAS belum dibuat saat fork.
+    for name in (list(_loaders) if names is None else names):
+        get_model(name)
+    gc.collect()
+    if hasattr(gc, "freeze"):
+        gc.freeze()
+    _state["preloaded_in_parent"] = True
+
+def warm_up(names=None):
+    _state["warmup_started_at"] = time.time()
+    try:
+        for name in (list(_loaders) if names is None else names):
+            model = get_model(name)
+            if name in _warmups:
+                _warmups[name](model)
+        _state["warmup_finished_at"] = time.time()
+        logger.info(f"Warm-up model selesai dalam {_state['warmup_finished_at'] - _state['warmup_started_at']:.2f} detik")
+    except Exception as e:
+        _state["warmup_error"] = str(e)
+        logger.error(f"Warm-up model gagal: {str(e)}")
+
+def start_warm_up(names=None):
+    thread = threading.Thread(target=warm_up, args=(names,), name="model-warmup", daemon=True)
+    thread.start()
+    return thread
+
+def is_ready():
+    return _state["warmup_finished_at"] is not None
+
+def _memory_usage():
+    usage = {}
+    try:
+        with open("/proc/self/smaps_rollup") as f:
+            for line in f:
+                key, _, value = line.partition(":")
+                if key in ("Rss", "Pss", "Shared_Clean", "Shared_Dirty", "Private_Clean", "Private_Dirty"):
+                    usage[key.lower() + "_mb"] = int(value.split()[0]) / 1024
+    except OSError:
+        import resource
+        usage["max_rss_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return usage
+
+def get_status():
+    started = _state["warmup_started_at"]
+    finished = _state["warmup_finished_at"]
+    return {
+        "ready": is_ready(),
+        "pid": os.getpid(),
+        "preloaded_in_parent": _state["preloaded_in_parent"],
+        "models": {
+            name: {
+                "loaded": name in _models,
+                "load_seconds": _load_seconds.get(name),
+            }
+            for name in _loaders
+        },
+        "warmup_seconds": (finished - started) if started and finished else None,
+        "seconds_since_start_to_ready": (finished - _process_started_at) if finished else None,
+        "warmup_error": _state["warmup_error"],
+        "memory": _memory_usage(),
+    }
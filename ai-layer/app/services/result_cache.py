@@ -0,0 +1,105 @@
+# pylint: disable=all
+# type: ignore
+# noqa
+
+import copy
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from app.config import QUERY_CACHE_SIZE, QUERY_CACHE_TTL_SECONDS
+from app.services.index_sync import get_generation
+
+logger = logging.getLogger(__name__)
+
+# Cache hasil pencarian yang sering diulang ("dompet hitam", "ktm", ...). Key berisi endpoint,
+# query ternormalisasi, hash isi gambar, koleksi dan semua threshold/bobot. Entri dibuang
+# karena LRU, TTL, atau generasi koleksi yang sudah naik (item ditambah/dihapus/berubah status).
+
+def normalize_query(text):
+    return " ".join(text.lower().split()) if text else ""
+
+class QueryResultCache:
+    def __init__(self, max_entries=QUERY_CACHE_SIZE, ttl_seconds=QUERY_CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {
+            "hits": 0,
+            "misses": 0,
+            "expired": 0,
+            "invalidated": 0,
+            "stores": 0,
+            "evictions": 0,
+            "saved_ms": 0.0,
+        }
+
+    @staticmethod
+    def make_key(*parts):
+        return hashlib.blake2b(json.dumps(parts, sort_keys=True, default=str).encode(), digest_size=16).hexdigest()
+
+    def get(self, key, collection):
+        generation = get_generation(collection)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.stats["misses"] += 1
+                return None
+            expires_at, entry_generation, value, compute_ms = entry
+            if expires_at < time.time() or entry_generation != generation:
+                del self._entries[key]
+                self.stats["misses"] += 1
+                self.stats["expired" if entry_generation == generation else "invalidated"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+            self.stats["saved_ms"] += compute_ms
+        # Router boleh mengubah hasil (menghapus field dsb.), jadi yang dikembalikan salinan
+        return copy.deepcopy(value)
+
+    def put(self, key, generation, value, compute_ms):
+        if self.max_entries <= 0 or self.ttl_seconds <= 0:
+            return
+        value = copy.deepcopy(value)
+        with self._lock:
+            self._entries[key] = (time.time() + self.ttl_seconds, generation, value, compute_ms)
+            self._entries.move_to_end(key)
+            self.stats["stores"] += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats["evictions"] += 1
+
+    async def get_or_compute(self, key, collection, compute):
+        """compute: coroutine function -> (value, cacheable). Mengembalikan (value, cached)."""
+        value = self.get(key, collection)
+        if value is not None:
+            return value, True
+
+        # Generasi dicatat sebelum menghitung: perubahan selama pencarian membuat entri langsung usang
+        generation = get_generation(collection)
+        start_time = time.perf_counter()
+        value, cacheable = await compute()
+        if cacheable:
+            self.put(key, generation, value, (time.perf_counter() - start_time) * 1000)
+        return value, False
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self.stats)
+            stats["entries"] = len(self._entries)
+        stats["max_entries"] = self.max_entries
+        stats["ttl_seconds"] = self.ttl_seconds
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        # Setiap hit menghemat waktu pencarian yang tercatat saat entri tersebut dihitung
+        stats["avg_saved_ms_per_hit"] = stats["saved_ms"] / stats["hits"] if stats["hits"] else 0.0
+        return stats
+
+query_result_cache = QueryResultCache()
@@ -3,13 +3,23 @@
 # noqa
 
 from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.base import clone
 from sklearn.metrics.pairwise import cosine_similarity
 import numpy as np
 import pickle
 import os
 import re
 import logging
+import hashlib
+import threading
+import shutil
 from app.services.firebase import db
+from app.services.collection_replica import get_documents
+from app.services.embedding_codec import encode_text_embedding, LEGACY_TEXT_VERSION
+from app.services import model_registry
+from app.services.vectorizer_artifact import CompactTfidfVectorizer, save_vectorizer_artifact, is_vectorizer_artifact
+from app.services.hashing_vectorizer import HashingTextEncoder, is_hashing_version
+from app.config import TEXT_VECTORIZER_MODE, TEXT_HASHING_FEATURES
 import time
 
 logger = logging.getLogger(__name__)
@@ -52,7 +62,9 @@ def custom_tokenizer(text):
     
     return tokens
 
-vectorizer = TfidfVectorizer(
+# Konfigurasi untuk melatih vectorizer baru; yang dipakai untuk transform adalah
+# CompactTfidfVectorizer yang dibaca dari artifact (lihat vectorizer_artifact.py)
+VECTORIZER_TEMPLATE = TfidfVectorizer(
     lowercase=True,
     ngram_range=(1, 3), 
     max_features=20000, 
@@ -62,6 +74,21 @@ vectorizer = TfidfVectorizer(
     sublinear_tf=True,
     tokenizer=custom_tokenizer, 
 )
+vectorizer = VECTORIZER_TEMPLATE
+
+_hashing_encoder = None
+
+def get_hashing_encoder():
+    global _hashing_encoder
+    if _hashing_encoder is None:
+        _hashing_encoder = HashingTextEncoder(
+            tokenizer=custom_tokenizer,
+            stop_words=STOPWORDS_ID,
+            n_features=TEXT_HASHING_FEATURES,
+            ngram_range=VECTORIZER_TEMPLATE.ngram_range,
+            sublinear_tf=VECTORIZER_TEMPLATE.sublinear_tf,
+        )
+    return _hashing_encoder
 
 def preprocess_text(text):
     if not text:
@@ -76,14 +103,145 @@ def preprocess_text(text):
     processed_text = ' '.join(tokens)
     return processed_text
 
+VECTORIZER_PATH = "app/models/tfidf_vectorizer"
+LEGACY_VECTORIZER_PATH = "app/models/tfidf_vectorizer.pkl"
+VECTORIZER_ARCHIVE_DIR = "app/models/vectorizers"
+# Versi vectorizer pickle lama; embedding tanpa versi ("legacy") di-encode dengan vectorizer ini
+LEGACY_VERSION_ALIAS_PATH = os.path.join(VECTORIZER_ARCHIVE_DIR, "legacy_version")
+
+# Setiap vectorizer yang pernah aktif disimpan per versi (hash vocabulary + idf) sehingga
+# embedding lama tetap bisa dibandingkan dengan query yang di-encode oleh vectorizer yang sama
+# selama re-encode berjalan. VECTORIZER_PATH selalu berisi artifact versi aktif.
+_vectorizers = {}
+_vectorizers_lock = threading.Lock()
+
+def compute_vectorizer_version(model):
+    if isinstance(model, (CompactTfidfVectorizer, HashingTextEncoder)):
+        return model.version
+    digest = hashlib.sha1()
+    for term, index in sorted(model.vocabulary_.items(), key=lambda x: x[1]):
+        digest.update(term.encode("utf-8"))
+        digest.update(b"\0")
+    if hasattr(model, "idf_"):
+        digest.update(np.asarray(model.idf_, dtype=np.float64).tobytes())
+    return digest.hexdigest()[:12]
+
+def _archive_path(version):
+    return os.path.join(VECTORIZER_ARCHIVE_DIR, f"tfidf_{version}")
+
+def _to_artifact(model, path, version):
+    # TfidfVectorizer hasil fit/pickle disimpan sebagai artifact lalu dibuka kembali dengan mmap
+    save_vectorizer_artifact(model, path, version, tokenizer_stopwords=STOPWORDS_ID)
+    return CompactTfidfVectorizer(path)
+
+def _activate_vectorizer(model, save=True):
+    # Vectorizer baru tidak pernah di-fit di tempat, jadi objek versi lama tetap utuh
+    global vectorizer, _vectorizer_version
+    version = compute_vectorizer_version(model)
+    archive_path = _archive_path(version)
+    os.makedirs(VECTORIZER_ARCHIVE_DIR, exist_ok=True)
+    if not is_vectorizer_artifact(archive_path):
+        if isinstance(model, CompactTfidfVectorizer):
+            shutil.copytree(model.path, archive_path)
+        else:
+            _to_artifact(model, archive_path, version)
+    if save:
+        shutil.copytree(archive_path, VECTORIZER_PATH + ".tmp")
+        if os.path.exists(VECTORIZER_PATH):
+            shutil.rmtree(VECTORIZER_PATH)
+        os.replace(VECTORIZER_PATH + ".tmp", VECTORIZER_PATH)
+    # Selalu dibuka dari arsip (tidak pernah ditimpa) agar mmap tetap valid saat versi aktif diganti
+    model = CompactTfidfVectorizer(archive_path)
+
+    with _vectorizers_lock:
+        _vectorizers[version] = model
+    _vectorizer_version = (model, version)
+    vectorizer = model
+    return version
+
+_legacy_version = None
+
+def _save_legacy_version(version):
+    global _legacy_version
+    os.makedirs(VECTORIZER_ARCHIVE_DIR, exist_ok=True)
+    with open(LEGACY_VERSION_ALIAS_PATH + ".tmp", "w", encoding="utf-8") as f:
+        f.write(version)
+    os.replace(LEGACY_VERSION_ALIAS_PATH + ".tmp", LEGACY_VERSION_ALIAS_PATH)
+    _legacy_version = version
+
+def get_legacy_vectorizer_version():
+    """Versi vectorizer untuk embedding "legacy" (versi pickle lama), None jika tidak diketahui"""
+    global _legacy_version
+    if _legacy_version is not None:
+        return _legacy_version
+    if os.path.exists(LEGACY_VERSION_ALIAS_PATH):
+        with open(LEGACY_VERSION_ALIAS_PATH, "r", encoding="utf-8") as f:
+            _legacy_version = f.read().strip() or None
+    elif os.path.exists(LEGACY_VECTORIZER_PATH):
+        # Pickle sudah dikonversi sebelum alias dicatat: versinya dihitung ulang dan diarsipkan
+        with open(LEGACY_VECTORIZER_PATH, "rb") as f:
+            model = pickle.load(f)
+        version = compute_vectorizer_version(model)
+        if not is_vectorizer_artifact(_archive_path(version)):
+            os.makedirs(VECTORIZER_ARCHIVE_DIR, exist_ok=True)
+            _to_artifact(model, _archive_path(version), version)
+        _save_legacy_version(version)
+    return _legacy_version
+
+def resolve_text_version(version):
+    """Versi nyata untuk versi embedding; "legacy" / None diganti versi pickle lama jika diketahui"""
+    if version in (None, LEGACY_TEXT_VERSION):
+        return get_legacy_vectorizer_version() or LEGACY_TEXT_VERSION
+    return version
+
+def get_vectorizer_for_version(version):
+    """Vectorizer untuk versi embedding tertentu; None jika arsip versi tersebut tidak ada.
+    Embedding "legacy" memakai vectorizer pickle lama yang diarsipkan, bukan vectorizer aktif."""
+    version = resolve_text_version(version)
+    if version == LEGACY_TEXT_VERSION:
+        return None
+    if version == get_vectorizer_version():
+        return get_vectorizer()
+    if is_hashing_version(version):
+        # Encoder hashing tidak perlu diarsipkan; cukup cocokkan parameter konfigurasi saat ini
+        encoder = get_hashing_encoder()
+        return encoder if encoder.version == version else None
+    with _vectorizers_lock:
+        model = _vectorizers.get(version)
+    if model is not None:
+        return model
+
+    path = _archive_path(version)
+    if is_vectorizer_artifact(path):
+        model = CompactTfidfVectorizer(path)
+    elif os.path.exists(path + ".pkl"):
+        # Arsip pickle dari sebelum format artifact
+        with open(path + ".pkl", "rb") as f:
+            model = _to_artifact(pickle.load(f), path, version)
+    else:
+        return None
+    with _vectorizers_lock:
+        model = _vectorizers.setdefault(version, model)
+    logger.info(f"Vectorizer versi {version} dimuat dari arsip")
+    return model
+
+def loaded_vectorizer_versions():
+    with _vectorizers_lock:
+        return sorted(_vectorizers)
+
 def load_vectorizer(force_retrain=False):
-    global vectorizer
-    path = "app/models/tfidf_vectorizer.pkl"
     try:
-        if os.path.exists(path) and not force_retrain:
-            with open(path, 'rb') as f:
-                vectorizer = pickle.load(f)
-            logger.info("Vectorizer berhasil dimuat dari file")
+        if is_vectorizer_artifact(VECTORIZER_PATH) and not force_retrain:
+            version = _activate_vectorizer(CompactTfidfVectorizer(VECTORIZER_PATH), save=False)
+            logger.info(f"Vectorizer berhasil dimuat dari artifact (versi {version})")
+            return True
+        elif os.path.exists(LEGACY_VECTORIZER_PATH) and not force_retrain:
+            # Pickle lama dikonversi sekali ke artifact
+            with open(LEGACY_VECTORIZER_PATH, 'rb') as f:
+                model = pickle.load(f)
+            version = _activate_vectorizer(model)
+            _save_legacy_version(version)
+            logger.info(f"Vectorizer pickle dikonversi ke artifact (versi {version})")
             return True
         else:
             if force_retrain:
@@ -126,26 +284,43 @@ def load_vectorizer(force_retrain=False):
                 logger.warning(f"Gagal mengambil deskripsi dari database: {str(e)}")
             
             processed_docs = [preprocess_text(doc) for doc in sample_docs]
-            vectorizer.fit(processed_docs)
-            os.makedirs(os.path.dirname(path), exist_ok=True)
-            with open(path, 'wb') as f:
-                pickle.dump(vectorizer, f)
+            model = clone(VECTORIZER_TEMPLATE)
+            model.fit(processed_docs)
+            version = _activate_vectorizer(model)
                 
-            logger.info(f"Vectorizer berhasil dilatih dengan {len(sample_docs)} dokumen contoh")
+            logger.info(f"Vectorizer berhasil dilatih dengan {len(sample_docs)} dokumen contoh (versi {version})")
             return True
             
     except Exception as e:
         logger.error(f"Error saat memuat/melatih vectorizer: {str(e)}")
         return False
 
+def _load_vectorizer_for_registry():
+    if TEXT_VECTORIZER_MODE == "hashing":
+        return get_hashing_encoder()
+    if not load_vectorizer():
+        raise RuntimeError("Vectorizer gagal dimuat")
+    return True
+
+def _warm_up_vectorizer(_):
+    extract_text_features_sparse("dompet hitam berisi kartu mahasiswa")
+
+model_registry.register_model("tfidf_vectorizer", _load_vectorizer_for_registry, warmup=_warm_up_vectorizer)
+
+def get_vectorizer():
+    # load_vectorizer/train_tfidf_with_data mengganti objek global, jadi registry hanya
+    # menjamin vectorizer sudah dimuat sekali (thread-safe) lalu objek terbaru dikembalikan
+    if TEXT_VECTORIZER_MODE == "hashing":
+        return get_hashing_encoder()
+    if vectorizer is VECTORIZER_TEMPLATE:
+        model_registry.get_model("tfidf_vectorizer")
+    return vectorizer
+
 def extract_text_features(text):
     try:
         preprocessed_text = preprocess_text(text)
         
-        if not hasattr(vectorizer, 'vocabulary_') or vectorizer.vocabulary_ is None:
-            load_vectorizer()
-        
-        features = vectorizer.transform([preprocessed_text])
+        features = get_vectorizer().transform([preprocessed_text])
         return features.toarray()[0]
         
     except Exception as e:
@@ -154,106 +329,157 @@ def extract_text_features(text):
             return np.zeros(len(vectorizer.get_feature_names_out()))
         return np.zeros(1000)
 
-def find_similar_items_by_text(query_text, threshold=0.2, collection="found_items", max_results=20):
+_vectorizer_version = (None, None)
+
+def get_vectorizer_version():
+    # Versi = hash isi vocabulary + idf, sehingga vektor dari vectorizer berbeda bisa dikenali
+    global _vectorizer_version
+    model = get_vectorizer()
+    
+    if _vectorizer_version[0] is model:
+        return _vectorizer_version[1]
+    
+    version = compute_vectorizer_version(model)
+    _vectorizer_version = (model, version)
+    return version
+
+TEXT_FEATURE_FIELDS = ["text_tokens", "text_token_count", "item_name_lower"]
+
+def compute_text_fields(description, item_name=None):
+    # Fitur teks yang tidak bergantung pada query, disimpan bersama text_embedding saat ingest
+    tokens = preprocess_text(description).split()
+    fields = {
+        "text_tokens": tokens,
+        "text_token_count": len(tokens),
+    }
+    if item_name is not None:
+        fields["item_name_lower"] = item_name.lower()
+    return fields
+
+def encode_text_features(text):
+    return encode_text_embedding(extract_text_features_sparse(text), get_vectorizer_version())
+
+def extract_text_features_sparse(text):
+    preprocessed_text = preprocess_text(text)
+    
+    return get_vectorizer().transform([preprocessed_text])
+
+def encode_query_for_versions(preprocessed_text, versions):
+    # Query di-encode sekali per versi vectorizer yang masih dipakai di index
+    vectors = {}
+    for version in versions:
+        model = get_vectorizer_for_version(version)
+        if model is None:
+            logger.warning(f"Arsip vectorizer versi {version} tidak ditemukan, item versi ini dilewati")
+            continue
+        vectors[version] = model.transform([preprocessed_text])
+    return vectors
+
+def find_similar_items_by_text(query_text, threshold=0.2, collection="found_items", max_results=20, filters=None,
+                               raise_errors=False):
+    # raise_errors: error diteruskan ke pemanggil (misalnya agar hasil kosong karena error tidak di-cache)
     try:
+        from app.services.text_index import get_text_index
+        
         start_time = time.time()
-        query_features = extract_text_features(query_text)
-        found_data = load_text_embeddings_from_firebase(collection=collection)
         preprocessed_query = preprocess_text(query_text)
-        query_words = set(preprocessed_query.split())
-        similarities = []
+        query_words = list(dict.fromkeys(preprocessed_query.split()))
         
-        for item in found_data:
-            if "text_embedding" not in item or len(item["text_embedding"]) == 0:
-                continue
-                
-            if item.get("status", "available") != "available" and collection == "found_items":
-                continue
-            
-            sim = cosine_similarity([query_features], [item["text_embedding"]])[0][0]
-            desc_words = set(preprocess_text(item.get("description", "")).split())
-            common_words = query_words.intersection(desc_words)
-            word_overlap = len(common_words) / max(len(query_words), 1) if query_words else 0
-            context_score = 0.0
-            
-            if "item_name" in item and item["item_name"].lower() in query_text.lower():
-                context_score += 0.15
-                
-            adjusted_sim = (sim * 0.6) + (word_overlap * 0.3) + context_score
-            adjusted_sim = min(adjusted_sim, 1.0)  
-            
-            if adjusted_sim >= threshold:
-                similarities.append({
-                    **item,
-                    "score": float(adjusted_sim),
-                    "match_type": "text",
-                    "raw_score": float(sim),
-                    "word_overlap": float(word_overlap),
-                    "context_score": float(context_score),
-                    "common_words": list(common_words)[:10]
-                })
+        index = get_text_index(collection)
+        query_vectors = encode_query_for_versions(preprocessed_query, index.versions())
+        similarities = index.search(
+            query_vectors,
+            query_words,
+            query_text,
+            threshold=threshold,
+            max_results=max_results,
+            filters=filters
+        )
         
-        similarities = sorted(similarities, key=lambda x: x["score"], reverse=True)
-        similarities = similarities[:max_results]
         elapsed_time = time.time() - start_time
         logger.info(f"Text matching selesai dalam {elapsed_time:.2f} detik, menemukan {len(similarities)} hasil")
         return similarities
         
     except Exception as e:
         logger.error(f"Error dalam text matching: {str(e)}")
+        if raise_errors:
+            raise
         import traceback
         traceback.print_exc()
         return []
 
-def load_text_embeddings_from_firebase(collection="found_items"):
+def score_text_query(query_text, min_threshold=0.0, collection="found_items", index=None, filters=None):
+    """Skor teks satu query di atas min_threshold: (compiled, rows, scores, query_words, order),
+    order = urutan skor menurun. Threshold lebih tinggi diambil dengan cut_text_scores."""
+    from app.services.text_index import get_text_index
+    
+    if index is None:
+        index = get_text_index(collection)
+    preprocessed_query = preprocess_text(query_text)
+    query_words = list(dict.fromkeys(preprocessed_query.split()))
+    query_vectors = encode_query_for_versions(preprocessed_query, index.versions())
+    compiled, rows, scores = index.score_rows(query_vectors, query_words, query_text, threshold=min_threshold, filters=filters)
+    if len(rows) == 0:
+        return compiled, rows, scores, query_words, np.empty(0, dtype=np.int64)
+    return compiled, rows, scores, query_words, np.argsort(-scores["adjusted"], kind="stable")
+
+def cut_text_scores(scored, threshold):
+    compiled, rows, scores, query_words, order = scored
+    if len(order):
+        order = order[scores["adjusted"][order] >= threshold]
+    return compiled, rows, scores, query_words, order
+
+def text_item_from_document(doc_id, data):
+    item = {
+        "id": doc_id,
+        "item_name": data.get("item_name", ""),
+        "image_url": data.get("image_url", ""),
+        "description": data.get("description", ""),
+        "text_embedding": data.get("text_embedding", []),
+        "status": data.get("status", "available"),
+    }
+    
+    optional_fields = ["location_found", "found_date", "category", 
+                      "last_seen_location", "date_lost", "reward"] + TEXT_FEATURE_FIELDS
+    for field in optional_fields:
+        if field in data:
+            item[field] = data[field]
+    return item
+
+def load_text_embeddings_from_firebase(collection="found_items", documents=None):
+    # documents: iterable (id, data) yang sudah dibaca dari koleksi; jika None dibaca dari Firestore
     try:
         start_time = time.time()
-        docs = db.collection(collection).stream()
+        if documents is None:
+            documents = get_documents(collection)
         embeddings = []
         items_without_embedding = 0
 
-        for doc in docs:
-            data = doc.to_dict()
+        for doc_id, data in documents:
             description = data.get("description", "")
             
             if description and "text_embedding" not in data:
+                # Dokumen bisa milik replika (tidak boleh dimutasi) dan fungsi ini bisa berjalan di
+                # thread listener: embedding dihitung pada salinan, penyimpanan ke Firestore
+                # diserahkan ke re-encode background
                 items_without_embedding += 1
-                text_embedding = extract_text_features(description)
-                try:
-                    db.collection(collection).document(doc.id).update({
-                        "text_embedding": text_embedding.tolist()
-                    })
-                    data["text_embedding"] = text_embedding.tolist()
-                except Exception as update_error:
-                    logger.error(f"Error update embedding: {str(update_error)}")
+                data = {
+                    **data,
+                    "text_embedding": encode_text_features(description),
+                    **compute_text_fields(description, data.get("item_name", ""))
+                }
             
             if description:
-                text_embedding = data.get("text_embedding", [])
-                if isinstance(text_embedding, np.ndarray):
-                    text_embedding = text_embedding.tolist()
-                
-                item = {
-                    "id": doc.id,
-                    "item_name": data.get("item_name", ""),
-                    "image_url": data.get("image_url", ""),
-                    "description": description,
-                    "text_embedding": text_embedding,
-                    "status": data.get("status", "available"),
-                }
-                
-                optional_fields = ["location_found", "found_date", "category", 
-                                  "last_seen_location", "date_lost", "reward"]
-                for field in optional_fields:
-                    if field in data:
-                        item[field] = data[field]
-                
+                item = text_item_from_document(doc_id, data)
                 embeddings.append(item)
 
         elapsed_time = time.time() - start_time
         logger.info(f"Memuat {len(embeddings)} embeddings dari {collection} dalam {elapsed_time:.2f} detik")
         
         if items_without_embedding > 0:
-            logger.info(f"Memperbarui {items_without_embedding} item yang belum memiliki text embedding")
+            from app.services.text_reencoder import start_background_reencode
+            logger.info(f"{items_without_embedding} item belum memiliki text embedding, disimpan oleh re-encode background")
+            start_background_reencode(rescan=True)
             
         return embeddings
         
@@ -261,14 +487,23 @@ def load_text_embeddings_from_firebase(collection="found_items"):
         logger.error(f"Error memuat embeddings dari Firebase: {str(e)}")
         return []
 
-def save_text_embedding_to_firebase(item_id, description):
+def save_text_embedding_to_firebase(item_id, description, item_name=None):
     if not description:
         return False
     
     try:
-        text_embedding = extract_text_features(description)
+        from app.services.index_sync import notify_item_text_saved
+        
+        text_embedding = encode_text_features(description)
+        text_fields = compute_text_fields(description, item_name)
         db.collection("found_items").document(item_id).update({
-            "text_embedding": text_embedding.tolist()
+            "text_embedding": text_embedding,
+            **text_fields
+        })
+        notify_item_text_saved("found_items", item_id, {
+            "description": description,
+            "text_embedding": text_embedding,
+            **text_fields
         })
         logger.info(f"Berhasil menyimpan text embedding untuk item {item_id}")
         return True
@@ -293,15 +528,19 @@ def refresh_all_text_embeddings():
                 continue
                 
             try:
-                text_embedding = extract_text_features(description)
+                text_embedding = encode_text_features(description)
                 db.collection("found_items").document(doc.id).update({
-                    "text_embedding": text_embedding.tolist()
+                    "text_embedding": text_embedding,
+                    **compute_text_fields(description, data.get("item_name", ""))
                 })
                 updated_count += 1
             except Exception as e:
                 logger.error(f"Error memperbarui embedding item {doc.id}: {str(e)}")
                 failed_count += 1
         
+        from app.services.index_sync import notify_text_embeddings_rebuilt
+        notify_text_embeddings_rebuilt()
+        
         elapsed_time = time.time() - start_time
         
         result = {
@@ -327,9 +566,9 @@ def refresh_all_text_embeddings():
 
 def test_text_similarity(text1, text2):
     try:
-        features1 = extract_text_features(text1)
-        features2 = extract_text_features(text2)
-        sim = cosine_similarity([features1], [features2])[0][0]
+        features1 = extract_text_features_sparse(text1)
+        features2 = extract_text_features_sparse(text2)
+        sim = cosine_similarity(features1, features2)[0][0]
         preprocessed1 = preprocess_text(text1)
         preprocessed2 = preprocess_text(text2)
         words1 = set(preprocessed1.split())
@@ -359,22 +598,19 @@ def test_text_similarity(text1, text2):
             "adjusted_similarity": 0.0
         }
     
-def train_tfidf_with_data():
+def train_tfidf_with_data(reencode=True):
+    if TEXT_VECTORIZER_MODE == "hashing":
+        # Encoder hashing tidak di-fit; idf mengikuti isi index secara otomatis
+        logger.info("Mode hashing aktif, vectorizer tidak perlu dilatih ulang")
+        return 0
+
     try:
         descriptions = []
-        found_docs = db.collection("found_items").stream()
-        for doc in found_docs:
-            data = doc.to_dict()
-            description = data.get("description", "")
-            if description:
-                descriptions.append(description)
-        
-        lost_docs = db.collection("lost_items").stream()
-        for doc in lost_docs:
-            data = doc.to_dict()
-            description = data.get("description", "")
-            if description:
-                descriptions.append(description)
+        for collection in ["found_items", "lost_items"]:
+            for _, data in get_documents(collection):
+                description = data.get("description", "")
+                if description:
+                    descriptions.append(description)
         
         if len(descriptions) < 10:
             descriptions.extend([
@@ -392,13 +628,16 @@ def train_tfidf_with_data():
         
         preprocessed = [preprocess_text(desc) for desc in descriptions]
         
-        global vectorizer
-        vectorizer.fit(preprocessed)
+        model = clone(VECTORIZER_TEMPLATE)
+        model.fit(preprocessed)
+        version = _activate_vectorizer(model)
         
-        with open("app/models/tfidf_vectorizer.pkl", "wb") as f:
-            pickle.dump(vectorizer, f)
+        # Embedding lama tetap dipakai dengan vectorizer versinya sendiri sampai di-encode ulang
+        if reencode:
+            from app.services.text_reencoder import start_background_reencode
+            start_background_reencode()
         
-        logger.info(f"Vectorizer berhasil dilatih dengan {len(descriptions)} deskripsi")
+        logger.info(f"Vectorizer berhasil dilatih dengan {len(descriptions)} deskripsi (versi {version})")
         return len(descriptions)
         
     except Exception as e:
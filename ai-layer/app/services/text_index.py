@@ -0,0 +1,587 @@
+# pylint: disable=all
+# type: ignore
+# noqa
+
+import numpy as np
+from scipy import sparse
+import threading
+import logging
+import time
+from collections import Counter
+from app.services.firebase import db
+from app.services.text_encoder import (
+    preprocess_text,
+    load_text_embeddings_from_firebase,
+    text_item_from_document,
+    TEXT_FEATURE_FIELDS,
+)
+from app.services.embedding_codec import decode_text_embedding, has_text_embedding, text_embedding_version
+from app.services.hashing_vectorizer import is_hashing_version, idf_from_document_frequency
+from app.services.item_filters import ItemFilterTable
+from app.services.collection_replica import is_replicated
+
+logger = logging.getLogger(__name__)
+
+TEXT_INDEX_REFRESH_SECONDS = 300
+
+RAW_SCORE_WEIGHT = 0.6
+WORD_OVERLAP_WEIGHT = 0.3
+CONTEXT_SCORE = 0.15
+
+# Perubahan item setelah kompilasi diterapkan langsung ke hasil kompilasi: baris baru masuk
+# matriks delta kecil per grup, baris yang dihapus / diganti menjadi tombstone. Grup dibangun
+# ulang jika delta atau tombstone melewati batas (COMPILED_DELTA_RATIO dari ukuran grup,
+# maksimal COMPILED_DELTA_MAX_ROWS baris)
+COMPILED_DELTA_MAX_ROWS = 256
+COMPILED_DELTA_RATIO = 0.1
+
+def _normalize_rows(matrix):
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1.0
+    return sparse.diags(1.0 / norms).dot(matrix).tocsr().astype(np.float32)
+
+def _compile_group(version, rows):
+    # Vektor mode hashing disimpan tanpa idf; idf dihitung dari document frequency grup ini
+    # sehingga selalu mengikuti isi index tanpa perlu fit ulang
+    matrix = sparse.vstack(rows, format="csr")
+    if not is_hashing_version(version):
+        return _normalize_rows(matrix), None
+    df = np.bincount(matrix.indices, minlength=matrix.shape[1])
+    idf = idf_from_document_frequency(df, matrix.shape[0])
+    return _normalize_rows(matrix.dot(sparse.diags(idf)).tocsr()), idf
+
+def _rebuild_threshold(rows):
+    return min(COMPILED_DELTA_MAX_ROWS, max(1, int(rows * COMPILED_DELTA_RATIO)))
+
+def _group_scores(group, local, query_vector):
+    # Baris lokal < ukuran matriks utama ada di matriks utama, sisanya di matriks delta
+    base_rows = group["matrix"].shape[0]
+    in_base = local < base_rows
+    scores = np.zeros(len(local))
+    if in_base.any():
+        scores[in_base] = np.asarray(group["matrix"][local[in_base]].dot(query_vector.T).todense()).ravel()
+    if not in_base.all():
+        delta = group["delta"][local[~in_base] - base_rows]
+        scores[~in_base] = np.asarray(delta.dot(query_vector.T).todense()).ravel()
+    return scores
+
+class TextEmbeddingIndex:
+    def __init__(self, collection="found_items"):
+        self.collection = collection
+        self.loaded_at = None
+        self._lock = threading.RLock()
+        self._load_lock = threading.Lock()
+        self._search_stats = {"searches": 0, "pruned": 0, "full_scans": 0, "candidates": 0, "rows": 0}
+        self._reset()
+
+    def _reset(self):
+        self._ids = []
+        self._metadata = []
+        self._rows = []
+        # Versi vectorizer tiap embedding; query di-encode per versi saat search
+        self._versions = []
+        self._version_counts = Counter()
+        self._words = []
+        self._term_counts = []
+        self._names = []
+        self._statuses = []
+        self._alive = []
+        self._row_by_id = {}
+        self._filters = ItemFilterTable()
+        # Inverted index: term hasil preprocess -> {posisi item: frekuensi term}
+        self._postings = {}
+        self._compiled = None
+
+    def __len__(self):
+        return len(self._row_by_id)
+
+    def is_stale(self):
+        if self.loaded_at is None:
+            return True
+        if is_replicated(self.collection):
+            return False
+        return time.time() - self.loaded_at > TEXT_INDEX_REFRESH_SECONDS
+
+    def invalidate(self):
+        self.loaded_at = None
+
+    def versions(self):
+        with self._lock:
+            return [version for version, count in self._version_counts.items() if count > 0]
+
+    def load(self, documents=None):
+        start_time = time.time()
+        items = load_text_embeddings_from_firebase(collection=self.collection, documents=documents)
+
+        with self._lock:
+            self._reset()
+            for item in items:
+                self._upsert_locked(item["id"], item)
+            self.loaded_at = time.time()
+
+        logger.info(f"Membangun text index {self.collection}: {len(self)} item dalam {time.time() - start_time:.2f} detik")
+
+    def _upsert_locked(self, item_id, data, version=None):
+        item = text_item_from_document(item_id, data)
+        text_embedding = item.get("text_embedding")
+        if not item["description"] or not has_text_embedding(text_embedding):
+            self._remove_locked(item_id)
+            return
+
+        row = decode_text_embedding(text_embedding)
+        if version is None:
+            version = text_embedding_version(text_embedding)
+
+        metadata = {key: value for key, value in item.items()
+                    if key != "text_embedding" and key not in TEXT_FEATURE_FIELDS}
+        # Token dan nama lowercase dihitung saat ingest; dokumen lama tanpa field tersebut
+        # diproses di sini sekali saat dimuat
+        tokens = item.get("text_tokens")
+        if tokens is None:
+            tokens = preprocess_text(metadata["description"]).split()
+        term_counts = Counter(tokens)
+        words = frozenset(term_counts)
+        name = item.get("item_name_lower")
+        if name is None:
+            name = metadata["item_name"].lower()
+
+        position = self._row_by_id.get(item_id)
+        old_name = None
+        row_changed = True
+        if position is None:
+            position = len(self._ids)
+            self._ids.append(item_id)
+            self._metadata.append(metadata)
+            self._rows.append(row)
+            self._versions.append(version)
+            self._words.append(words)
+            self._term_counts.append(term_counts)
+            self._names.append(name)
+            self._statuses.append(metadata.get("status", "available"))
+            self._alive.append(True)
+            self._row_by_id[item_id] = position
+        else:
+            old_row = self._rows[position]
+            old_name = self._names[position]
+            row_changed = (self._versions[position] != version or old_row.shape != row.shape
+                           or (old_row != row).nnz > 0)
+            self._metadata[position] = metadata
+            self._rows[position] = row
+            if self._alive[position]:
+                self._version_counts[self._versions[position]] -= 1
+            self._versions[position] = version
+            self._words[position] = words
+            self._remove_postings_locked(position)
+            self._term_counts[position] = term_counts
+            self._names[position] = name
+            self._statuses[position] = metadata.get("status", "available")
+            self._alive[position] = True
+        self._version_counts[version] += 1
+        self._filters.set(position, metadata)
+        for term, count in term_counts.items():
+            self._postings.setdefault(term, {})[position] = count
+        if self._compiled is not None:
+            self._reserve_compiled_locked(position + 1)
+            if row_changed:
+                self._place_row_locked(position)
+            self._patch_name_locked(position, old_name)
+            self._patch_searchable_locked(position)
+
+    def _remove_postings_locked(self, position):
+        for term in self._term_counts[position] or ():
+            posting = self._postings.get(term)
+            if posting is not None:
+                posting.pop(position, None)
+                if not posting:
+                    del self._postings[term]
+
+    def _remove_locked(self, item_id):
+        position = self._row_by_id.pop(item_id, None)
+        if position is not None:
+            self._alive[position] = False
+            self._version_counts[self._versions[position]] -= 1
+            self._remove_postings_locked(position)
+            self._term_counts[position] = None
+            self._filters.clear(position)
+            if self._compiled is not None:
+                self._drop_row_locked(position)
+                self._patch_name_locked(position, self._names[position])
+                self._patch_searchable_locked(position)
+
+    def upsert(self, item_id, item):
+        with self._lock:
+            self._upsert_locked(item_id, item)
+
+    def remove(self, item_id):
+        with self._lock:
+            self._remove_locked(item_id)
+
+    def contains(self, item_id):
+        return item_id in self._row_by_id
+
+    def set_status(self, item_id, status):
+        with self._lock:
+            position = self._row_by_id.get(item_id)
+            if position is None:
+                return
+            self._metadata[position] = {**self._metadata[position], "status": status}
+            self._statuses[position] = status
+            self._filters.update(position, {"status": status})
+            if self._compiled is not None:
+                self._patch_searchable_locked(position)
+
+    def update_fields(self, item_id, fields):
+        with self._lock:
+            position = self._row_by_id.get(item_id)
+            if position is None:
+                return
+            item = {**self._metadata[position], **fields}
+            version = None
+            if "text_embedding" not in fields:
+                item["text_embedding"] = self._rows[position]
+                version = self._versions[position]
+            if "description" not in fields and "text_tokens" not in fields:
+                item["text_tokens"] = list(self._term_counts[position].elements())
+            if "item_name" not in fields and "item_name_lower" not in fields:
+                item["item_name_lower"] = self._names[position]
+            self._upsert_locked(item_id, item, version=version)
+
+    def _compile(self):
+        # Kompilasi penuh hanya setelah load; perubahan berikutnya ditambal lewat _patch_*.
+        # Baris hasil kompilasi = posisi item. Satu grup matriks per (versi vectorizer, dimensi)
+        # karena vektor antar versi tidak sebanding.
+        with self._lock:
+            if self._compiled is not None:
+                return self._compiled
+
+            self._compiled = {
+                "count": 0,
+                "groups": [],
+                "group_ids": {},
+                "members": [],
+                "dead": [],
+                "group_of_row": np.full(0, -1, dtype=np.int64),
+                "local_row": np.zeros(0, dtype=np.int64),
+                "alive": np.zeros(0, dtype=bool),
+                "searchable": np.zeros(0, dtype=bool),
+                "rows_by_name": {},
+                "ids": self._ids,
+                "metadata": self._metadata,
+                "names": self._names,
+                "words": self._words,
+            }
+            self._reserve_compiled_locked(len(self._alive))
+
+            positions_by_key = {}
+            for position, alive in enumerate(self._alive):
+                if alive:
+                    key = (self._versions[position], self._rows[position].shape[1])
+                    positions_by_key.setdefault(key, []).append(position)
+                    self._patch_name_locked(position, None)
+                    self._patch_searchable_locked(position)
+            for (version, dim), positions in positions_by_key.items():
+                self._add_group_locked(version, dim, positions)
+            return self._compiled
+
+    def _reserve_compiled_locked(self, size):
+        compiled = self._compiled
+        capacity = len(compiled["alive"])
+        if size > capacity:
+            capacity = max(size, 2 * capacity, 16)
+            for key, fill in (("group_of_row", -1), ("local_row", 0), ("alive", False), ("searchable", False)):
+                grown = np.full(capacity, fill, dtype=compiled[key].dtype)
+                grown[:compiled["count"]] = compiled[key][:compiled["count"]]
+                compiled[key] = grown
+        compiled["count"] = max(compiled["count"], size)
+
+    def _patch_searchable_locked(self, position):
+        compiled = self._compiled
+        alive = self._alive[position]
+        compiled["alive"][position] = alive
+        compiled["searchable"][position] = alive and (self.collection != "found_items" or self._statuses[position] == "available")
+
+    def _patch_name_locked(self, position, old_name):
+        rows_by_name = self._compiled["rows_by_name"]
+        name = self._names[position] if self._alive[position] else None
+        if old_name is not None and old_name != name:
+            rows = rows_by_name.get(old_name)
+            if rows is not None:
+                rows.discard(position)
+                if not rows:
+                    del rows_by_name[old_name]
+        if name is not None:
+            rows_by_name.setdefault(name, set()).add(position)
+
+    def _add_group_locked(self, version, dim, positions):
+        compiled = self._compiled
+        g = compiled["group_ids"][(version, dim)] = len(compiled["groups"])
+        compiled["groups"].append(None)
+        compiled["members"].append([])
+        compiled["dead"].append(0)
+        self._build_group_locked(g, version, dim, positions)
+        return g
+
+    def _build_group_locked(self, g, version, dim, positions):
+        # Matriks grup diganti utuh (tidak dimutasi) supaya query yang sedang berjalan tetap konsisten
+        compiled = self._compiled
+        if positions:
+            matrix, idf = _compile_group(version, [self._rows[p] for p in positions])
+        else:
+            matrix, idf = sparse.csr_matrix((0, dim), dtype=np.float32), None
+        rows = np.asarray(positions, dtype=np.int64)
+        compiled["group_of_row"][rows] = g
+        compiled["local_row"][rows] = np.arange(len(rows), dtype=np.int64)
+        compiled["members"][g] = list(positions)
+        compiled["dead"][g] = 0
+        compiled["groups"][g] = {"version": version, "dim": dim, "matrix": matrix, "idf": idf,
+                                 "delta": None, "rows": len(positions)}
+
+    def _rebuild_group_locked(self, g):
+        compiled = self._compiled
+        group = compiled["groups"][g]
+        live = [(local, p) for local, p in enumerate(compiled["members"][g])
+                if compiled["group_of_row"][p] == g and compiled["local_row"][p] == local]
+        positions = [p for _, p in live]
+        if group["idf"] is not None or not positions:
+            self._build_group_locked(g, group["version"], group["dim"], positions)
+            return
+        # Tanpa idf grup (TF-IDF fit) baris sudah ternormalisasi sendiri-sendiri, cukup gabung matriks
+        # utama dan delta lalu ambil baris yang masih hidup
+        matrix = group["matrix"] if group["delta"] is None else sparse.vstack([group["matrix"], group["delta"]], format="csr")
+        matrix = matrix[np.array([local for local, _ in live], dtype=np.int64)]
+        rows = np.asarray(positions, dtype=np.int64)
+        compiled["group_of_row"][rows] = g
+        compiled["local_row"][rows] = np.arange(len(rows), dtype=np.int64)
+        compiled["members"][g] = positions
+        compiled["dead"][g] = 0
+        compiled["groups"][g] = {**group, "matrix": matrix, "delta": None, "rows": len(positions)}
+
+    def _drop_row_locked(self, position):
+        compiled = self._compiled
+        g = compiled["group_of_row"][position]
+        if g < 0:
+            return
+        compiled["group_of_row"][position] = -1
+        compiled["dead"][g] += 1
+        group = compiled["groups"][g]
+        compiled["groups"][g] = {**group, "rows": group["rows"] - 1}
+        if compiled["dead"][g] > _rebuild_threshold(len(compiled["members"][g])):
+            self._rebuild_group_locked(g)
+
+    def _place_row_locked(self, position):
+        # Baris baru / yang berubah ditambahkan ke delta grupnya; baris lama menjadi tombstone.
+        # Vektor delta diberi bobot idf grup saat ini (mode hashing), idf dihitung ulang saat grup dibangun ulang
+        compiled = self._compiled
+        self._drop_row_locked(position)
+        row = self._rows[position]
+        key = (self._versions[position], row.shape[1])
+        g = compiled["group_ids"].get(key)
+        if g is None:
+            self._add_group_locked(*key, [position])
+            return
+        group = compiled["groups"][g]
+        compiled["group_of_row"][position] = g
+        compiled["local_row"][position] = len(compiled["members"][g])
+        compiled["members"][g].append(position)
+        if group["idf"] is not None:
+            row = row.dot(sparse.diags(group["idf"])).tocsr()
+        row = _normalize_rows(row)
+        delta = row if group["delta"] is None else sparse.vstack([group["delta"], row], format="csr")
+        compiled["groups"][g] = {**group, "delta": delta, "rows": group["rows"] + 1}
+        if delta.shape[0] > _rebuild_threshold(group["matrix"].shape[0]):
+            self._rebuild_group_locked(g)
+
+    def _common_word_counts(self, query_words, count):
+        # Jumlah kata query yang dimiliki tiap item (baris = posisi), dihitung dari posting list
+        with self._lock:
+            postings = [np.fromiter(self._postings[w].keys(), dtype=np.int64, count=len(self._postings[w]))
+                        for w in query_words if w in self._postings]
+        if not postings:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+        positions = np.concatenate(postings)
+        # Posisi yang ditambahkan setelah snapshot query belum ikut dinilai
+        return np.unique(positions[positions < count], return_counts=True)
+
+    def _group_queries(self, groups, query_vectors):
+        # Query ternormalisasi per grup; grup tanpa vectorizer yang cocok tidak bisa dinilai
+        queries = []
+        for group in groups:
+            version, dim, idf = group["version"], group["dim"], group["idf"]
+            if group["rows"] == 0:
+                queries.append(None)
+                continue
+            query_vector = query_vectors.get(version)
+            if query_vector is None or query_vector.shape[1] != dim:
+                logger.warning(f"Text embedding versi {version} (dim {dim}) di {self.collection} tidak bisa dibandingkan dengan query, dilewati")
+                queries.append(None)
+                continue
+            query_vector = sparse.csr_matrix(query_vector, dtype=np.float32)
+            if idf is not None:
+                # Hanya elemen non-zero query yang diberi bobot idf
+                query_vector.data = query_vector.data * idf[query_vector.indices]
+            query_norm = np.sqrt(query_vector.multiply(query_vector).sum())
+            if query_norm > 0:
+                query_vector = query_vector / query_norm
+            queries.append(query_vector)
+        return queries
+
+    def score_rows(self, query_vectors, query_words, query_text, threshold=0.2, filters=None):
+        """Skor semua item di atas threshold tanpa membuat dict hasil (belum diurutkan).
+        Mengembalikan (compiled, rows, scores) dengan scores berisi adjusted/raw/word_overlap/context.
+        filters (lihat item_filters.build_filters) menyaring item sebelum skor dihitung."""
+        query_lower = query_text.lower()
+        # Item tanpa kata yang sama dengan query hanya bisa mendapat context score (nama item),
+        # jadi jika threshold di atas CONTEXT_SCORE cukup menilai item dari posting list
+        pruned = threshold > CONTEXT_SCORE
+        with self._lock:
+            # Snapshot konsisten dari hasil kompilasi; penulis bisa menambal hasil kompilasi
+            # selama skor dihitung di luar lock
+            compiled = self._compile()
+            count = compiled["count"]
+            live = len(self._row_by_id)
+            groups = list(compiled["groups"])
+            group_of_row = compiled["group_of_row"][:count].copy()
+            local_row = compiled["local_row"][:count].copy()
+            alive = compiled["alive"][:count].copy()
+            searchable = compiled["searchable"][:count].copy()
+            filter_mask = self._filters.mask(filters, count) if filters else None
+            name_rows = [] if pruned else [np.fromiter(rows, dtype=np.int64, count=len(rows))
+                                           for name, rows in compiled["rows_by_name"].items() if name in query_lower]
+        empty = np.empty(0, dtype=np.int64)
+        if live == 0:
+            return compiled, empty, {}
+
+        queries = self._group_queries(groups, query_vectors)
+        scorable = np.array([q is not None for q in queries], dtype=bool)
+        # Baris mati (group_of_row -1) sudah tersaring oleh alive / searchable
+        row_scorable = scorable[group_of_row]
+        if filters and "status" in filters:
+            # Filter status menggantikan syarat default status "available"
+            searchable = alive & row_scorable
+        else:
+            searchable &= row_scorable
+        if filter_mask is not None:
+            searchable &= filter_mask
+
+        rows, common_counts = self._common_word_counts(query_words, count)
+
+        if pruned:
+            keep = searchable[rows]
+            candidates, common_counts = rows[keep], common_counts[keep]
+            context_scores = np.array([CONTEXT_SCORE if compiled["names"][r] in query_lower else 0.0
+                                       for r in candidates])
+        else:
+            candidates = np.flatnonzero(searchable)
+            counts = np.zeros(count)
+            counts[rows] = common_counts
+            common_counts = counts[candidates]
+            context = np.zeros(count)
+            for matched in name_rows:
+                context[matched] += CONTEXT_SCORE
+            context_scores = context[candidates]
+
+        with self._lock:
+            self._search_stats["searches"] += 1
+            self._search_stats["pruned" if pruned else "full_scans"] += 1
+            self._search_stats["candidates"] += len(candidates)
+            self._search_stats["rows"] += live
+
+        if len(candidates) == 0:
+            return compiled, empty, {}
+
+        raw_scores = np.zeros(len(candidates))
+        candidate_groups = group_of_row[candidates]
+        for g, group in enumerate(groups):
+            selected = candidate_groups == g
+            if queries[g] is None or not selected.any():
+                continue
+            raw_scores[selected] = _group_scores(group, local_row[candidates[selected]], queries[g])
+        word_overlap = common_counts / max(len(query_words), 1)
+
+        adjusted = np.minimum(raw_scores * RAW_SCORE_WEIGHT + word_overlap * WORD_OVERLAP_WEIGHT + context_scores, 1.0)
+        hits = np.flatnonzero(adjusted >= threshold)
+        return compiled, candidates[hits], {
+            "adjusted": adjusted[hits],
+            "raw": raw_scores[hits],
+            "word_overlap": word_overlap[hits],
+            "context": context_scores[hits],
+        }
+
+    @staticmethod
+    def build_result(compiled, row, scores, i, query_words):
+        common_words = [w for w in query_words if w in compiled["words"][row]]
+        return {
+            **compiled["metadata"][row],
+            "score": float(scores["adjusted"][i]),
+            "match_type": "text",
+            "raw_score": float(scores["raw"][i]),
+            "word_overlap": float(scores["word_overlap"][i]),
+            "context_score": float(scores["context"][i]),
+            "common_words": common_words[:10]
+        }
+
+    def search(self, query_vectors, query_words, query_text, threshold=0.2, max_results=20, filters=None):
+        """query_vectors: {versi vectorizer: vektor query}, lihat encode_query_for_versions"""
+        compiled, rows, scores = self.score_rows(query_vectors, query_words, query_text, threshold, filters)
+        if len(rows) == 0:
+            return []
+        adjusted = scores["adjusted"]
+        hits = np.arange(len(rows))
+        if max_results is not None and len(hits) > max_results:
+            hits = hits[np.argpartition(-adjusted, max_results - 1)[:max_results]]
+        hits = hits[np.argsort(-adjusted[hits], kind="stable")]
+        return [self.build_result(compiled, rows[hit], scores, hit, query_words) for hit in hits]
+
+    def get_stats(self):
+        with self._lock:
+            posting_sizes = np.array([len(posting) for posting in self._postings.values()], dtype=np.int64)
+            stats = dict(self._search_stats)
+            stats.update({
+                "items": len(self),
+                "versions": {version: count for version, count in self._version_counts.items() if count > 0},
+                "terms": len(self._postings),
+                "postings": int(posting_sizes.sum()),
+                "avg_posting_size": float(posting_sizes.mean()) if len(posting_sizes) else 0.0,
+                "max_posting_size": int(posting_sizes.max()) if len(posting_sizes) else 0,
+            })
+            compiled = self._compiled
+            if compiled is not None:
+                stats["compiled_delta_rows"] = sum(g["delta"].shape[0] for g in compiled["groups"] if g["delta"] is not None)
+                stats["compiled_dead_rows"] = sum(compiled["dead"])
+        stats["avg_candidate_ratio"] = stats["candidates"] / stats["rows"] if stats["rows"] else 0.0
+        return stats
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+def get_text_index(collection="found_items", load=True):
+    with _indexes_lock:
+        index = _indexes.get(collection)
+        if index is None:
+            index = TextEmbeddingIndex(collection)
+            _indexes[collection] = index
+
+    if load and index.is_stale():
+        with index._load_lock:
+            if index.is_stale():
+                index.load()
+    return index
+
+def peek_text_index(collection="found_items"):
+    return _indexes.get(collection)
+
+def invalidate_text_indexes():
+    for index in list(_indexes.values()):
+        index.invalidate()
+
+def index_item_text_saved(collection, item_id, fields):
+    index = peek_text_index(collection)
+    if index is None or index.loaded_at is None:
+        return
+    if index.contains(item_id):
+        index.update_fields(item_id, fields)
+        return
+
+    doc = db.collection(collection).document(item_id).get()
+    if doc.exists:
+        index.upsert(item_id, doc.to_dict())
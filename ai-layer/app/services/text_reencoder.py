@@ -0,0 +1,176 @@
+# pylint: disable=all
+# type: ignore
+# noqa
+
+import json
+import logging
+import os
+import threading
+import time
+from app.services.firebase import db
+from app.services.embedding_codec import has_text_embedding, text_embedding_version
+from app.services.text_encoder import encode_text_features, compute_text_fields, get_vectorizer_version
+from app.services.index_sync import notify_item_text_saved
+from app.config import (
+    TEXT_REENCODE_CHUNK_SIZE,
+    TEXT_REENCODE_PAUSE_MS,
+    TEXT_REENCODE_STATE_PATH,
+)
+
+logger = logging.getLogger(__name__)
+
+# Setelah vectorizer dilatih ulang, embedding lama tetap bisa dicari dengan vectorizer
+# versinya sendiri (lihat text_index). Modul ini meng-encode ulang hanya dokumen yang
+# versinya berbeda dari vectorizer aktif, per chunk berurutan menurut ID dokumen.
+# Posisi terakhir per koleksi disimpan di TEXT_REENCODE_STATE_PATH. Dokumen tanpa text embedding
+# yang ditemukan saat index dimuat juga disimpan di sini (rescan), bukan di thread pemuat index.
+
+COLLECTIONS = ["found_items", "lost_items"]
+
+_state_lock = threading.Lock()
+_thread = None
+_stop_event = threading.Event()
+# Permintaan yang masuk saat thread berjalan diproses setelah putaran yang sedang berjalan selesai
+_requested = threading.Event()
+_rescan = threading.Event()
+
+def _load_state():
+    try:
+        with open(TEXT_REENCODE_STATE_PATH, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _save_state(state):
+    os.makedirs(os.path.dirname(TEXT_REENCODE_STATE_PATH) or ".", exist_ok=True)
+    with open(TEXT_REENCODE_STATE_PATH + ".tmp", "w") as f:
+        json.dump(state, f, indent=2)
+    os.replace(TEXT_REENCODE_STATE_PATH + ".tmp", TEXT_REENCODE_STATE_PATH)
+
+def _new_collection_state():
+    return {"last_id": None, "done": False, "scanned": 0, "reencoded": 0, "failed": 0}
+
+def reencode_chunk(collection, target_version, after_id=None, chunk_size=TEXT_REENCODE_CHUNK_SIZE):
+    """Memproses satu chunk dokumen setelah after_id; mengembalikan statistik dan ID terakhir"""
+    query = db.collection(collection).order_by("__name__").limit(chunk_size)
+    if after_id is not None:
+        query = query.start_after({"__name__": after_id})
+
+    result = {"scanned": 0, "reencoded": 0, "failed": 0, "last_id": after_id}
+    batch = db.batch()
+    saved = []
+    for doc in query.stream():
+        result["scanned"] += 1
+        result["last_id"] = doc.id
+        data = doc.to_dict()
+        description = data.get("description", "")
+        text_embedding = data.get("text_embedding")
+        if not description:
+            continue
+        if has_text_embedding(text_embedding) and text_embedding_version(text_embedding) == target_version:
+            continue
+
+        try:
+            fields = {
+                "text_embedding": encode_text_features(description),
+                **compute_text_fields(description, data.get("item_name", ""))
+            }
+            batch.update(db.collection(collection).document(doc.id), fields)
+            saved.append((doc.id, {"description": description, **fields}))
+        except Exception as e:
+            result["failed"] += 1
+            logger.error(f"Error re-encode text embedding {collection}/{doc.id}: {str(e)}")
+
+    if saved:
+        batch.commit()
+        for item_id, fields in saved:
+            notify_item_text_saved(collection, item_id, fields)
+    result["reencoded"] = len(saved)
+    result["done"] = result["scanned"] < chunk_size
+    return result
+
+def reencode_stale_embeddings(collections=None, chunk_size=TEXT_REENCODE_CHUNK_SIZE, max_chunks=None,
+                              pause_ms=0, stop_event=None, rescan=False):
+    """Re-encode embedding dengan versi lama; bisa dihentikan dan dilanjutkan dari posisi tersimpan.
+    rescan: mulai lagi dari awal walaupun versi yang sama sudah selesai (dokumen tanpa embedding)"""
+    target_version = get_vectorizer_version()
+    with _state_lock:
+        state = _load_state()
+        if state.get("version") != target_version or rescan:
+            # Vectorizer berganti atau rescan: mulai lagi dari awal
+            state = {"version": target_version, "started_at": time.time(), "collections": {}}
+            _save_state(state)
+
+    chunks = 0
+    for collection in collections or COLLECTIONS:
+        collection_state = state["collections"].setdefault(collection, _new_collection_state())
+        while not collection_state["done"]:
+            if stop_event is not None and stop_event.is_set():
+                return state
+            if max_chunks is not None and chunks >= max_chunks:
+                return state
+            if get_vectorizer_version() != target_version:
+                logger.info("Vectorizer aktif berubah, re-encode dihentikan")
+                return state
+
+            result = reencode_chunk(collection, target_version, collection_state["last_id"], chunk_size)
+            chunks += 1
+            for key in ("scanned", "reencoded", "failed"):
+                collection_state[key] += result[key]
+            collection_state["last_id"] = result["last_id"]
+            collection_state["done"] = result["done"]
+            with _state_lock:
+                _save_state(state)
+
+            if result["reencoded"]:
+                logger.info(f"Re-encode {collection}: {collection_state['reencoded']} diperbarui, "
+                            f"{collection_state['scanned']} dokumen diperiksa")
+            if pause_ms and not collection_state["done"]:
+                time.sleep(pause_ms / 1000)
+
+    if all(state["collections"].get(c, {}).get("done") for c in COLLECTIONS):
+        state["finished_at"] = time.time()
+        with _state_lock:
+            _save_state(state)
+        logger.info(f"Re-encode text embedding ke versi {target_version} selesai")
+    return state
+
+def _run_background():
+    global _thread
+    while True:
+        _requested.clear()
+        rescan = _rescan.is_set()
+        _rescan.clear()
+        try:
+            reencode_stale_embeddings(pause_ms=TEXT_REENCODE_PAUSE_MS, stop_event=_stop_event, rescan=rescan)
+        except Exception as e:
+            logger.error(f"Error dalam re-encode text embedding: {str(e)}")
+        with _state_lock:
+            if _stop_event.is_set() or not _requested.is_set():
+                _thread = None
+                return
+
+def start_background_reencode(rescan=False):
+    global _thread
+    with _state_lock:
+        _requested.set()
+        if rescan:
+            _rescan.set()
+        if _thread is not None and _thread.is_alive():
+            return False
+        _stop_event.clear()
+        _thread = threading.Thread(target=_run_background, name="text-reencode", daemon=True)
+        _thread.start()
+    return True
+
+def stop_background_reencode():
+    _stop_event.set()
+
+def get_reencode_status():
+    with _state_lock:
+        state = _load_state()
+    return {
+        "running": _thread is not None and _thread.is_alive(),
+        "active_version": get_vectorizer_version(),
+        **state
+    }
@@ -0,0 +1,326 @@
+# pylint: disable=all
+# type: ignore
+# noqa
+
+import logging
+import os
+import tempfile
+import time
+import numpy as np
+from app.config import (
+    IMAGE_VECTOR_STORAGE,
+    IMAGE_PQ_SUBVECTORS,
+    IMAGE_RERANK_ORIGINALS,
+    IMAGE_ANN_DIR,
+)
+
+logger = logging.getLogger(__name__)
+
+# Penyimpanan vektor untuk ImageEmbeddingIndex (vektor sudah dinormalisasi L2):
+#   float32: exact, 4 byte per dimensi
+#   float16: 2 byte per dimensi
+#   int8   : 1 byte per dimensi + skala per vektor
+#   pq     : product quantization, IMAGE_PQ_SUBVECTORS byte per vektor (kode uint8 per sub-ruang),
+#            skor dihitung asimetris lewat tabel inner product query x centroid
+# Mode terkompresi memberi skor perkiraan; kandidat teratas di-rerank dengan vektor asli
+# yang disimpan di file memmap (di disk, bukan di RAM worker).
+
+SCORE_CHUNK_SIZE = 4096
+ENCODE_CHUNK_SIZE = 65536
+PQ_CENTROIDS = 256
+PQ_TRAIN_POINTS_PER_CENTROID = 32
+PQ_TRAIN_ITERATIONS = 10
+PQ_MIN_TRAIN_SIZE = 1024
+PQ_RETRAIN_GROWTH = 2.0
+
+def _grown(array, capacity):
+    grown = np.zeros((capacity,) + array.shape[1:], dtype=array.dtype)
+    grown[:len(array)] = array
+    return grown
+
+class Float32Store:
+    mode = "float32"
+    exact = True
+    # Selisih maksimum perkiraan skor terhadap skor asli; kandidat di bawah threshold - margin dibuang
+    margin = 0.0
+    # Jumlah kandidat yang di-rerank dengan vektor asli = rerank_factor x top_k
+    rerank_factor = 1
+
+    def __init__(self, dim):
+        self.dim = dim
+        self._data = np.zeros((0, dim), dtype=np.float32)
+
+    @property
+    def capacity(self):
+        return len(self._data)
+
+    def build(self, matrix):
+        self._data = np.ascontiguousarray(matrix, dtype=np.float32)
+
+    def grow(self, capacity):
+        self._data = _grown(self._data, capacity)
+
+    def set(self, row, vector):
+        self._data[row] = vector
+
+    def _score_block(self, start, end, query):
+        return self._data[start:end] @ query
+
+    def _score_rows(self, rows, query):
+        return self._data[rows] @ query
+
+    def scores(self, query, size, rows=None):
+        # Skor untuk baris [0, size) atau hanya baris kandidat
+        if rows is not None:
+            return self._score_rows(rows, query).astype(np.float32, copy=False)
+        return np.concatenate([
+            self._score_block(start, min(start + SCORE_CHUNK_SIZE, size), query)
+            for start in range(0, size, SCORE_CHUNK_SIZE)
+        ]).astype(np.float32, copy=False) if size else np.zeros(0, dtype=np.float32)
+
+    def memory_bytes(self):
+        return self._data.nbytes
+
+class Float16Store(Float32Store):
+    mode = "float16"
+    exact = False
+    margin = 0.005
+    rerank_factor = 2
+
+    def __init__(self, dim):
+        self.dim = dim
+        self._data = np.zeros((0, dim), dtype=np.float16)
+
+    def build(self, matrix):
+        self._data = np.ascontiguousarray(matrix, dtype=np.float16)
+
+    def _score_block(self, start, end, query):
+        return self._data[start:end].astype(np.float32) @ query
+
+    def _score_rows(self, rows, query):
+        return self._data[rows].astype(np.float32) @ query
+
+class Int8Store(Float32Store):
+    mode = "int8"
+    exact = False
+    margin = 0.01
+    rerank_factor = 5
+
+    def __init__(self, dim):
+        self.dim = dim
+        self._data = np.zeros((0, dim), dtype=np.int8)
+        self._scales = np.zeros(0, dtype=np.float32)
+
+    def _encode(self, matrix):
+        matrix = np.atleast_2d(matrix)
+        scales = np.abs(matrix).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0
+        codes = np.clip(np.rint(matrix / scales[:, None]), -127, 127).astype(np.int8)
+        return codes, scales.astype(np.float32)
+
+    def build(self, matrix):
+        self._data, self._scales = self._encode(matrix)
+
+    def grow(self, capacity):
+        self._data = _grown(self._data, capacity)
+        self._scales = _grown(self._scales, capacity)
+
+    def set(self, row, vector):
+        codes, scales = self._encode(vector)
+        self._data[row], self._scales[row] = codes[0], scales[0]
+
+    def _score_block(self, start, end, query):
+        return (self._data[start:end].astype(np.float32) @ query) * self._scales[start:end]
+
+    def _score_rows(self, rows, query):
+        return (self._data[rows].astype(np.float32) @ query) * self._scales[rows]
+
+    def memory_bytes(self):
+        return self._data.nbytes + self._scales.nbytes
+
+def _kmeans(points, k, iterations=PQ_TRAIN_ITERATIONS, rng=None):
+    rng = rng or np.random.default_rng(0)
+    centroids = points[rng.choice(len(points), k, replace=False)].copy()
+    for _ in range(iterations):
+        distances = (points ** 2).sum(1)[:, None] - 2 * points @ centroids.T + (centroids ** 2).sum(1)[None, :]
+        assignment = np.argmin(distances, axis=1)
+        counts = np.bincount(assignment, minlength=k)
+        sums = np.stack([np.bincount(assignment, weights=points[:, d], minlength=k)
+                         for d in range(points.shape[1])], axis=1)
+        filled = counts > 0
+        centroids[filled] = (sums[filled] / counts[filled, None]).astype(np.float32)
+        empty = ~filled
+        if empty.any():
+            centroids[empty] = points[rng.choice(len(points), int(empty.sum()), replace=False)]
+    return centroids
+
+class PQStore(Float32Store):
+    mode = "pq"
+    exact = False
+    margin = 0.03
+    rerank_factor = 50
+
+    def __init__(self, dim, collection, subvectors=IMAGE_PQ_SUBVECTORS, index_dir=IMAGE_ANN_DIR):
+        if dim % subvectors != 0:
+            raise ValueError(f"Dimensi {dim} tidak habis dibagi {subvectors} sub-vektor PQ")
+        self.dim = dim
+        self.collection = collection
+        self.subvectors = subvectors
+        self.subdim = dim // subvectors
+        self.path = os.path.join(index_dir, f"pq_{collection}_{dim}x{subvectors}.npz") if index_dir else None
+        self.codebooks = None
+        self.trained_size = 0
+        self._data = np.zeros((0, subvectors), dtype=np.uint8)
+        self._offsets = np.arange(subvectors) * PQ_CENTROIDS
+        self._load_codebooks()
+
+    @property
+    def trained(self):
+        return self.codebooks is not None
+
+    def _load_codebooks(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with np.load(self.path) as data:
+                self.codebooks = np.ascontiguousarray(data["codebooks"], dtype=np.float32)
+                self.trained_size = int(data["trained_size"])
+        except Exception as e:
+            logger.warning(f"Gagal memuat codebook PQ dari {self.path}: {str(e)}")
+
+    def _save_codebooks(self):
+        if not self.path:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = f"{self.path}.{os.getpid()}.tmp.npz"
+            np.savez(tmp_path, codebooks=self.codebooks, trained_size=self.trained_size)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.warning(f"Gagal menyimpan codebook PQ ke {self.path}: {str(e)}")
+
+    def train(self, matrix):
+        start_time = time.time()
+        rng = np.random.default_rng(0)
+        sample_size = min(len(matrix), PQ_CENTROIDS * PQ_TRAIN_POINTS_PER_CENTROID)
+        sample = matrix[rng.choice(len(matrix), sample_size, replace=False)]
+        codebooks = np.zeros((self.subvectors, PQ_CENTROIDS, self.subdim), dtype=np.float32)
+        for j in range(self.subvectors):
+            subspace = np.ascontiguousarray(sample[:, j * self.subdim:(j + 1) * self.subdim])
+            codebooks[j] = _kmeans(subspace, PQ_CENTROIDS, rng=rng)
+        self.codebooks = codebooks
+        self.trained_size = len(matrix)
+        self._save_codebooks()
+        logger.info(f"Trained PQ codebooks for {self.collection}: {self.subvectors}x{PQ_CENTROIDS}, "
+                    f"{sample_size} sample vectors in {time.time() - start_time:.2f}s")
+
+    def needs_training(self, size):
+        return not self.trained or size > PQ_RETRAIN_GROWTH * self.trained_size
+
+    def _encode(self, matrix):
+        matrix = np.atleast_2d(matrix)
+        codes = np.zeros((len(matrix), self.subvectors), dtype=np.uint8)
+        for start in range(0, len(matrix), ENCODE_CHUNK_SIZE):
+            block = matrix[start:start + ENCODE_CHUNK_SIZE]
+            for j in range(self.subvectors):
+                sub = block[:, j * self.subdim:(j + 1) * self.subdim]
+                centroids = self.codebooks[j]
+                distances = -2 * sub @ centroids.T + (centroids ** 2).sum(1)[None, :]
+                codes[start:start + len(block), j] = np.argmin(distances, axis=1)
+        return codes
+
+    def build(self, matrix):
+        if self.needs_training(len(matrix)):
+            self.train(matrix)
+        self._data = self._encode(matrix)
+
+    def set(self, row, vector):
+        self._data[row] = self._encode(vector)[0]
+
+    def _lookup_table(self, query):
+        sub_queries = query.reshape(self.subvectors, 1, self.subdim)
+        return (self.codebooks * sub_queries).sum(axis=2).astype(np.float32).ravel()
+
+    def _score_codes(self, codes, table):
+        return table[codes.astype(np.int64) + self._offsets].sum(axis=1)
+
+    def scores(self, query, size, rows=None):
+        table = self._lookup_table(query)
+        if rows is not None:
+            return self._score_codes(self._data[rows], table)
+        if size == 0:
+            return np.zeros(0, dtype=np.float32)
+        return np.concatenate([
+            self._score_codes(self._data[start:min(start + SCORE_CHUNK_SIZE, size)], table)
+            for start in range(0, size, SCORE_CHUNK_SIZE)
+        ])
+
+    def memory_bytes(self):
+        return self._data.nbytes + (self.codebooks.nbytes if self.trained else 0)
+
+class OriginalVectors:
+    """Vektor float32 asli untuk rerank, disimpan di file sementara yang di-memmap"""
+
+    def __init__(self, dim, directory=IMAGE_ANN_DIR):
+        self.dim = dim
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # TemporaryFile otomatis terhapus saat ditutup / proses berakhir
+        self._file = tempfile.TemporaryFile(dir=directory or None)
+        self._data = None
+        self._capacity = 0
+
+    def _map(self, capacity):
+        self._file.truncate(max(capacity, 1) * self.dim * 4)
+        self._data = np.memmap(self._file, dtype=np.float32, mode="r+", shape=(max(capacity, 1), self.dim))
+        self._capacity = capacity
+
+    def build(self, matrix):
+        self._map(len(matrix))
+        if len(matrix):
+            self._data[:len(matrix)] = matrix
+
+    def grow(self, capacity):
+        if capacity > self._capacity:
+            self._data.flush()
+            self._map(capacity)
+
+    def set(self, row, vector):
+        self._data[row] = vector
+
+    def scores(self, query, rows):
+        # Urutkan baris agar akses ke file berurutan, lalu kembalikan ke urutan semula
+        order = np.argsort(rows)
+        scores = np.empty(len(rows), dtype=np.float32)
+        scores[order] = np.asarray(self._data[rows[order]]) @ query
+        return scores
+
+    def close(self):
+        self._data = None
+        self._file.close()
+
+def create_store(dim, collection, matrix, mode=IMAGE_VECTOR_STORAGE):
+    if mode == "float16":
+        store = Float16Store(dim)
+    elif mode == "int8":
+        store = Int8Store(dim)
+    elif mode == "pq":
+        store = PQStore(dim, collection)
+        if store.needs_training(len(matrix)) and len(matrix) < PQ_MIN_TRAIN_SIZE:
+            logger.info(f"Belum cukup vektor untuk melatih PQ ({len(matrix)}), memakai float32 sementara")
+            store = Float32Store(dim)
+    else:
+        store = Float32Store(dim)
+    store.build(matrix)
+    return store
+
+def create_originals(dim, store, matrix):
+    if store.exact or not IMAGE_RERANK_ORIGINALS:
+        return None
+    try:
+        originals = OriginalVectors(dim)
+        originals.build(matrix)
+        return originals
+    except OSError as e:
+        logger.warning(f"Gagal membuat file vektor asli untuk rerank, memakai skor perkiraan: {str(e)}")
+        return None
@@ -0,0 +1,171 @@
+# pylint: disable=all
+# type: ignore
+# noqa
+
+import json
+import os
+import re
+import numpy as np
+from scipy import sparse
+
+# Format penyimpanan vectorizer TF-IDF tanpa pickle. Satu direktori berisi:
+#   header.json : konfigurasi tokenizer, stopwords, n-gram, sublinear_tf, norm, versi
+#   vocab.npy   : term (utf-8, lebar tetap) terurut untuk binary search
+#   columns.npy : indeks kolom asli tiap term di vocab.npy (int32)
+#   idf.npy     : bobot idf per kolom (float64)
+# Array dibuka dengan mmap sehingga beberapa worker berbagi page cache yang sama, dan
+# transform menghasilkan vektor yang sama dengan TfidfVectorizer asalnya.
+
+ARTIFACT_FORMAT = 1
+HEADER_FILE = "header.json"
+
+# Mode tokenizer yang didukung:
+#   "custom"        : text_encoder.custom_tokenizer (buang tanda baca, token > 2 huruf, tanpa stopwords)
+#   "token_pattern" : tokenizer default sklearn berbasis regex
+TOKENIZER_CUSTOM = "custom"
+TOKENIZER_PATTERN = "token_pattern"
+
+def is_vectorizer_artifact(path):
+    return os.path.isfile(os.path.join(path, HEADER_FILE))
+
+def save_vectorizer_artifact(model, path, version, tokenizer_stopwords=None):
+    """Menyimpan TfidfVectorizer yang sudah di-fit sebagai artifact di direktori path"""
+    if getattr(model, "analyzer", "word") != "word" or model.preprocessor is not None or model.strip_accents:
+        raise ValueError("Hanya analyzer 'word' tanpa preprocessor/strip_accents yang didukung")
+    if model.binary or not model.use_idf or model.norm not in ("l2", None):
+        raise ValueError("Konfigurasi TF-IDF tidak didukung (binary, tanpa idf, atau norm selain l2)")
+
+    if model.tokenizer is None:
+        tokenizer = {"mode": TOKENIZER_PATTERN, "pattern": model.token_pattern}
+    elif getattr(model.tokenizer, "__name__", "") == "custom_tokenizer":
+        tokenizer = {"mode": TOKENIZER_CUSTOM, "min_length": 3,
+                     "stopwords": sorted(tokenizer_stopwords or [])}
+    else:
+        raise ValueError(f"Tokenizer {model.tokenizer!r} tidak didukung")
+
+    stop_words = model.get_stop_words()
+    terms = sorted(model.vocabulary_.items())
+    encoded = [term.encode("utf-8") for term, _ in terms]
+    width = max((len(term) for term in encoded), default=1)
+
+    header = {
+        "format": ARTIFACT_FORMAT,
+        "version": version,
+        "dim": len(model.vocabulary_),
+        "lowercase": bool(model.lowercase),
+        "tokenizer": tokenizer,
+        "stop_words": sorted(stop_words) if stop_words else [],
+        "ngram_range": list(model.ngram_range),
+        "sublinear_tf": bool(model.sublinear_tf),
+        "norm": model.norm,
+    }
+
+    tmp_path = path + ".tmp"
+    os.makedirs(tmp_path, exist_ok=True)
+    np.save(os.path.join(tmp_path, "vocab.npy"), np.array(encoded, dtype=f"S{width}"))
+    np.save(os.path.join(tmp_path, "columns.npy"), np.array([column for _, column in terms], dtype=np.int32))
+    np.save(os.path.join(tmp_path, "idf.npy"), np.asarray(model.idf_, dtype=np.float64))
+    with open(os.path.join(tmp_path, HEADER_FILE), "w", encoding="utf-8") as f:
+        json.dump(header, f, ensure_ascii=False)
+
+    if os.path.exists(path):
+        import shutil
+        shutil.rmtree(path)
+    os.replace(tmp_path, path)
+    return path
+
+class CompactTfidfVectorizer:
+    """Pengganti TfidfVectorizer (hanya transform) yang dibaca dari artifact"""
+
+    def __init__(self, path, mmap=True):
+        with open(os.path.join(path, HEADER_FILE), "r", encoding="utf-8") as f:
+            header = json.load(f)
+        if header.get("format") != ARTIFACT_FORMAT:
+            raise ValueError(f"Format artifact vectorizer tidak dikenal: {header.get('format')}")
+
+        mmap_mode = "r" if mmap else None
+        self.path = path
+        self.header = header
+        self.version = header["version"]
+        self.vocab = np.load(os.path.join(path, "vocab.npy"), mmap_mode=mmap_mode)
+        self.columns = np.load(os.path.join(path, "columns.npy"), mmap_mode=mmap_mode)
+        self.idf_ = np.load(os.path.join(path, "idf.npy"), mmap_mode=mmap_mode)
+        self.dim = int(header["dim"])
+        self.lowercase = header["lowercase"]
+        self.ngram_range = tuple(header["ngram_range"])
+        self.sublinear_tf = header["sublinear_tf"]
+        self.norm = header["norm"]
+        self.stop_words = frozenset(header["stop_words"])
+
+        tokenizer = header["tokenizer"]
+        self._tokenizer_mode = tokenizer["mode"]
+        if self._tokenizer_mode == TOKENIZER_CUSTOM:
+            self._min_length = tokenizer["min_length"]
+            self._tokenizer_stopwords = frozenset(tokenizer["stopwords"])
+        else:
+            self._token_pattern = re.compile(tokenizer["pattern"])
+
+    @property
+    def vocabulary_(self):
+        # Hanya untuk kompatibilitas; jalur transform tidak membangun dict ini
+        return {term.decode("utf-8"): int(column) for term, column in zip(self.vocab, self.columns)}
+
+    def get_feature_names_out(self):
+        names = np.empty(self.dim, dtype=object)
+        names[np.asarray(self.columns)] = [term.decode("utf-8") for term in self.vocab]
+        return names
+
+    def _tokenize(self, text):
+        if self.lowercase:
+            text = text.lower()
+        if self._tokenizer_mode == TOKENIZER_CUSTOM:
+            words = re.sub(r'[^\w\s]', ' ', text.lower()).split()
+            tokens = [w for w in words if len(w) >= self._min_length and w not in self._tokenizer_stopwords]
+        else:
+            tokens = self._token_pattern.findall(text)
+        if self.stop_words:
+            tokens = [w for w in tokens if w not in self.stop_words]
+        return tokens
+
+    def _ngrams(self, tokens):
+        min_n, max_n = self.ngram_range
+        grams = list(tokens) if min_n == 1 else []
+        for n in range(max(min_n, 2), max_n + 1):
+            grams.extend(" ".join(tokens[i:i + n]) for i in range(len(tokens) - n + 1))
+        return grams
+
+    def _lookup(self, grams):
+        if not grams:
+            return np.empty(0, dtype=np.int64)
+        keys = np.array([g.encode("utf-8") for g in grams], dtype=f"S{max(self.vocab.dtype.itemsize, 1)}")
+        # Term yang lebih panjang dari lebar vocab pasti tidak ada di vocabulary
+        fits = np.array([len(g.encode("utf-8")) <= self.vocab.dtype.itemsize for g in grams], dtype=bool)
+        positions = np.searchsorted(self.vocab, keys)
+        positions = np.minimum(positions, len(self.vocab) - 1)
+        found = fits & (self.vocab[positions] == keys) if len(self.vocab) else np.zeros(len(grams), dtype=bool)
+        return np.asarray(self.columns[positions[found]], dtype=np.int64)
+
+    def transform(self, raw_documents):
+        indptr, indices, values = [0], [], []
+        for document in raw_documents:
+            columns = self._lookup(self._ngrams(self._tokenize(document)))
+            columns, counts = np.unique(columns, return_counts=True)
+            tf = counts.astype(np.float64)
+            if self.sublinear_tf:
+                tf = np.log(tf) + 1.0
+            weights = tf * self.idf_[columns]
+            if self.norm == "l2":
+                norm = np.sqrt(np.dot(weights, weights))
+                if norm > 0:
+                    weights = weights / norm
+            indices.append(columns)
+            values.append(weights)
+            indptr.append(indptr[-1] + len(columns))
+
+        return sparse.csr_matrix(
+            (np.concatenate(values) if values else np.empty(0),
+             np.concatenate(indices) if indices else np.empty(0, dtype=np.int64),
+             np.array(indptr, dtype=np.int64)),
+            shape=(len(indptr) - 1, self.dim),
+            dtype=np.float64
+        )
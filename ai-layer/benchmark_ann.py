@@ -0,0 +1,135 @@
+"""
+Script untuk mengukur recall, latency dan memori pencarian embedding gambar
+(IVF approximate vs flat exact, serta mode penyimpanan vektor terkompresi)
+pada data Firebase atau data sintetis
+"""
+
+import os
+import sys
+import logging
+import argparse
+import time
+import numpy as np
+
+# Setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+def add_root_to_path():
+    """Menambahkan path root ke sys.path"""
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    if current_dir not in sys.path:
+        sys.path.insert(0, current_dir)
+
+def synthetic_embeddings(count, dim=576, clusters=200, seed=0):
+    """Embedding sintetis berkelompok (mirip distribusi fitur CNN: non-negatif, terkluster)"""
+    rng = np.random.default_rng(seed)
+    centers = np.abs(rng.normal(size=(clusters, dim))).astype(np.float32)
+    labels = rng.integers(0, clusters, count)
+    return centers[labels] + 0.5 * np.abs(rng.normal(size=(count, dim))).astype(np.float32)
+
+def load_vectors(collection, count):
+    """Mengambil embedding dari Firebase, atau membuat data sintetis bila count > 0"""
+    if count > 0:
+        vectors = synthetic_embeddings(count)
+        ids = [f"synthetic-{i}" for i in range(count)]
+        return ids, [{"id": item_id, "status": "available"} for item_id in ids], vectors
+
+    from app.services.firebase import db
+    from app.services.image_index import item_from_document
+    from app.services.embedding_codec import decode_image_embedding
+
+    ids, metadata, vectors = [], [], []
+    for doc in db.collection(collection).stream():
+        data = doc.to_dict()
+        if "embedding" in data:
+            ids.append(doc.id)
+            metadata.append(item_from_document(doc.id, data))
+            vectors.append(decode_image_embedding(data["embedding"]))
+    return ids, metadata, np.asarray(vectors, dtype=np.float32)
+
+def build_index(collection, ids, metadata, vectors, engine="auto", storage="float32"):
+    from app.services.image_index import ImageEmbeddingIndex
+
+    index = ImageEmbeddingIndex(collection, engine=engine, storage=storage)
+    index.build(ids, metadata, vectors)
+    return index
+
+def measure(index, queries, top_k, threshold, nprobe=None, exact=False):
+    results, latencies = [], []
+    for query in queries:
+        start = time.perf_counter()
+        matches = index.search(query, threshold=threshold, top_k=top_k, exact=exact, nprobe=nprobe)
+        latencies.append((time.perf_counter() - start) * 1000)
+        results.append([match["id"] for match in matches])
+    return results, np.array(latencies)
+
+def recall_against(results, expected_results):
+    return float(np.mean([
+        len(set(found) & set(expected)) / max(len(expected), 1)
+        for found, expected in zip(results, expected_results)
+    ]))
+
+def summarize(name, results, latency, expected_results, extra=None):
+    summary = {"recall": recall_against(results, expected_results),
+               "p50_ms": float(np.percentile(latency, 50)), "p95_ms": float(np.percentile(latency, 95))}
+    summary.update(extra or {})
+    logger.info(f"{name:<22}: recall={summary['recall']:.3f} p50={summary['p50_ms']:.2f}ms "
+                f"p95={summary['p95_ms']:.2f}ms" +
+                (f" memori={summary['vector_mb']:.1f}MB ({summary['bytes_per_vector']:.0f} B/vektor)"
+                 if "vector_mb" in summary else ""))
+    return summary
+
+def run_benchmark(collection="found_items", count=0, num_queries=200, top_k=10, threshold=0.0,
+                  nprobes=(1, 4, 8, 16, 32, 64), storages=("float32",)):
+    add_root_to_path()
+
+    ids, metadata, vectors = load_vectors(collection, count)
+    if len(ids) == 0:
+        logger.error("Tidak ada embedding, tidak ada yang diukur")
+        return {}
+
+    # Query = item yang ada di index dengan sedikit noise (meniru foto ulang barang yang sama)
+    rng = np.random.default_rng(1)
+    rows = rng.choice(len(vectors), min(num_queries, len(vectors)), replace=False)
+    queries = vectors[rows] + 0.05 * rng.normal(size=(len(rows), vectors.shape[1])).astype(np.float32)
+
+    report = {}
+    reference = build_index(collection, ids, metadata, vectors, engine="flat", storage="float32")
+    expected_results, latency = measure(reference, queries, top_k, threshold, exact=True)
+    report["flat_float32"] = summarize("flat float32 (exact)", expected_results, latency, expected_results)
+
+    for storage in storages:
+        start_time = time.time()
+        index = build_index(collection, ids, metadata, vectors, storage=storage)
+        stats = index.get_stats()
+        logger.info(f"Index {storage} dibangun dalam {time.time() - start_time:.2f} detik: {stats}")
+        extra = {"vector_mb": stats["vector_bytes"] / 1e6, "bytes_per_vector": stats["bytes_per_vector"]}
+
+        results, latency = measure(index, queries, top_k, threshold, exact=True)
+        report[f"flat_{storage}"] = summarize(f"flat {storage}", results, latency, expected_results, extra)
+
+        if stats["engine"] != "ivf":
+            continue
+        for nprobe in nprobes:
+            results, latency = measure(index, queries, top_k, threshold, nprobe=nprobe)
+            report[f"ivf_{storage}_nprobe_{nprobe}"] = summarize(
+                f"ivf {storage} nprobe={nprobe}", results, latency, expected_results, extra)
+    return report
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark recall/latency pencarian embedding gambar')
+    parser.add_argument('--collection', type=str, default="found_items", help='Koleksi Firebase (default: found_items)')
+    parser.add_argument('--synthetic', type=int, default=0, help='Pakai N embedding sintetis alih-alih Firebase')
+    parser.add_argument('--queries', type=int, default=200, help='Jumlah query (default: 200)')
+    parser.add_argument('--top-k', type=int, default=10, help='Top-k untuk recall (default: 10)')
+    parser.add_argument('--nprobe', type=int, nargs='+', default=[1, 4, 8, 16, 32, 64], help='Nilai nprobe yang diuji')
+    parser.add_argument('--storage', type=str, nargs='+', default=["float32"],
+                        choices=["float32", "float16", "int8", "pq"], help='Mode penyimpanan vektor yang diuji')
+    args = parser.parse_args()
+
+    run_benchmark(collection=args.collection, count=args.synthetic, num_queries=args.queries,
+                  top_k=args.top_k, nprobes=args.nprobe, storages=args.storage)
@@ -0,0 +1,115 @@
+"""
+Script untuk membandingkan ukuran payload dan waktu baca embedding gambar
+format lama (array double) vs bytes float32/float16 di Firestore
+"""
+
+import os
+import sys
+import logging
+import argparse
+import time
+import numpy as np
+
+# Setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+FORMATS = ["list", "float32", "float16"]
+BATCH_SIZE = 400
+
+def add_root_to_path():
+    """Menambahkan path root ke sys.path"""
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    if current_dir not in sys.path:
+        sys.path.insert(0, current_dir)
+
+def make_embeddings(count, dim=576, seed=0):
+    rng = np.random.default_rng(seed)
+    return np.abs(rng.normal(size=(count, dim))).astype(np.float32)
+
+def measure_protobuf(embeddings, wire_format):
+    """Ukuran payload dan waktu encode/decode protobuf Firestore tanpa jaringan"""
+    from google.cloud.firestore_v1 import _helpers
+    from app.services.embedding_codec import encode_image_embedding, decode_image_embedding
+
+    values = [encode_image_embedding(e, dtype=wire_format) for e in embeddings]
+
+    start = time.perf_counter()
+    encoded = [_helpers.encode_value(v) for v in values]
+    encode_s = time.perf_counter() - start
+
+    payload_bytes = sum(type(v).pb(v).ByteSize() for v in encoded)
+
+    start = time.perf_counter()
+    for v in encoded:
+        decode_image_embedding(_helpers.decode_value(v, None))
+    decode_s = time.perf_counter() - start
+
+    return {"payload_bytes": payload_bytes, "bytes_per_doc": payload_bytes / len(values),
+            "encode_seconds": encode_s, "decode_seconds": decode_s}
+
+def measure_firestore(embeddings, wire_format, keep=False):
+    """Menulis dokumen ke koleksi sementara lalu mengukur waktu stream + decode"""
+    from app.services.firebase import db
+    from app.services.embedding_codec import encode_image_embedding, decode_image_embedding
+
+    collection = db.collection(f"benchmark_embeddings_{wire_format}")
+    batch, pending, refs = db.batch(), 0, []
+    for i, embedding in enumerate(embeddings):
+        ref = collection.document(f"doc-{i}")
+        refs.append(ref)
+        batch.set(ref, {"item_name": f"benchmark {i}", "embedding": encode_image_embedding(embedding, dtype=wire_format)})
+        pending += 1
+        if pending >= BATCH_SIZE:
+            batch.commit()
+            batch, pending = db.batch(), 0
+    if pending:
+        batch.commit()
+
+    start = time.perf_counter()
+    count = 0
+    for doc in collection.stream():
+        decode_image_embedding(doc.to_dict()["embedding"])
+        count += 1
+    stream_s = time.perf_counter() - start
+
+    if not keep:
+        batch, pending = db.batch(), 0
+        for ref in refs:
+            batch.delete(ref)
+            pending += 1
+            if pending >= BATCH_SIZE:
+                batch.commit()
+                batch, pending = db.batch(), 0
+        if pending:
+            batch.commit()
+
+    return {"documents": count, "stream_seconds": stream_s}
+
+def run_benchmark(count=10000, use_firestore=False, keep=False):
+    add_root_to_path()
+    embeddings = make_embeddings(count)
+    report = {}
+
+    for wire_format in FORMATS:
+        result = measure_protobuf(embeddings, wire_format)
+        if use_firestore:
+            result.update(measure_firestore(embeddings, wire_format, keep=keep))
+        report[wire_format] = result
+        logger.info(f"{wire_format:<8}: payload={result['payload_bytes'] / 1e6:.1f}MB "
+                    f"({result['bytes_per_doc']:.0f} B/dok), encode={result['encode_seconds']:.2f}s, "
+                    f"decode={result['decode_seconds']:.2f}s" +
+                    (f", stream={result['stream_seconds']:.2f}s" if use_firestore else ""))
+    return report
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark format embedding gambar di Firestore')
+    parser.add_argument('--count', type=int, default=10000, help='Jumlah dokumen (default: 10000)')
+    parser.add_argument('--firestore', action='store_true', help='Ukur juga waktu stream dari Firestore (menulis koleksi sementara)')
+    parser.add_argument('--keep', action='store_true', help='Jangan hapus koleksi sementara setelah benchmark')
+    args = parser.parse_args()
+
+    run_benchmark(count=args.count, use_firestore=args.firestore, keep=args.keep)
@@ -0,0 +1,92 @@
+"""
+Script untuk mengukur lag replika on_snapshot: menulis, mengubah dan menghapus dokumen di
+koleksi uji lalu mengukur waktu sampai perubahan terlihat di replika.
+Jalankan dengan FIRESTORE_EMULATOR_HOST=localhost:8080 untuk memakai Firestore emulator.
+"""
+
+import os
+import sys
+import logging
+import argparse
+import time
+import uuid
+import numpy as np
+
+# Setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+def add_root_to_path():
+    """Menambahkan path root ke sys.path"""
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    if current_dir not in sys.path:
+        sys.path.insert(0, current_dir)
+
+def wait_until(predicate, timeout):
+    start = time.perf_counter()
+    while time.perf_counter() - start < timeout:
+        if predicate():
+            return time.perf_counter() - start
+        time.sleep(0.005)
+    return None
+
+def run_benchmark(collection="replica_benchmark", operations=50, timeout=10.0):
+    add_root_to_path()
+    from app.services.firebase import db
+    from app.services.collection_replica import CollectionReplica
+
+    if not os.getenv("FIRESTORE_EMULATOR_HOST") and collection in ("found_items", "lost_items"):
+        raise ValueError("Gunakan koleksi uji, bukan koleksi produksi")
+
+    replica = CollectionReplica(collection)
+    replica.start()
+    if not replica.ready.wait(timeout):
+        raise RuntimeError(f"Snapshot awal {collection} tidak diterima dalam {timeout} detik")
+    logger.info(f"Replika {collection} siap: {replica.get_stats()['documents']} dokumen")
+
+    def has(doc_id, key=None, value=None):
+        data = dict(replica.documents()).get(doc_id)
+        return data is not None and (key is None or data.get(key) == value)
+
+    lags = {"add": [], "update": [], "delete": []}
+    ids = []
+    try:
+        for i in range(operations):
+            doc_id = f"bench-{uuid.uuid4().hex[:12]}"
+            ids.append(doc_id)
+            db.collection(collection).document(doc_id).set({"description": f"dokumen uji {i}", "status": "available"})
+            lags["add"].append(wait_until(lambda: has(doc_id), timeout))
+            db.collection(collection).document(doc_id).update({"status": "claimed"})
+            lags["update"].append(wait_until(lambda: has(doc_id, "status", "claimed"), timeout))
+            db.collection(collection).document(doc_id).delete()
+            lags["delete"].append(wait_until(lambda: not has(doc_id), timeout))
+    finally:
+        for doc_id in ids:
+            db.collection(collection).document(doc_id).delete()
+        replica.stop()
+
+    report = {}
+    for kind, values in lags.items():
+        seen = [v for v in values if v is not None]
+        report[kind] = {
+            "missed": len(values) - len(seen),
+            "p50_ms": 1000 * float(np.percentile(seen, 50)) if seen else None,
+            "p95_ms": 1000 * float(np.percentile(seen, 95)) if seen else None,
+        }
+        logger.info(f"{kind:<7}: p50={report[kind]['p50_ms']}ms p95={report[kind]['p95_ms']}ms "
+                    f"tidak terlihat={report[kind]['missed']}")
+    report["replica"] = replica.get_stats()
+    logger.info(f"Statistik replika: {report['replica']}")
+    return report
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark lag replika on_snapshot')
+    parser.add_argument('--collection', type=str, default='replica_benchmark', help='Koleksi uji (default: replica_benchmark)')
+    parser.add_argument('--operations', type=int, default=50, help='Jumlah siklus tambah/ubah/hapus (default: 50)')
+    parser.add_argument('--timeout', type=float, default=10.0, help='Batas tunggu per perubahan dalam detik (default: 10)')
+    args = parser.parse_args()
+
+    run_benchmark(collection=args.collection, operations=args.operations, timeout=args.timeout)
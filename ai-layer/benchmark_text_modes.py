@@ -0,0 +1,143 @@
+"""
+Script untuk membandingkan kualitas dan latency text matching mode TF-IDF (fit)
+vs feature hashing (tanpa fit, idf dari document frequency index)
+"""
+
+import os
+import sys
+import logging
+import argparse
+import time
+import numpy as np
+
+# Setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+ITEMS = ["dompet", "tas", "ransel", "laptop", "charger", "kunci", "motor", "buku", "catatan", "botol",
+         "minum", "jaket", "hoodie", "kacamata", "payung", "headphone", "powerbank", "flashdisk", "jam", "tangan"]
+COLORS = ["hitam", "putih", "merah", "biru", "silver", "navy", "kuning", "hijau", "coklat", "abu"]
+BRANDS = ["asus", "lenovo", "samsung", "xiaomi", "honda", "yamaha", "adidas", "eiger", "casio", "sony"]
+DETAILS = ["stiker", "gantungan", "retak", "kartu", "mahasiswa", "ktm", "uang", "sim", "lipat", "kulit",
+           "resleting", "logo", "tali", "casing", "baterai", "layar", "gores", "nama", "inisial", "bordir"]
+PLACES = ["perpustakaan", "kantin", "masjid", "parkiran", "lab", "gedung", "rektorat", "lapangan", "aula", "kelas"]
+
+def add_root_to_path():
+    """Menambahkan path root ke sys.path"""
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    if current_dir not in sys.path:
+        sys.path.insert(0, current_dir)
+
+def synthetic_descriptions(count, seed=0):
+    rng = np.random.default_rng(seed)
+    descriptions = []
+    for _ in range(count):
+        words = [rng.choice(ITEMS), rng.choice(COLORS), rng.choice(BRANDS)]
+        words += list(rng.choice(DETAILS, 3, replace=False))
+        words += [rng.choice(PLACES), f"kode{rng.integers(0, count // 4 + 1)}"]
+        descriptions.append(" ".join(words))
+    return descriptions
+
+def load_descriptions(count):
+    """Deskripsi dari Firebase, atau data sintetis bila count > 0"""
+    if count > 0:
+        return synthetic_descriptions(count)
+    from app.services.firebase import db
+    descriptions = []
+    for collection in ["found_items", "lost_items"]:
+        for doc in db.collection(collection).stream():
+            description = doc.to_dict().get("description", "")
+            if description:
+                descriptions.append(description)
+    return descriptions
+
+def build_index(name, model, version, descriptions):
+    from app.services.text_index import TextEmbeddingIndex
+    from app.services.text_encoder import preprocess_text
+    from app.services.embedding_codec import encode_text_embedding
+
+    index = TextEmbeddingIndex(f"benchmark_{name}")
+    start = time.perf_counter()
+    embeddings = [encode_text_embedding(model.transform([preprocess_text(d)]), version) for d in descriptions]
+    encode_s = time.perf_counter() - start
+    for i, (description, embedding) in enumerate(zip(descriptions, embeddings)):
+        index.upsert(f"doc-{i}", {"item_name": "", "description": description, "text_embedding": embedding})
+    index._compile()
+    return index, encode_s
+
+def make_queries(descriptions, count, seed=1):
+    """Query = sebagian kata dari deskripsi target (meniru laporan barang hilang yang lebih singkat)"""
+    rng = np.random.default_rng(seed)
+    targets = rng.choice(len(descriptions), min(count, len(descriptions)), replace=False)
+    queries = []
+    for target in targets:
+        words = descriptions[target].split()
+        keep = max(2, len(words) // 2)
+        queries.append((int(target), " ".join(rng.choice(words, keep, replace=False))))
+    return queries
+
+def evaluate(index, model, version, queries, top_k=10):
+    from app.services.text_encoder import preprocess_text
+
+    ranks, latencies, results = [], [], []
+    for target, query in queries:
+        start = time.perf_counter()
+        processed = preprocess_text(query)
+        words = list(dict.fromkeys(processed.split()))
+        matches = index.search({version: model.transform([processed])}, words, query, threshold=0.2, max_results=top_k)
+        latencies.append(time.perf_counter() - start)
+        ids = [m["id"] for m in matches]
+        results.append(ids)
+        ranks.append(ids.index(f"doc-{target}") + 1 if f"doc-{target}" in ids else None)
+
+    found = [r for r in ranks if r is not None]
+    return {
+        "recall_at_k": len(found) / len(ranks),
+        "mrr": sum(1.0 / r for r in found) / len(ranks),
+        "p50_ms": 1000 * float(np.percentile(latencies, 50)),
+        "p95_ms": 1000 * float(np.percentile(latencies, 95)),
+    }, results
+
+def run_benchmark(count=5000, queries=500, top_k=10):
+    add_root_to_path()
+    from sklearn.base import clone
+    from app.services.text_encoder import VECTORIZER_TEMPLATE, preprocess_text, compute_vectorizer_version, get_hashing_encoder
+
+    descriptions = load_descriptions(count)
+    query_set = make_queries(descriptions, queries)
+    logger.info(f"{len(descriptions)} deskripsi, {len(query_set)} query")
+
+    start = time.perf_counter()
+    tfidf = clone(VECTORIZER_TEMPLATE).fit([preprocess_text(d) for d in descriptions])
+    fit_s = time.perf_counter() - start
+    hashing = get_hashing_encoder()
+
+    report = {}
+    all_results = {}
+    for name, model, version, extra_s in (("tfidf", tfidf, compute_vectorizer_version(tfidf), fit_s),
+                                          ("hashing", hashing, hashing.version, 0.0)):
+        index, encode_s = build_index(name, model, version, descriptions)
+        metrics, all_results[name] = evaluate(index, model, version, query_set, top_k=top_k)
+        metrics["fit_seconds"] = extra_s
+        metrics["encode_us_per_doc"] = 1e6 * encode_s / len(descriptions)
+        report[name] = metrics
+        logger.info(f"{name:<8}: recall@{top_k}={metrics['recall_at_k']:.3f}, MRR={metrics['mrr']:.3f}, "
+                    f"query p50={metrics['p50_ms']:.2f}ms p95={metrics['p95_ms']:.2f}ms, "
+                    f"fit={extra_s:.2f}s, encode={metrics['encode_us_per_doc']:.0f}us/dok")
+
+    overlaps = [len(set(a) & set(b)) / max(len(a), 1) for a, b in zip(all_results["tfidf"], all_results["hashing"])]
+    report["top_k_agreement"] = float(np.mean(overlaps))
+    logger.info(f"Kesamaan top-{top_k} hashing vs tfidf: {report['top_k_agreement']:.3f}")
+    return report
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark text matching mode tfidf vs hashing')
+    parser.add_argument('--count', type=int, default=5000, help='Jumlah deskripsi sintetis; 0 = pakai data Firebase (default: 5000)')
+    parser.add_argument('--queries', type=int, default=500, help='Jumlah query uji (default: 500)')
+    parser.add_argument('--top-k', type=int, default=10, help='Jumlah hasil per query (default: 10)')
+    args = parser.parse_args()
+
+    run_benchmark(count=args.count, queries=args.queries, top_k=args.top_k)
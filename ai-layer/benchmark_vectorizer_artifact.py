@@ -0,0 +1,105 @@
+"""
+Script untuk membandingkan waktu muat, memori dan hasil transform vectorizer TF-IDF
+format pickle vs artifact (vocab terurut + idf mmap + header JSON)
+"""
+
+import os
+import sys
+import logging
+import argparse
+import time
+import pickle
+import tempfile
+import tracemalloc
+import numpy as np
+
+# Setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+def add_root_to_path():
+    """Menambahkan path root ke sys.path"""
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    if current_dir not in sys.path:
+        sys.path.insert(0, current_dir)
+
+def synthetic_documents(count, vocabulary=3000, words_per_doc=12, seed=0):
+    """Deskripsi sintetis dari kata acak sehingga vocabulary n-gram mendekati max_features"""
+    rng = np.random.default_rng(seed)
+    words = [f"kata{i}" for i in range(vocabulary)]
+    return [" ".join(rng.choice(words, words_per_doc)) for _ in range(count)]
+
+def measure_load(loader, repeat):
+    times, peaks = [], []
+    for _ in range(repeat):
+        tracemalloc.start()
+        start = time.perf_counter()
+        model = loader()
+        times.append(time.perf_counter() - start)
+        peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    return model, {"load_ms": 1000 * float(np.median(times)), "heap_peak_mb": max(peaks) / 1e6}
+
+def run_benchmark(pickle_path=None, synthetic=20000, repeat=5, queries=2000):
+    add_root_to_path()
+    from sklearn.base import clone
+    from app.services.text_encoder import VECTORIZER_TEMPLATE, STOPWORDS_ID, preprocess_text, compute_vectorizer_version
+    from app.services.vectorizer_artifact import CompactTfidfVectorizer, save_vectorizer_artifact
+
+    workdir = tempfile.mkdtemp(prefix="vectorizer_benchmark_")
+    if pickle_path is None:
+        documents = synthetic_documents(synthetic)
+        model = clone(VECTORIZER_TEMPLATE).fit([preprocess_text(d) for d in documents])
+        pickle_path = os.path.join(workdir, "tfidf_vectorizer.pkl")
+        with open(pickle_path, "wb") as f:
+            pickle.dump(model, f)
+        samples = documents[:queries]
+    else:
+        with open(pickle_path, "rb") as f:
+            model = pickle.load(f)
+        samples = synthetic_documents(queries, vocabulary=50)
+
+    artifact_path = os.path.join(workdir, "tfidf_vectorizer")
+    save_vectorizer_artifact(model, artifact_path, compute_vectorizer_version(model), tokenizer_stopwords=STOPWORDS_ID)
+    logger.info(f"Vocabulary: {len(model.vocabulary_)} term")
+    logger.info(f"Ukuran file: pickle={os.path.getsize(pickle_path) / 1e6:.2f}MB, artifact="
+                f"{sum(os.path.getsize(os.path.join(artifact_path, f)) for f in os.listdir(artifact_path)) / 1e6:.2f}MB")
+
+    def load_pickle():
+        with open(pickle_path, "rb") as f:
+            return pickle.load(f)
+
+    report = {}
+    pickled, report["pickle"] = measure_load(load_pickle, repeat)
+    compact, report["artifact"] = measure_load(lambda: CompactTfidfVectorizer(artifact_path), repeat)
+
+    processed = [preprocess_text(d) for d in samples]
+    for name, vectorizer in (("pickle", pickled), ("artifact", compact)):
+        start = time.perf_counter()
+        for text in processed:
+            vectorizer.transform([text])
+        report[name]["transform_us"] = 1e6 * (time.perf_counter() - start) / len(processed)
+
+    expected = pickled.transform(processed)
+    actual = compact.transform(processed)
+    report["max_abs_diff"] = float(abs(expected - actual).max()) if expected.nnz or actual.nnz else 0.0
+    report["same_nnz"] = bool(expected.nnz == actual.nnz)
+
+    for name in ("pickle", "artifact"):
+        logger.info(f"{name:<8}: load={report[name]['load_ms']:.1f}ms, heap peak={report[name]['heap_peak_mb']:.2f}MB, "
+                    f"transform={report[name]['transform_us']:.0f}us/dok")
+    logger.info(f"Selisih maksimum hasil transform: {report['max_abs_diff']:.2e} (nnz sama: {report['same_nnz']})")
+    return report
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark vectorizer pickle vs artifact')
+    parser.add_argument('--pickle', type=str, default=None, help='Path pickle vectorizer (default: latih vectorizer sintetis)')
+    parser.add_argument('--synthetic', type=int, default=20000, help='Jumlah dokumen sintetis untuk melatih vectorizer (default: 20000)')
+    parser.add_argument('--repeat', type=int, default=5, help='Jumlah pengulangan pengukuran waktu muat (default: 5)')
+    parser.add_argument('--queries', type=int, default=2000, help='Jumlah dokumen untuk uji transform (default: 2000)')
+    args = parser.parse_args()
+
+    run_benchmark(pickle_path=args.pickle, synthetic=args.synthetic, repeat=args.repeat, queries=args.queries)
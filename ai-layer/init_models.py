@@ -3,7 +3,10 @@
 # noqa
 
 import os
+import json
+import argparse
 import pickle
+import shutil
 import torch
 import torchvision.models as models
 from sklearn.feature_extraction.text import TfidfVectorizer
@@ -47,6 +50,60 @@ def init_mobilenet():
         logger.error(f"Error inisialisasi MobileNetV3-Small: {str(e)}")
         return False
 
+def load_calibration_batches(calibration_dir="temp_images", max_images=64, batch_size=16):
+    from app.services.image_encoder import get_transform
+    from app.services.image_decode import decode_image
+    transform = get_transform()
+    
+    tensors = []
+    if os.path.isdir(calibration_dir):
+        for file_name in sorted(os.listdir(calibration_dir)):
+            if len(tensors) >= max_images:
+                break
+            try:
+                image = decode_image(os.path.join(calibration_dir, file_name))
+                tensors.append(transform(image))
+            except Exception:
+                continue
+    
+    if not tensors:
+        logger.warning(f"Tidak ada gambar kalibrasi di {calibration_dir}, memakai gambar sintetis "
+                       "(akurasi model INT8 akan kurang representatif)")
+        generator = np.random.default_rng(0)
+        for _ in range(max_images // 2):
+            pixels = (generator.random((224, 224, 3)) * 255).astype(np.uint8)
+            tensors.append(transform(Image.fromarray(pixels)))
+    
+    logger.info(f"Memakai {len(tensors)} gambar untuk kalibrasi dan uji paritas")
+    return [torch.stack(tensors[i:i + batch_size]) for i in range(0, len(tensors), batch_size)]
+
+def init_inference_backends(calibration_dir="temp_images"):
+    logger.info("Membuat artifact backend inference (TorchScript dan INT8)...")
+    try:
+        from app.services.model_export import (
+            build_feature_extractor, export_torchscript, export_int8, compare_backends
+        )
+        
+        eager_model = build_feature_extractor()
+        batches = load_calibration_batches(calibration_dir)
+        
+        models_by_backend = {"eager": eager_model}
+        models_by_backend["torchscript"] = export_torchscript(eager_model)
+        try:
+            models_by_backend["int8"] = export_int8(eager_model, batches)
+        except Exception as e:
+            logger.error(f"Gagal membuat model INT8: {str(e)}")
+        
+        report = compare_backends(models_by_backend, batches)
+        with open("app/models/inference_backends_report.json", "w") as f:
+            json.dump(report, f, indent=2)
+        logger.info("Laporan paritas dan latensi disimpan ke app/models/inference_backends_report.json")
+        
+        return True
+    except Exception as e:
+        logger.error(f"Error membuat backend inference: {str(e)}")
+        return False
+
 def init_tfidf_vectorizer():
     logger.info("Menginisialisasi TF-IDF Vectorizer...")
     try:
@@ -98,6 +155,8 @@ def init_tfidf_vectorizer():
         
         with open("app/models/tfidf_vectorizer.pkl", "wb") as f:
             pickle.dump(vectorizer, f)
+        # Artifact lama dihapus; service mengonversi pickle ini ke artifact saat pertama dimuat
+        shutil.rmtree("app/models/tfidf_vectorizer", ignore_errors=True)
         
         sample_features = vectorizer.transform(["dompet hitam berisi KTM"])
         logger.info(f"Verifikasi TF-IDF: shape={sample_features.shape}")
@@ -108,9 +167,11 @@ def init_tfidf_vectorizer():
         logger.error(f"Error inisialisasi TF-IDF Vectorizer: {str(e)}")
         return False
 
-def init_all_models():
+def init_all_models(calibration_dir="temp_images", skip_backends=False):
     ensure_directories_exist()
     mobilenet_success = init_mobilenet()  
+    if mobilenet_success and not skip_backends:
+        init_inference_backends(calibration_dir)
     tfidf_success = init_tfidf_vectorizer()
     
     if mobilenet_success and tfidf_success:
@@ -121,4 +182,9 @@ def init_all_models():
         return False
 
 if __name__ == "__main__":
-    init_all_models()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='Inisialisasi model UNYLost AI')
+    parser.add_argument('--calibration-dir', type=str, default="temp_images", help='Folder gambar untuk kalibrasi INT8 dan uji paritas')
+    parser.add_argument('--skip-backends', action='store_true', help='Jangan buat artifact TorchScript/INT8')
+    args = parser.parse_args()
+    
+    init_all_models(calibration_dir=args.calibration_dir, skip_backends=args.skip_backends)
\ No newline at end of file
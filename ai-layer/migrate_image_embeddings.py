@@ -0,0 +1,114 @@
+"""
+Script untuk memigrasi embedding gambar lama (array double) di Firebase
+ke format bytes float32/float16 yang sudah dinormalisasi
+"""
+
+import os
+import sys
+import logging
+import argparse
+import time
+
+# Setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 400
+
+def add_root_to_path():
+    """Menambahkan path root ke sys.path"""
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    if current_dir not in sys.path:
+        sys.path.insert(0, current_dir)
+    logger.info(f"Ditambahkan ke path: {current_dir}")
+
+def migrate_collection(collection, wire_format, dry_run=False):
+    """Mengubah semua embedding list di satu koleksi menjadi bytes"""
+    from app.services.firebase import db
+    from app.services.embedding_codec import encode_image_embedding, is_binary_image_embedding
+
+    stats = {"total": 0, "migrated": 0, "already_binary": 0, "skipped": 0, "failed": 0,
+             "list_bytes": 0, "binary_bytes": 0}
+    batch = db.batch()
+    pending = 0
+
+    for doc in db.collection(collection).stream():
+        stats["total"] += 1
+        embedding = doc.to_dict().get("embedding")
+
+        if embedding is None:
+            stats["skipped"] += 1
+            continue
+        if is_binary_image_embedding(embedding):
+            stats["already_binary"] += 1
+            continue
+
+        try:
+            encoded = encode_image_embedding(embedding, dtype=wire_format)
+            stats["list_bytes"] += 8 * len(embedding)
+            stats["binary_bytes"] += len(encoded)
+
+            if not dry_run:
+                batch.update(db.collection(collection).document(doc.id), {"embedding": encoded})
+                pending += 1
+                if pending >= BATCH_SIZE:
+                    batch.commit()
+                    batch = db.batch()
+                    pending = 0
+            stats["migrated"] += 1
+        except Exception as e:
+            stats["failed"] += 1
+            logger.error(f"Error saat memigrasi dokumen {collection}/{doc.id}: {str(e)}")
+
+    if pending and not dry_run:
+        batch.commit()
+
+    return stats
+
+def migrate_all_image_embeddings(wire_format="float32", dry_run=False):
+    """Memigrasi embedding gambar di found_items dan lost_items"""
+    try:
+        add_root_to_path()
+        start_time = time.time()
+
+        result = {"success": True}
+        for collection in ["found_items", "lost_items"]:
+            logger.info(f"Memigrasi embedding gambar di {collection}...")
+            stats = migrate_collection(collection, wire_format, dry_run=dry_run)
+            result[collection] = stats
+            logger.info(f"{collection}: {stats['migrated']} dimigrasi, {stats['already_binary']} sudah bytes, "
+                        f"{stats['skipped']} tanpa embedding, {stats['failed']} gagal")
+            if stats["list_bytes"]:
+                logger.info(f"{collection}: ukuran embedding {stats['list_bytes'] / 1024:.1f} KB -> "
+                            f"{stats['binary_bytes'] / 1024:.1f} KB")
+
+        result["elapsed_time"] = time.time() - start_time
+        logger.info(f"Total waktu: {result['elapsed_time']:.2f} detik")
+        return result
+
+    except Exception as e:
+        logger.error(f"Error dalam migrasi embedding gambar: {str(e)}")
+        import traceback
+        traceback.print_exc()
+
+        return {
+            "success": False,
+            "error": str(e)
+        }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Migrasi embedding gambar list ke format bytes')
+    parser.add_argument('--dtype', type=str, default="float32", choices=["float32", "float16"], help='Tipe data bytes (default: float32)')
+    parser.add_argument('--dry-run', action='store_true', help='Hanya hitung tanpa menulis ke Firebase')
+    args = parser.parse_args()
+
+    logger.info("Memulai migrasi embedding gambar...")
+    result = migrate_all_image_embeddings(wire_format=args.dtype, dry_run=args.dry_run)
+
+    if result["success"]:
+        logger.info("Migrasi embedding gambar selesai dengan sukses!")
+    else:
+        logger.error(f"Migrasi embedding gambar gagal: {result.get('error', 'Unknown error')}")
@@ -0,0 +1,154 @@
+"""
+Script untuk memigrasi text embedding lama (list float dense) di Firebase
+ke format sparse (indeks term + nilai, ditandai versi vectorizer), sekaligus
+mengisi fitur teks hasil preprocess (text_tokens, item_name_lower) yang belum ada
+"""
+
+import os
+import sys
+import logging
+import argparse
+import time
+
+# Setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 400
+
+def add_root_to_path():
+    """Menambahkan path root ke sys.path"""
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    if current_dir not in sys.path:
+        sys.path.insert(0, current_dir)
+    logger.info(f"Ditambahkan ke path: {current_dir}")
+
+def migrate_collection(collection, reencode=False, dry_run=False):
+    """Mengubah semua text_embedding dense di satu koleksi menjadi format sparse"""
+    from app.services.firebase import db
+    from app.services.text_encoder import (
+        encode_text_features, compute_text_fields, get_legacy_vectorizer_version, get_vectorizer_for_version
+    )
+    from app.services.embedding_codec import (
+        encode_text_embedding, is_sparse_text_embedding, text_embedding_version, text_embedding_dim, LEGACY_TEXT_VERSION
+    )
+
+    # Embedding lama ditandai versi vectorizer pickle lama jika dimensinya cocok
+    legacy_version = get_legacy_vectorizer_version()
+    legacy_model = get_vectorizer_for_version(legacy_version) if legacy_version else None
+    legacy_dim = legacy_model.dim if legacy_model is not None else None
+    if legacy_version is None:
+        logger.warning("Versi vectorizer pickle lama tidak diketahui, embedding lama tetap bertanda legacy")
+
+    def legacy_tag(text_embedding):
+        return legacy_version if legacy_dim is not None and text_embedding_dim(text_embedding) == legacy_dim else None
+
+    stats = {"total": 0, "migrated": 0, "already_sparse": 0, "retagged": 0, "skipped": 0, "failed": 0,
+             "text_fields": 0, "dense_bytes": 0, "sparse_bytes": 0}
+    batch = db.batch()
+    pending = 0
+
+    for doc in db.collection(collection).stream():
+        stats["total"] += 1
+        data = doc.to_dict()
+        text_embedding = data.get("text_embedding")
+
+        if text_embedding is None:
+            stats["skipped"] += 1
+            continue
+
+        try:
+            update = {}
+            description = data.get("description", "")
+            if description and "text_tokens" not in data:
+                update.update(compute_text_fields(description, data.get("item_name", "")))
+                stats["text_fields"] += 1
+
+            if is_sparse_text_embedding(text_embedding):
+                stats["already_sparse"] += 1
+                if text_embedding_version(text_embedding) == LEGACY_TEXT_VERSION and legacy_tag(text_embedding):
+                    update["text_embedding"] = {**text_embedding, "version": legacy_version}
+                    stats["retagged"] += 1
+            else:
+                if reencode and description:
+                    encoded = encode_text_features(description)
+                else:
+                    # Konversi lossless; list dense lama berasal dari vectorizer pickle lama
+                    encoded = encode_text_embedding(text_embedding, legacy_tag(text_embedding))
+
+                # Perkiraan ukuran: 8 byte per double di list dense vs indeks + nilai di format sparse
+                stats["dense_bytes"] += 8 * len(text_embedding)
+                stats["sparse_bytes"] += 12 * len(encoded["indices"])
+                update["text_embedding"] = encoded
+                stats["migrated"] += 1
+
+            if update and not dry_run:
+                batch.update(db.collection(collection).document(doc.id), update)
+                pending += 1
+                if pending >= BATCH_SIZE:
+                    batch.commit()
+                    batch = db.batch()
+                    pending = 0
+        except Exception as e:
+            stats["failed"] += 1
+            logger.error(f"Error saat memigrasi dokumen {collection}/{doc.id}: {str(e)}")
+
+    if pending and not dry_run:
+        batch.commit()
+
+    return stats
+
+def migrate_all_text_embeddings(reencode=False, dry_run=False):
+    """Memigrasi text embedding di found_items dan lost_items"""
+    try:
+        add_root_to_path()
+        start_time = time.time()
+
+        result = {"success": True}
+        for collection in ["found_items", "lost_items"]:
+            logger.info(f"Memigrasi text embedding di {collection}...")
+            stats = migrate_collection(collection, reencode=reencode, dry_run=dry_run)
+            result[collection] = stats
+            logger.info(f"{collection}: {stats['migrated']} dimigrasi, {stats['already_sparse']} sudah sparse "
+                        f"({stats['retagged']} diberi versi), "
+                        f"{stats['skipped']} tanpa embedding, {stats['failed']} gagal, "
+                        f"{stats['text_fields']} diisi fitur teks")
+            if stats["dense_bytes"]:
+                logger.info(f"{collection}: ukuran embedding {stats['dense_bytes'] / 1024:.1f} KB -> "
+                            f"{stats['sparse_bytes'] / 1024:.1f} KB")
+
+        result["elapsed_time"] = time.time() - start_time
+        logger.info(f"Total waktu: {result['elapsed_time']:.2f} detik")
+
+        if not dry_run:
+            from app.services.index_sync import notify_text_embeddings_rebuilt
+            notify_text_embeddings_rebuilt()
+
+        return result
+
+    except Exception as e:
+        logger.error(f"Error dalam migrasi text embedding: {str(e)}")
+        import traceback
+        traceback.print_exc()
+
+        return {
+            "success": False,
+            "error": str(e)
+        }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Migrasi text embedding dense ke format sparse')
+    parser.add_argument('--reencode', action='store_true', help='Hitung ulang embedding dari deskripsi dengan vectorizer aktif')
+    parser.add_argument('--dry-run', action='store_true', help='Hanya hitung tanpa menulis ke Firebase')
+    args = parser.parse_args()
+
+    logger.info("Memulai migrasi text embedding...")
+    result = migrate_all_text_embeddings(reencode=args.reencode, dry_run=args.dry_run)
+
+    if result["success"]:
+        logger.info("Migrasi text embedding selesai dengan sukses!")
+    else:
+        logger.error(f"Migrasi text embedding gagal: {result.get('error', 'Unknown error')}")
@@ -1,12 +1,13 @@
 """
-Script untuk meregenerasi semua text embedding di Firebase
-setelah perubahan vectorizer atau stopwords
+Script untuk meregenerasi text embedding di Firebase setelah perubahan
+vectorizer atau stopwords; hanya dokumen dengan versi vectorizer lama yang di-encode ulang
 """
 
 import os
 import sys
 import logging
 import time
+import argparse
 from pathlib import Path
 
 # Setup logging
@@ -26,111 +27,54 @@ def add_root_to_path():
         sys.path.insert(0, root_dir)
     logger.info(f"Ditambahkan ke path: {root_dir}")
 
-def regenerate_all_embeddings():
-    """Meregenerasi semua text embedding di Firebase"""
+def regenerate_all_embeddings(retrain=True, chunk_size=200):
+    """Melatih ulang vectorizer lalu meng-encode ulang text embedding yang versinya lama.
+
+    Proses berjalan per chunk dan posisinya disimpan, sehingga jika terhenti cukup jalankan
+    lagi dengan --resume. Selama proses berjalan API tetap bisa mencari item dengan
+    embedding versi lama memakai vectorizer versinya sendiri.
+    """
     try:
         # 1. Import modul yang diperlukan
         add_root_to_path()
         
-        # Impor fungsi yang diperlukan
-        from app.services.firebase import db
-        from app.services.text_encoder import preprocess_text, extract_text_features
-        
-        # 2. Force train ulang vectorizer
-        from app.services.text_encoder import load_vectorizer, train_tfidf_with_data
+        from app.services.text_encoder import train_tfidf_with_data, get_vectorizer_version
+        from app.services.text_reencoder import reencode_stale_embeddings
         
-        logger.info("Melatih ulang vectorizer...")
-        num_docs = train_tfidf_with_data()
-        logger.info(f"Vectorizer dilatih ulang dengan {num_docs} dokumen")
+        # 2. Latih ulang vectorizer (versi baru disimpan berdampingan dengan versi lama)
+        if retrain:
+            logger.info("Melatih ulang vectorizer...")
+            num_docs = train_tfidf_with_data(reencode=False)
+            logger.info(f"Vectorizer dilatih ulang dengan {num_docs} dokumen")
         
-        # 3. Regenerasi semua embedding di Firebase
-        # 3.1 Regenerasi embedding untuk found_items
-        logger.info("Memperbarui embeddings untuk found_items...")
+        # 3. Re-encode dokumen yang embedding-nya bukan versi aktif
+        logger.info(f"Meng-encode ulang text embedding ke versi {get_vectorizer_version()}...")
         start_time = time.time()
-        
-        found_docs = db.collection("found_items").stream()
-        found_count = 0
-        found_updated = 0
-        found_failed = 0
-        
-        for doc in found_docs:
-            found_count += 1
-            try:
-                data = doc.to_dict()
-                description = data.get("description", "")
-                
-                if description:
-                    # Ekstrak fitur baru
-                    new_embedding = extract_text_features(description)
-                    
-                    # Update di Firebase
-                    db.collection("found_items").document(doc.id).update({
-                        "text_embedding": new_embedding.tolist()
-                    })
-                    
-                    found_updated += 1
-                    if found_updated % 10 == 0:
-                        logger.info(f"Memperbarui {found_updated}/{found_count} dokumen found_items...")
-            except Exception as e:
-                found_failed += 1
-                logger.error(f"Error saat memperbarui dokumen {doc.id}: {str(e)}")
-        
-        # 3.2 Regenerasi embedding untuk lost_items
-        logger.info("Memperbarui embeddings untuk lost_items...")
-        
-        lost_docs = db.collection("lost_items").stream()
-        lost_count = 0
-        lost_updated = 0
-        lost_failed = 0
-        
-        for doc in lost_docs:
-            lost_count += 1
-            try:
-                data = doc.to_dict()
-                description = data.get("description", "")
-                
-                if description:
-                    # Ekstrak fitur baru
-                    new_embedding = extract_text_features(description)
-                    
-                    # Update di Firebase
-                    db.collection("lost_items").document(doc.id).update({
-                        "text_embedding": new_embedding.tolist()
-                    })
-                    
-                    lost_updated += 1
-                    if lost_updated % 10 == 0:
-                        logger.info(f"Memperbarui {lost_updated}/{lost_count} dokumen lost_items...")
-            except Exception as e:
-                lost_failed += 1
-                logger.error(f"Error saat memperbarui dokumen {doc.id}: {str(e)}")
-        
+        state = reencode_stale_embeddings(chunk_size=chunk_size)
         elapsed_time = time.time() - start_time
         
         # 4. Cetak ringkasan
         logger.info("\n" + "=" * 50)
         logger.info("RINGKASAN REGENERASI EMBEDDING")
         logger.info("=" * 50)
-        logger.info(f"Total dokumen found_items: {found_count}")
-        logger.info(f"  - Berhasil diperbarui: {found_updated}")
-        logger.info(f"  - Gagal diperbarui: {found_failed}")
-        logger.info(f"Total dokumen lost_items: {lost_count}")
-        logger.info(f"  - Berhasil diperbarui: {lost_updated}")
-        logger.info(f"  - Gagal diperbarui: {lost_failed}")
+        for collection, stats in state["collections"].items():
+            logger.info(f"Total dokumen {collection} diperiksa: {stats['scanned']}")
+            logger.info(f"  - Berhasil diperbarui: {stats['reencoded']}")
+            logger.info(f"  - Gagal diperbarui: {stats['failed']}")
+            logger.info(f"  - Selesai: {stats['done']}")
         logger.info(f"Total waktu: {elapsed_time:.2f} detik")
         logger.info("=" * 50)
         
         return {
             "success": True,
-            "found_items": {
-                "total": found_count,
-                "updated": found_updated,
-                "failed": found_failed
-            },
-            "lost_items": {
-                "total": lost_count,
-                "updated": lost_updated,
-                "failed": lost_failed
+            "version": state["version"],
+            **{
+                collection: {
+                    "total": stats["scanned"],
+                    "updated": stats["reencoded"],
+                    "failed": stats["failed"]
+                }
+                for collection, stats in state["collections"].items()
             },
             "elapsed_time": elapsed_time
         }
@@ -146,10 +90,15 @@ def regenerate_all_embeddings():
         }
 
 if __name__ == "__main__":
-    logger.info("Memulai regenerasi semua text embedding...")
-    result = regenerate_all_embeddings()
+    parser = argparse.ArgumentParser(description='Latih ulang vectorizer dan encode ulang text embedding versi lama')
+    parser.add_argument('--resume', action='store_true', help='Lanjutkan re-encode tanpa melatih ulang vectorizer')
+    parser.add_argument('--chunk-size', type=int, default=200, help='Jumlah dokumen per chunk (default: 200)')
+    args = parser.parse_args()
+
+    logger.info("Memulai regenerasi text embedding...")
+    result = regenerate_all_embeddings(retrain=not args.resume, chunk_size=args.chunk_size)
     
     if result["success"]:
         logger.info("Regenerasi embedding selesai dengan sukses!")
     else:
-        logger.error(f"Regenerasi embedding gagal: {result.get('error', 'Unknown error')}")
\ No newline at end of file
+        logger.error(f"Regenerasi embedding gagal: {result.get('error', 'Unknown error')}")
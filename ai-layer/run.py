@@ -31,7 +31,7 @@ def verify_environment():
         return False
     
     # Cek apakah model sudah diinisialisasi
-    if not os.path.exists("app/models/tfidf_vectorizer.pkl"):
+    if not os.path.exists("app/models/tfidf_vectorizer/header.json") and not os.path.exists("app/models/tfidf_vectorizer.pkl"):
         logger.warning("TF-IDF Vectorizer belum diinisialisasi")
         
         # Cek apakah init_models.py ada
@@ -110,14 +110,73 @@ def run_app(host="127.0.0.1", port=8000, dev_mode=True):
             log_level="warning"
         )
 
+def run_preforked(host="127.0.0.1", port=8000, workers=4):
+    """Muat model sekali di proses induk lalu fork worker (bobot model dipakai bersama copy-on-write)"""
+    # Worker bawaan uvicorn memakai spawn sehingga setiap worker memuat ulang semua model
+    if not hasattr(os, "fork"):
+        logger.warning("os.fork tidak tersedia di platform ini, kembali ke mode worker uvicorn")
+        return run_app(host=host, port=port, dev_mode=False)
+    # Client Firestore (gRPC) dibuat di induk; aktifkan dukungan fork sebelum gRPC di-import
+    os.environ.setdefault("GRPC_ENABLE_FORK_SUPPORT", "1")
+
+    if not verify_environment() or not verify_required_modules():
+        logger.error("Persiapan environment gagal, aplikasi tidak dapat dijalankan")
+        return
+
+    import signal
+    import socket
+
+    from app.main import app
+    from app.services import model_registry
+
+    logger.info("Preload model di proses induk...")
+    model_registry.preload()
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+
+    children = []
+    for _ in range(workers):
+        pid = os.fork()
+        if pid == 0:
+            model_registry.mark_process_started()
+            server = uvicorn.Server(uvicorn.Config(app, log_level="warning"))
+            server.run(sockets=[sock])
+            os._exit(0)
+        children.append(pid)
+
+    logger.info(f"{workers} worker berjalan di {host}:{port} (pid: {children})")
+
+    def shutdown(signum, frame):
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+
+    for pid in children:
+        os.waitpid(pid, 0)
+    sock.close()
+
 def parse_args():
     """Parse command line arguments"""
     parser = argparse.ArgumentParser(description='Run UNYLost AI Layer')
     parser.add_argument('--host', type=str, default="127.0.0.1", help='Host to bind (default: 127.0.0.1)')
     parser.add_argument('--port', type=int, default=8000, help='Port to bind (default: 8000)')
     parser.add_argument('--prod', action='store_true', help='Run in production mode')
+    parser.add_argument('--preload', action='store_true', help='Load models once before forking workers (production)')
+    parser.add_argument('--workers', type=int, default=4, help='Number of workers for --preload (default: 4)')
     return parser.parse_args()
 
 if __name__ == "__main__":
     args = parse_args()
-    run_app(host=args.host, port=args.port, dev_mode=not args.prod)
\ No newline at end of file
+    if args.preload:
+        run_preforked(host=args.host, port=args.port, workers=args.workers)
+    else:
+        run_app(host=args.host, port=args.port, dev_mode=not args.prod)
\ No newline at end of file